@@ -0,0 +1,4 @@
+"""
+Benchmarks for S3 Uploader
+上传引擎基准测试
+"""
@@ -0,0 +1,163 @@
+"""
+分片读取拷贝量基准
+
+比较boto3传输管理器使用的 ReadFileChunk 与 core.s3_client.PartReader：
+1. 读取层：模拟HTTP层对请求体的两遍读取（计算校验和、写入socket），
+   用tracemalloc统计每次read新分配的字节数，得到“每上传1字节拷贝的字节数”
+2. 端到端：在独立进程的S3替身服务上上传同一文件，比较吞吐和Python堆峰值
+
+Usage:
+    python -m benchmarks.bench_copies
+    python -m benchmarks.bench_copies --size-mb 256 --chunk-mb 16
+"""
+
+import argparse
+import mmap
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import zlib
+from pathlib import Path
+
+# 允许直接以脚本方式运行
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.s3_stub import S3StubServer
+from core.s3_client import PartReader, S3ClientWrapper
+
+try:
+    from s3transfer.utils import ReadFileChunk
+    HAVE_S3TRANSFER = True
+except ImportError:
+    HAVE_S3TRANSFER = False
+
+
+MiB = 1024 * 1024
+# http.client / urllib3 发送请求体时每次读取的块大小
+BLOCK_SIZE = 64 * 1024
+BUCKET = 'bench'
+
+
+# ==================== 读取层 ====================
+
+def copies_per_byte(body, size: int) -> float:
+    """模拟HTTP层读取请求体两遍，返回每字节新分配的字节数"""
+    copied = 0
+    for _ in range(2):
+        body.seek(0)
+        while True:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+            chunk = body.read(BLOCK_SIZE)
+            copied += tracemalloc.get_traced_memory()[1] - base
+            if not chunk:
+                break
+            zlib.crc32(chunk)  # 代替校验和计算/socket写入，只读不拷贝
+            del chunk
+    return copied / (2 * size)
+
+
+def bench_readers(path: str, chunk_size: int) -> list:
+    """逐个分片测量各读取器的拷贝量"""
+    size = os.path.getsize(path)
+    results = []
+
+    tracemalloc.start()
+    try:
+        if HAVE_S3TRANSFER:
+            total = 0.0
+            for start in range(0, size, chunk_size):
+                length = min(chunk_size, size - start)
+                reader = ReadFileChunk.from_filename(path, start, chunk_size)
+                total += copies_per_byte(reader, length) * length
+                reader.close()
+            results.append(('ReadFileChunk (boto3)', total / size))
+
+        with open(path, 'rb') as f:
+            mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            view = memoryview(mapping)
+            total = 0.0
+            for start in range(0, size, chunk_size):
+                part = view[start:start + chunk_size]
+                total += copies_per_byte(PartReader(part), len(part)) * len(part)
+                part.release()
+            view.release()
+            mapping.close()
+        results.append(('PartReader (mmap)', total / size))
+    finally:
+        tracemalloc.stop()
+    return results
+
+
+# ==================== 端到端 ====================
+
+def _serve(conn):
+    """子进程中运行替身服务，避免服务端的分配计入测量"""
+    with S3StubServer() as stub:
+        conn.send(stub.endpoint)
+        conn.recv()
+
+
+def bench_end_to_end(path: str, chunk_size: int, endpoint: str) -> list:
+    """分别用boto3传输管理器和自有分片路径上传，返回 (名称, MB/s, 堆峰值MB)"""
+    size = os.path.getsize(path)
+    client = S3ClientWrapper(endpoint, 'bench', 'bench', chunk_size=chunk_size)
+    cases = [
+        ('boto3 TransferManager', lambda key: client.client.upload_file(
+            Filename=path, Bucket=BUCKET, Key=key, Config=client.transfer_config)),
+        ('S3ClientWrapper.upload_file', lambda key: client.upload_file(path, BUCKET, key)),
+    ]
+
+    results = []
+    for name, upload in cases:
+        tracemalloc.start()
+        start = time.perf_counter()
+        upload(f'copies/{len(results)}')
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        results.append((name, size / MiB / elapsed, peak / MiB))
+    return results
+
+
+# ==================== 入口 ====================
+
+def main():
+    parser = argparse.ArgumentParser(description='分片读取拷贝量基准')
+    parser.add_argument('--size-mb', type=int, default=64, help='测试文件大小(MB)')
+    parser.add_argument('--chunk-mb', type=int, default=8, help='分片大小(MB)')
+    args = parser.parse_args()
+
+    chunk_size = args.chunk_mb * MiB
+    fd, path = tempfile.mkstemp(prefix='s3copies_')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            block = os.urandom(MiB)
+            for _ in range(args.size_mb):
+                f.write(block)
+
+        print(f'文件 {args.size_mb} MB，分片 {args.chunk_mb} MB，读取块 {BLOCK_SIZE // 1024} KB\n')
+        print(f'{"读取器":<32}{"拷贝字节/上传字节":>18}')
+        for name, ratio in bench_readers(path, chunk_size):
+            print(f'{name:<32}{ratio:>18.4f}')
+
+        parent, child = multiprocessing.Pipe()
+        server = multiprocessing.Process(target=_serve, args=(child,), daemon=True)
+        server.start()
+        endpoint = parent.recv()
+        try:
+            print(f'\n{"上传路径":<32}{"MB/s":>10}{"堆峰值(MB)":>12}')
+            for name, speed, peak in bench_end_to_end(path, chunk_size, endpoint):
+                print(f'{name:<32}{speed:>10.1f}{peak:>12.1f}')
+        finally:
+            parent.send('stop')
+            server.join(timeout=5)
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,355 @@
+"""
+上传引擎基准测试
+
+在本地S3替身服务上，以不同的文件大小分布、线程数和分片大小驱动
+UploadManager / S3ClientWrapper，输出吞吐、延迟、CPU和峰值内存，
+并保存为JSON以便与历史结果比较。
+
+Usage:
+    python -m benchmarks.run_benchmarks
+    python -m benchmarks.run_benchmarks --profiles mixed --threads 1,4,8 --chunk-mb 5,16
+    python -m benchmarks.run_benchmarks --output new.json --compare baseline.json
+    python -m benchmarks.run_benchmarks --moto        # 使用moto服务代替内置替身
+    python -m benchmarks.run_benchmarks --encryption  # 比较明文与客户端加密的吞吐
+    python -m benchmarks.run_benchmarks --profiles huge --threads 4 --trace traces/   # 每个用例输出追踪时间线
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+try:
+    import resource
+    HAVE_RESOURCE = True
+except ImportError:
+    HAVE_RESOURCE = False
+
+try:
+    import psutil
+    HAVE_PSUTIL = True
+except ImportError:
+    HAVE_PSUTIL = False
+
+# 允许直接以脚本方式运行
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.s3_stub import S3StubServer
+
+
+MiB = 1024 * 1024
+
+# 文件大小分布：名称 -> (文件数量, 大小生成函数)
+PROFILES = {
+    'tiny': (2000, lambda rng: 4 * 1024),
+    'mixed': (200, lambda rng: int(2 ** rng.uniform(12, 24))),   # 4 KiB ~ 16 MiB 对数均匀
+    'huge': (2, lambda rng: 256 * MiB),
+}
+
+BUCKET = 'bench'
+
+
+# ==================== 测试数据 ====================
+
+def generate_files(directory: Path, profile: str, scale: float, seed: int = 42) -> list:
+    """按分布生成测试文件（内容随机，避免被压缩或去重）"""
+    count, size_fn = PROFILES[profile]
+    count = max(1, int(count * scale))
+    rng = random.Random(seed)
+    block = os.urandom(MiB)
+
+    paths = []
+    for i in range(count):
+        size = size_fn(rng)
+        if profile == 'huge':
+            size = max(MiB, int(size * scale))
+        path = directory / f'{profile}_{i:05d}.bin'
+        with open(path, 'wb') as f:
+            remaining = size
+            while remaining:
+                n = min(remaining, len(block))
+                f.write(block[:n])
+                remaining -= n
+        paths.append(str(path))
+    return paths
+
+
+# ==================== 资源统计 ====================
+
+def peak_rss_mb() -> float:
+    """当前进程的峰值常驻内存（MB）"""
+    if HAVE_RESOURCE:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux单位为KB，macOS为字节
+        return peak / (MiB if sys.platform == 'darwin' else 1024)
+    if HAVE_PSUTIL:
+        info = psutil.Process().memory_info()
+        return getattr(info, 'peak_wset', info.rss) / MiB
+    return 0.0
+
+
+def percentile(values: list, pct: float) -> float:
+    """最近秩百分位数"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = math.ceil(pct / 100 * len(ordered))
+    return ordered[min(len(ordered), max(1, rank)) - 1]
+
+
+# ==================== 单个用例 ====================
+
+def start_server(use_moto: bool):
+    """启动S3替身服务，返回 (endpoint, 停止函数)"""
+    if use_moto:
+        from moto.server import ThreadedMotoServer
+        server = ThreadedMotoServer(ip_address='127.0.0.1', port=0)
+        server.start()
+        host, port = server.get_host_and_port()
+        endpoint = f'http://{host}:{port}'
+        import boto3
+        boto3.client('s3', endpoint_url=endpoint, region_name='us-east-1',
+                     aws_access_key_id='bench', aws_secret_access_key='bench'
+                     ).create_bucket(Bucket=BUCKET)
+        return endpoint, server.stop
+
+    stub = S3StubServer().start()
+    return stub.endpoint, stub.stop
+
+
+def run_case(profile: str, threads: int, chunk_mb: int, scale: float, use_moto: bool,
+             extra_config: dict = None, trace_path: str = None) -> dict:
+    """在当前进程中运行一个用例（峰值内存只对单个用例有意义，由父进程逐个拉起）"""
+    from core.upload_manager import UploadManager
+    from core.tracing import get_tracer
+
+    work_dir = Path(tempfile.mkdtemp(prefix='s3bench_'))
+    endpoint, stop_server = start_server(use_moto)
+    try:
+        files = generate_files(work_dir, profile, scale)
+        total_bytes = sum(os.path.getsize(p) for p in files)
+
+        manager = UploadManager()
+        manager.add_files(files)
+        done = threading.Event()
+        manager.on_all_complete = done.set
+
+        s3_config = {
+            'endpoint': endpoint,
+            'access_key': 'bench',
+            'secret_key': 'bench',
+            'bucket': BUCKET,
+            'prefix': f'{profile}-{threads}-{chunk_mb}',
+            'make_public': False,
+            'chunk_size': chunk_mb * MiB,
+        }
+        s3_config.update(extra_config or {})
+
+        tracer = get_tracer()
+        if trace_path:
+            tracer.start(sample_interval=0.005)
+
+        cpu_start = time.process_time()
+        wall_start = time.perf_counter()
+        manager.start_upload(s3_config, threads)
+        done.wait()
+        cpu = time.process_time() - cpu_start
+
+        if trace_path:
+            tracer.stop()
+            tracer.save(trace_path)
+
+        tasks = manager.current_batch_tasks
+        failed = [t for t in tasks if t.status != 'completed']
+        latencies = [(t.finished_at - t.started_at) * 1000 for t in tasks if t.finished_at]
+        # 计时到最后一个任务完成为止，不含工作线程等待队列超时退出和监控线程轮询的空闲时间
+        finished = [t.finished_at for t in tasks if t.finished_at]
+        wall = (max(finished) if finished else time.perf_counter()) - wall_start
+
+        return {
+            'profile': profile,
+            'threads': threads,
+            'chunk_mb': chunk_mb,
+            'files': len(files),
+            'failed': len(failed),
+            'first_error': failed[0].error_message if failed else '',
+            'bytes': total_bytes,
+            'seconds': round(wall, 4),
+            'mb_per_s': round(total_bytes / MiB / wall, 2) if wall else 0.0,
+            'objects_per_s': round(len(files) / wall, 2) if wall else 0.0,
+            'latency_p50_ms': round(percentile(latencies, 50), 2),
+            'latency_p99_ms': round(percentile(latencies, 99), 2),
+            'cpu_seconds': round(cpu, 3),
+            'cpu_percent': round(cpu / wall * 100, 1) if wall else 0.0,
+            'peak_rss_mb': round(peak_rss_mb(), 1),
+        }
+    finally:
+        stop_server()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def run_case_subprocess(case: dict) -> dict:
+    """在独立子进程中运行用例，保证峰值内存统计互不干扰"""
+    cmd = [sys.executable, '-m', 'benchmarks.run_benchmarks', '--single-case', json.dumps(case)]
+    root = Path(__file__).resolve().parent.parent
+    proc = subprocess.run(cmd, cwd=str(root), capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f'用例执行失败: {case}\n{proc.stderr}')
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+# ==================== 结果比较 ====================
+
+def case_id(result: dict) -> tuple:
+    return result['profile'], result['threads'], result['chunk_mb'], result.get('variant', '')
+
+
+def compare_results(current: list, baseline_path: str, threshold: float) -> bool:
+    """
+    与历史结果比较，打印变化百分比
+
+    Returns:
+        是否存在超过阈值的吞吐退化
+    """
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = {case_id(r): r for r in json.load(f)['results']}
+
+    regressed = False
+    print(f'\n与基线比较: {baseline_path}')
+    print(f'{"用例":<28}{"MB/s":>10}{"基线":>10}{"变化":>9}{"p99(ms)":>10}{"RSS(MB)":>10}')
+    for result in current:
+        old = baseline.get(case_id(result))
+        name = '/'.join(str(x) for x in case_id(result) if x != '')
+        if not old:
+            print(f'{name:<28}{result["mb_per_s"]:>10}{"-":>10}')
+            continue
+        change = (result['mb_per_s'] - old['mb_per_s']) / old['mb_per_s'] * 100 if old['mb_per_s'] else 0
+        flag = ''
+        if change < -threshold:
+            regressed = True
+            flag = '  ⚠ 退化'
+        print(f'{name:<28}{result["mb_per_s"]:>10}{old["mb_per_s"]:>10}{change:>8.1f}%'
+              f'{result["latency_p99_ms"]:>10}{result["peak_rss_mb"]:>10}{flag}')
+    return regressed
+
+
+# ==================== 入口 ====================
+
+def build_cases(args) -> list:
+    """展开参数组合为用例列表"""
+    variants = [('', {})]
+    if args.encryption:
+        from core.encryption import EnvelopeEncryption
+        variants = [('plain', {}),
+                    ('aes-gcm', {'encryption_key': EnvelopeEncryption.generate_key()})]
+
+    cases = []
+    for profile in args.profiles.split(','):
+        for threads in (int(x) for x in args.threads.split(',')):
+            for chunk_mb in (int(x) for x in args.chunk_mb.split(',')):
+                for variant, variant_config in variants:
+                    case = {
+                        'profile': profile,
+                        'threads': threads,
+                        'chunk_mb': chunk_mb,
+                        'scale': args.scale,
+                        'use_moto': args.moto,
+                        'extra_config': dict(variant_config),
+                    }
+                    if variant:
+                        case['variant'] = variant
+                    if args.buffer_pool_mb:
+                        case['extra_config']['buffer_pool_mb'] = args.buffer_pool_mb
+                    if args.trace:
+                        os.makedirs(args.trace, exist_ok=True)
+                        name = '-'.join(str(x) for x in (profile, threads, chunk_mb, variant) if x != '')
+                        case['trace_path'] = os.path.abspath(os.path.join(args.trace, f'{name}.json'))
+                    cases.append(case)
+    return cases
+
+
+def print_encryption_overhead(results: list):
+    """打印加密与明文吞吐之比"""
+    plain = {case_id(r)[:3]: r for r in results if r.get('variant') == 'plain'}
+    print(f'\n{"用例":<28}{"明文MB/s":>10}{"加密MB/s":>10}{"吞吐比":>8}{"CPU%差":>9}')
+    for result in results:
+        if result.get('variant') != 'aes-gcm' or case_id(result)[:3] not in plain:
+            continue
+        base = plain[case_id(result)[:3]]
+        ratio = result['mb_per_s'] / base['mb_per_s'] if base['mb_per_s'] else 0
+        name = '/'.join(str(x) for x in case_id(result)[:3])
+        print(f'{name:<28}{base["mb_per_s"]:>10}{result["mb_per_s"]:>10}{ratio:>8.2f}'
+              f'{result["cpu_percent"] - base["cpu_percent"]:>9.1f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='S3上传引擎基准测试')
+    parser.add_argument('--profiles', default='tiny,mixed,huge', help='文件大小分布，逗号分隔')
+    parser.add_argument('--threads', default='1,4,8', help='并发线程数，逗号分隔')
+    parser.add_argument('--chunk-mb', default='5,16', help='分片大小(MB)，逗号分隔')
+    parser.add_argument('--scale', type=float, default=1.0, help='文件数量/大小缩放系数')
+    parser.add_argument('--moto', action='store_true', help='使用moto服务代替内置替身')
+    parser.add_argument('--output', default='benchmark_results.json', help='结果输出文件')
+    parser.add_argument('--compare', help='与之比较的历史结果JSON')
+    parser.add_argument('--threshold', type=float, default=10.0, help='吞吐退化报警阈值(%%)')
+    parser.add_argument('--encryption', action='store_true', help='每个用例分别以明文和客户端加密运行并比较')
+    parser.add_argument('--buffer-pool-mb', type=int, help='分片缓冲池容量(MB)，默认使用UploadManager的默认值')
+    parser.add_argument('--trace', help='为每个用例输出Chrome Trace时间线的目录（含采样分析）')
+    parser.add_argument('--single-case', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single_case:
+        case = json.loads(args.single_case)
+        variant = case.pop('variant', '')
+        result = run_case(**case)
+        if variant:
+            result['variant'] = variant
+        print(json.dumps(result))
+        return
+
+    results = []
+    print(f'{"用例":<28}{"MB/s":>10}{"obj/s":>10}{"p50(ms)":>10}{"p99(ms)":>10}'
+          f'{"CPU%":>8}{"RSS(MB)":>10}')
+    for case in build_cases(args):
+        result = run_case_subprocess(case)
+        results.append(result)
+        name = '/'.join(str(x) for x in case_id(result) if x != '')
+        print(f'{name:<28}{result["mb_per_s"]:>10}{result["objects_per_s"]:>10}'
+              f'{result["latency_p50_ms"]:>10}{result["latency_p99_ms"]:>10}'
+              f'{result["cpu_percent"]:>8}{result["peak_rss_mb"]:>10}')
+        if result['failed']:
+            print(f'    ⚠ {result["failed"]} 个文件失败: {result["first_error"]}')
+
+    if args.encryption:
+        print_encryption_overhead(results)
+
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'server': 'moto' if args.moto else 'stub',
+            'scale': args.scale,
+        },
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f'\n结果已保存: {args.output}')
+
+    if args.compare and compare_results(results, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,292 @@
+"""
+本地S3兼容替身服务
+进程内的最小HTTP服务，只实现上传/下载基准测试用到的接口，不校验签名
+
+支持的接口（路径风格寻址）：
+- PUT /bucket/key                       PutObject
+- POST /bucket/key?uploads              CreateMultipartUpload
+- PUT /bucket/key?partNumber&uploadId   UploadPart
+- POST /bucket/key?uploadId             CompleteMultipartUpload
+- DELETE /bucket/key?uploadId           AbortMultipartUpload
+- HEAD/GET /bucket/key                  HeadObject / GetObject（支持Range）
+- GET /bucket?list-type=2               ListObjectsV2（单页）
+- GET /                                 ListBuckets
+"""
+
+import hashlib
+import threading
+import uuid
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+from xml.sax.saxutils import escape
+
+
+class StubObject:
+    """替身服务中的对象（默认只记录大小和ETag，不保存数据）"""
+
+    def __init__(self, size: int, etag: str, data: bytes = b'', metadata: dict = None):
+        self.size = size
+        self.etag = etag
+        self.data = data
+        self.metadata = metadata or {}
+        self.last_modified = formatdate(usegmt=True)
+
+
+class S3StubServer:
+    """进程内S3替身服务"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, keep_data: bool = False):
+        """
+        Args:
+            host: 监听地址
+            port: 监听端口（0表示自动分配）
+            keep_data: 是否保存对象数据（下载基准需要）
+        """
+        self.keep_data = keep_data
+        self.objects = {}   # (bucket, key) -> StubObject
+        self.uploads = {}   # upload_id -> {part_number: (size, md5, data)}
+        self.upload_metadata = {}   # upload_id -> 创建分片上传时的元数据
+        self.lock = threading.Lock()
+        self.request_count = 0
+
+        handler = type('Handler', (_StubHandler,), {'stub': self})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def endpoint(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self) -> 'S3StubServer':
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True,
+                                        name='S3Stub')
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    """请求处理（HTTP/1.1长连接，与真实服务一样复用连接）"""
+
+    protocol_version = 'HTTP/1.1'
+    stub: S3StubServer = None
+
+    def log_message(self, format, *args):
+        pass  # 基准测试时不输出访问日志
+
+    # ==================== 工具方法 ====================
+
+    def _parse(self):
+        parts = urlsplit(self.path)
+        query = parse_qs(parts.query, keep_blank_values=True)
+        path = unquote(parts.path).lstrip('/')
+        bucket, _, key = path.partition('/')
+        with self.stub.lock:
+            self.stub.request_count += 1
+        return bucket, key, query
+
+    def _read_body(self, keep: bool):
+        """读取请求体，边读边计算MD5；不保存数据时内存占用恒定"""
+        md5 = hashlib.md5()
+        chunks = []
+        size = 0
+
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            while True:
+                line = self.rfile.readline().split(b';')[0].strip()
+                length = int(line or b'0', 16)
+                if length == 0:
+                    while self.rfile.readline() not in (b'\r\n', b'\n', b''):
+                        pass
+                    break
+                chunk = self.rfile.read(length)
+                self.rfile.readline()
+                md5.update(chunk)
+                size += len(chunk)
+                if keep:
+                    chunks.append(chunk)
+        else:
+            remaining = int(self.headers.get('Content-Length', 0))
+            while remaining:
+                chunk = self.rfile.read(min(remaining, 1024 * 1024))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                md5.update(chunk)
+                size += len(chunk)
+                if keep:
+                    chunks.append(chunk)
+        return size, md5, b''.join(chunks)
+
+    def _send(self, status: int, body: bytes = b'', headers: dict = None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if body and self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def _send_xml(self, xml: str):
+        self._send(200, xml.encode('utf-8'), {'Content-Type': 'application/xml'})
+
+    def _not_found(self):
+        self._send_xml_error(404, 'NoSuchKey')
+
+    def _send_xml_error(self, status: int, code: str):
+        body = f'<?xml version="1.0" encoding="UTF-8"?><Error><Code>{code}</Code></Error>'
+        self._send(status, body.encode('utf-8'), {'Content-Type': 'application/xml'})
+
+    def _metadata_headers(self) -> dict:
+        # 预签名请求的元数据在查询参数中
+        query = parse_qs(urlsplit(self.path).query)
+        items = list(self.headers.items()) + [(k, v[0]) for k, v in query.items()]
+        return {k[len('x-amz-meta-'):]: v for k, v in items
+                if k.lower().startswith('x-amz-meta-')}
+
+    # ==================== 请求处理 ====================
+
+    def do_PUT(self):
+        bucket, key, query = self._parse()
+        if 'uploadId' in query:
+            size, md5, data = self._read_body(self.stub.keep_data)
+            upload_id = query['uploadId'][0]
+            part_number = int(query['partNumber'][0])
+            with self.stub.lock:
+                parts = self.stub.uploads.get(upload_id)
+                if parts is None:
+                    return self._send_xml_error(404, 'NoSuchUpload')
+                parts[part_number] = (size, md5.digest(), data)
+            return self._send(200, headers={'ETag': f'"{md5.hexdigest()}"'})
+
+        size, md5, data = self._read_body(self.stub.keep_data)
+        etag = f'"{md5.hexdigest()}"'
+        with self.stub.lock:
+            self.stub.objects[(bucket, key)] = StubObject(size, etag, data, self._metadata_headers())
+        self._send(200, headers={'ETag': etag})
+
+    def do_POST(self):
+        bucket, key, query = self._parse()
+        if 'uploads' in query:
+            self._read_body(False)
+            upload_id = uuid.uuid4().hex
+            with self.stub.lock:
+                self.stub.uploads[upload_id] = {}
+                self.stub.upload_metadata[upload_id] = self._metadata_headers()
+            return self._send_xml(
+                '<?xml version="1.0" encoding="UTF-8"?><InitiateMultipartUploadResult>'
+                f'<Bucket>{escape(bucket)}</Bucket><Key>{escape(key)}</Key>'
+                f'<UploadId>{upload_id}</UploadId></InitiateMultipartUploadResult>'
+            )
+
+        if 'uploadId' in query:
+            self._read_body(False)
+            upload_id = query['uploadId'][0]
+            with self.stub.lock:
+                parts = self.stub.uploads.pop(upload_id, None)
+                metadata = self.stub.upload_metadata.pop(upload_id, {})
+            if parts is None:
+                return self._send_xml_error(404, 'NoSuchUpload')
+            ordered = [parts[n] for n in sorted(parts)]
+            digest = hashlib.md5(b''.join(p[1] for p in ordered)).hexdigest()
+            etag = f'"{digest}-{len(ordered)}"'
+            with self.stub.lock:
+                self.stub.objects[(bucket, key)] = StubObject(
+                    sum(p[0] for p in ordered), etag, b''.join(p[2] for p in ordered), metadata
+                )
+            return self._send_xml(
+                '<?xml version="1.0" encoding="UTF-8"?><CompleteMultipartUploadResult>'
+                f'<Bucket>{escape(bucket)}</Bucket><Key>{escape(key)}</Key>'
+                f'<ETag>{escape(etag)}</ETag></CompleteMultipartUploadResult>'
+            )
+
+        self._send_xml_error(400, 'InvalidRequest')
+
+    def do_DELETE(self):
+        bucket, key, query = self._parse()
+        with self.stub.lock:
+            if 'uploadId' in query:
+                self.stub.uploads.pop(query['uploadId'][0], None)
+                self.stub.upload_metadata.pop(query['uploadId'][0], None)
+            else:
+                self.stub.objects.pop((bucket, key), None)
+        self._send(204)
+
+    def do_HEAD(self):
+        self.do_GET()
+
+    def do_GET(self):
+        bucket, key, query = self._parse()
+        if not bucket:
+            return self._send_xml(
+                '<?xml version="1.0" encoding="UTF-8"?><ListAllMyBucketsResult>'
+                '<Buckets><Bucket><Name>bench</Name></Bucket></Buckets></ListAllMyBucketsResult>'
+            )
+        if not key:
+            return self._list_objects(bucket, query)
+
+        with self.stub.lock:
+            obj = self.stub.objects.get((bucket, key))
+        if obj is None:
+            return self._not_found()
+
+        headers = {'ETag': obj.etag, 'Last-Modified': obj.last_modified,
+                   'Content-Type': 'application/octet-stream'}
+        for name, value in obj.metadata.items():
+            headers[f'x-amz-meta-{name}'] = value
+
+        status = 200
+        start, end = 0, obj.size - 1
+        range_header = self.headers.get('Range')
+        if range_header and range_header.startswith('bytes='):
+            first, _, last = range_header[6:].partition('-')
+            start = int(first)
+            end = min(int(last) if last else end, end)
+            headers['Content-Range'] = f'bytes {start}-{end}/{obj.size}'
+            status = 206
+
+        if self.command == 'HEAD':
+            headers['Content-Length'] = str(end - start + 1)
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            return
+
+        if self.stub.keep_data:
+            data = obj.data[start:end + 1]
+        else:
+            data = bytes(end - start + 1)
+        self._send(status, data, headers)
+
+    def _list_objects(self, bucket: str, query: dict):
+        prefix = query.get('prefix', [''])[0]
+        with self.stub.lock:
+            items = sorted(
+                (k, o) for (b, k), o in self.stub.objects.items()
+                if b == bucket and k.startswith(prefix)
+            )
+        contents = ''.join(
+            f'<Contents><Key>{escape(k)}</Key><Size>{o.size}</Size>'
+            f'<ETag>{escape(o.etag)}</ETag><LastModified>2024-01-01T00:00:00.000Z</LastModified>'
+            '</Contents>'
+            for k, o in items
+        )
+        self._send_xml(
+            '<?xml version="1.0" encoding="UTF-8"?><ListBucketResult>'
+            f'<Name>{escape(bucket)}</Name><Prefix>{escape(prefix)}</Prefix>'
+            f'<KeyCount>{len(items)}</KeyCount><IsTruncated>false</IsTruncated>'
+            f'{contents}</ListBucketResult>'
+        )
@@ -3,15 +3,62 @@ Core module for S3 Uploader
 核心功能模块
 """
 
-from core.s3_client import S3ClientWrapper, URLGenerator, ProgressCallback
-from core.upload_manager import UploadManager, UploadTask
+from core.s3_client import S3ClientWrapper, URLGenerator, ProgressCallback, PartReader, ContentTypeResolver
+from core.upload_manager import UploadManager, UploadTask, StreamUploadTask, DerivativeUploadTask
 from core.config_manager import ConfigManager
+from core.buffer_pool import BufferPool
+from core.compression import CompressionStage
+from core.encryption import EnvelopeEncryption
+from core.image_derivatives import ImageDerivativeStage
+from core.upload_rules import UploadRules
+from core.object_index import ObjectIndex
+from core.sync_manager import SyncManager, SyncAction
+from core.download_manager import DownloadTask, RangedDownloader
+from core.bulk_operations import BulkOperationRunner, BulkResult
+from core.folder_watcher import FolderWatcher
+from core.batch_links import BatchLinks
+from core.presign import Presigner
+from core.presigned_upload import SigningService, PresignedClient
+from core.process_uploader import ProcessUploadBackend
+from core.file_scanner import FileScanner
+from core.client_pool import ClientPool
+from core.events import EventBus, TaskProgress, TaskCompleted, TaskFailed, AllCompleted, ScanProgress
 
 __all__ = [
     'S3ClientWrapper',
     'URLGenerator', 
     'ProgressCallback',
+    'PartReader',
+    'ContentTypeResolver',
     'UploadManager',
     'UploadTask',
-    'ConfigManager'
+    'StreamUploadTask',
+    'DerivativeUploadTask',
+    'ConfigManager',
+    'BufferPool',
+    'CompressionStage',
+    'EnvelopeEncryption',
+    'ImageDerivativeStage',
+    'UploadRules',
+    'ObjectIndex',
+    'SyncManager',
+    'SyncAction',
+    'DownloadTask',
+    'RangedDownloader',
+    'BulkOperationRunner',
+    'BulkResult',
+    'FolderWatcher',
+    'BatchLinks',
+    'Presigner',
+    'SigningService',
+    'PresignedClient',
+    'ProcessUploadBackend',
+    'FileScanner',
+    'ClientPool',
+    'EventBus',
+    'TaskProgress',
+    'TaskCompleted',
+    'TaskFailed',
+    'AllCompleted',
+    'ScanProgress'
 ]
\ No newline at end of file
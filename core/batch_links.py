@@ -0,0 +1,104 @@
+"""
+批次链接汇总
+收集一批上传完成的对象（对象键、大小、ETag、链接），
+批次结束时一次性复制到剪贴板，或导出为CSV/JSON/Markdown
+"""
+
+import csv
+import io
+import json
+import os
+import threading
+from typing import List, Optional
+
+
+class LinkRecord:
+    """一个已上传对象"""
+
+    __slots__ = ('key', 'filename', 'size', 'etag', 'url')
+
+    def __init__(self, key: str, filename: str, size: int, etag: str, url: Optional[str]):
+        self.key = key
+        self.filename = filename
+        self.size = size
+        self.etag = (etag or '').strip('"')
+        self.url = url or ''
+
+    def to_dict(self) -> dict:
+        return {'key': self.key, 'size': self.size, 'etag': self.etag, 'url': self.url}
+
+
+class BatchLinks:
+    """一批上传的链接（线程安全）"""
+
+    FORMATS = ('csv', 'json', 'md')
+
+    def __init__(self):
+        self.records: List[LinkRecord] = []
+        self._lock = threading.Lock()
+
+    def add(self, task):
+        """记录上传完成的任务"""
+        record = LinkRecord(task.key, task.filename, task.filesize, task.etag, task.public_url)
+        with self._lock:
+            self.records.append(record)
+
+    def clear(self):
+        with self._lock:
+            self.records = []
+
+    def snapshot(self) -> List[LinkRecord]:
+        with self._lock:
+            return list(self.records)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def clipboard_text(self) -> str:
+        """所有链接，每行一个（用于一次性复制到剪贴板）"""
+        return '\n'.join(r.url for r in self.snapshot() if r.url)
+
+    def to_csv(self) -> str:
+        output = io.StringIO()
+        writer = csv.writer(output, lineterminator='\n')
+        writer.writerow(['key', 'size', 'etag', 'url'])
+        for r in self.snapshot():
+            writer.writerow([r.key, r.size, r.etag, r.url])
+        return output.getvalue()
+
+    def to_json(self) -> str:
+        return json.dumps([r.to_dict() for r in self.snapshot()], ensure_ascii=False, indent=2)
+
+    def to_markdown(self) -> str:
+        def cell(value) -> str:
+            return str(value).replace('|', '\\|')
+
+        lines = ['| 对象键 | 大小 | ETag | 链接 |', '| --- | ---: | --- | --- |']
+        for r in self.snapshot():
+            link = f'[{cell(r.filename)}](<{r.url}>)' if r.url else ''
+            lines.append(f'| {cell(r.key)} | {r.size} | {r.etag} | {link} |')
+        return '\n'.join(lines) + '\n'
+
+    def export(self, path: str, fmt: Optional[str] = None) -> int:
+        """
+        导出到文件
+
+        Args:
+            path: 文件路径
+            fmt: csv / json / md（默认按扩展名判断）
+
+        Returns:
+            导出的记录数
+        """
+        fmt = fmt or os.path.splitext(path)[1].lstrip('.').lower()
+        if fmt == 'markdown':
+            fmt = 'md'
+        if fmt not in self.FORMATS:
+            raise ValueError(f'不支持的导出格式: {fmt}（可选 csv / json / md）')
+
+        content = {'csv': self.to_csv, 'json': self.to_json, 'md': self.to_markdown}[fmt]()
+        # CSV带BOM，Excel可直接打开中文
+        encoding = 'utf-8-sig' if fmt == 'csv' else 'utf-8'
+        with open(path, 'w', encoding=encoding, newline='') as f:
+            f.write(content)
+        return len(self.records)
@@ -0,0 +1,122 @@
+"""
+缓冲池
+加密分片和流式上传共用的定容缓冲区，容量耗尽时阻塞等待（反压），
+使上传占用的数据内存上限由一个配置项决定，而不是线程数×分片并发×分片大小
+"""
+
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+
+MiB = 1024 * 1024
+
+
+class BufferPool:
+    """定容缓冲池（线程安全）"""
+
+    # 小于1MB的缓冲按2的幂取整，以便不同大小的小文件复用同一缓冲
+    MIN_BUFFER = 4 * 1024
+
+    def __init__(self, capacity: int):
+        """
+        Args:
+            capacity: 容量上限（字节），包括正在使用和空闲缓存的缓冲区
+        """
+        if capacity <= 0:
+            raise ValueError('缓冲池容量必须大于0')
+        self.capacity = capacity
+        self.in_use = 0
+        self.cached = 0
+        self._free: Dict[int, List[bytearray]] = {}
+        self._cond = threading.Condition()
+        # 因容量不足而等待的次数（用于观察反压）
+        self.wait_count = 0
+
+    @classmethod
+    def size_class(cls, size: int) -> int:
+        """请求大小对应的缓冲区大小"""
+        if size >= MiB:
+            return -(-size // MiB) * MiB
+        return max(cls.MIN_BUFFER, 1 << (size - 1).bit_length())
+
+    def ensure_capacity(self, capacity: int):
+        """容量小于capacity时扩大到capacity（只增不减）"""
+        with self._cond:
+            if capacity > self.capacity:
+                self.capacity = capacity
+                self._cond.notify_all()
+
+    def acquire(self, size: int, timeout: Optional[float] = None) -> bytearray:
+        """
+        获取至少size字节的缓冲区，容量不足时阻塞
+
+        Raises:
+            ValueError: 请求大小超过缓冲池容量
+            TimeoutError: 超时仍未获得缓冲区
+        """
+        size = self.size_class(size)
+        if size > self.capacity:
+            raise ValueError(f'分片大小 {size} 超过缓冲池容量 {self.capacity}，请增大 buffer_pool_mb')
+
+        with self._cond:
+            free = self._free.get(size)
+            if free:
+                self.cached -= size
+                self.in_use += size
+                return free.pop()
+
+            waited = False
+            while self.in_use + size > self.capacity:
+                if not waited:
+                    self.wait_count += 1
+                    waited = True
+                if not self._cond.wait(timeout):
+                    raise TimeoutError('等待缓冲区超时')
+                # 等待期间可能有同样大小的缓冲被归还
+                free = self._free.get(size)
+                if free:
+                    self.cached -= size
+                    self.in_use += size
+                    return free.pop()
+
+            # 空闲缓存挤占了容量时，先释放其他大小的缓冲
+            self._evict(self.in_use + self.cached + size - self.capacity)
+            self.in_use += size
+
+        return bytearray(size)
+
+    def release(self, buffer: bytearray):
+        """归还缓冲区"""
+        size = len(buffer)
+        with self._cond:
+            self.in_use -= size
+            self.cached += size
+            self._free.setdefault(size, []).append(buffer)
+            self._cond.notify_all()
+
+    @contextmanager
+    def buffer(self, size: int, timeout: Optional[float] = None):
+        """
+        Usage:
+            with pool.buffer(part_size) as buf:
+                ...
+        """
+        buffer = self.acquire(size, timeout)
+        try:
+            yield buffer
+        finally:
+            self.release(buffer)
+
+    def _evict(self, amount: int):
+        """丢弃至少amount字节的空闲缓存（调用方持有锁）"""
+        for size in sorted(self._free, reverse=True):
+            free = self._free[size]
+            while free and amount > 0:
+                free.pop()
+                self.cached -= size
+                amount -= size
+            if not free:
+                del self._free[size]
+            if amount <= 0:
+                break
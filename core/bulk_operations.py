@@ -0,0 +1,188 @@
+"""
+存储桶批量操作
+基于服务端复制和批量删除，实现前缀级别的复制、移动和删除
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, Optional
+
+from core.s3_client import S3ClientWrapper
+from core.object_index import ObjectIndex
+
+
+class BulkResult:
+    """批量操作结果"""
+
+    def __init__(self):
+        self.succeeded = 0
+        self.failed = 0
+        self.bytes = 0
+        self.errors = []  # (key, 错误信息)
+        self._lock = threading.Lock()
+
+    def add_success(self, size: int = 0, count: int = 1):
+        with self._lock:
+            self.succeeded += count
+            self.bytes += size
+
+    def add_error(self, key: str, message: str):
+        with self._lock:
+            self.failed += 1
+            self.errors.append((key, message))
+
+    def __str__(self):
+        return f'成功 {self.succeeded} 个，失败 {self.failed} 个，共 {self.bytes} 字节'
+
+
+class BulkOperationRunner:
+    """
+    批量操作执行器
+
+    边列举边提交：列举生成器产生的对象直接进入有界的线程池，
+    在途任务数受限，百万级对象的前缀也不会一次性载入内存。
+    """
+
+    def __init__(self, client: S3ClientWrapper, max_workers: int = 10,
+                 object_index: Optional[ObjectIndex] = None):
+        """
+        Args:
+            client: S3客户端（boto3客户端线程安全，所有线程共用）
+            max_workers: 并发请求数（默认与botocore连接池大小一致）
+            object_index: 对象索引（可选，操作成功后同步更新）
+        """
+        self.client = client
+        self.max_workers = max_workers
+        self.object_index = object_index
+        self.stop_flag = threading.Event()
+
+        # 进度回调：on_progress(result)
+        self.on_progress: Optional[Callable] = None
+
+    def stop(self):
+        """停止提交新的操作"""
+        self.stop_flag.set()
+
+    # ==================== 通用执行 ====================
+
+    def run(self, items: Iterable, fn: Callable) -> BulkResult:
+        """
+        并发执行 fn(item, result)，items 可以是惰性生成器
+
+        Args:
+            items: 待处理对象
+            fn: 处理函数，成功/失败需自行记录到result
+
+        Returns:
+            BulkResult
+        """
+        result = BulkResult()
+        slots = threading.BoundedSemaphore(self.max_workers * 2)
+
+        def task(item):
+            try:
+                fn(item, result)
+            except Exception as e:
+                key = item.get('Key', '') if isinstance(item, dict) else str(item)
+                result.add_error(key, str(e))
+            finally:
+                slots.release()
+                if self.on_progress:
+                    self.on_progress(result)
+
+        self.stop_flag.clear()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            for item in items:
+                if self.stop_flag.is_set():
+                    break
+                slots.acquire()
+                pool.submit(task, item)
+        return result
+
+    @staticmethod
+    def _batched(objects: Iterable[dict], size: int) -> Iterator[list]:
+        """把对象流切分为固定大小的批次"""
+        batch = []
+        for obj in objects:
+            batch.append(obj)
+            if len(batch) >= size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    # ==================== 批量操作 ====================
+
+    def copy_prefix(self, bucket: str, src_prefix: str, dst_prefix: str,
+                    dst_bucket: Optional[str] = None, make_public: bool = False) -> BulkResult:
+        """
+        服务端复制整个前缀
+
+        Args:
+            bucket: 源存储桶
+            src_prefix: 源前缀
+            dst_prefix: 目标前缀（替换源前缀部分）
+            dst_bucket: 目标存储桶（默认与源相同）
+            make_public: 是否设置为公开可读
+        """
+        dst_bucket = dst_bucket or bucket
+        copy = self._make_copy_fn(bucket, src_prefix, dst_bucket, dst_prefix, make_public)
+        return self.run(self.client.iter_objects(bucket, src_prefix), copy)
+
+    def move_prefix(self, bucket: str, src_prefix: str, dst_prefix: str,
+                    dst_bucket: Optional[str] = None, make_public: bool = False) -> BulkResult:
+        """
+        移动（重命名）整个前缀：服务端复制后批量删除源对象
+
+        只有复制成功的对象才会被删除。
+        """
+        dst_bucket = dst_bucket or bucket
+        copied = []
+        copy = self._make_copy_fn(bucket, src_prefix, dst_bucket, dst_prefix, make_public, copied)
+        result = self.run(self.client.iter_objects(bucket, src_prefix), copy)
+        if self.stop_flag.is_set():
+            return result
+
+        delete_result = self.delete_keys(bucket, copied)
+        for key, message in delete_result.errors:
+            result.add_error(key, f'删除源对象失败: {message}')
+        return result
+
+    def delete_prefix(self, bucket: str, prefix: str) -> BulkResult:
+        """批量删除前缀下所有对象（每批1000个键并发提交）"""
+        keys = (obj['Key'] for obj in self.client.iter_objects(bucket, prefix))
+        return self.delete_keys(bucket, keys)
+
+    def delete_keys(self, bucket: str, keys: Iterable[str]) -> BulkResult:
+        """批量删除指定的对象键"""
+        def delete(batch, result):
+            errors = self.client.delete_objects(bucket, batch)
+            failed = {e.get('Key') for e in errors}
+            for e in errors:
+                result.add_error(e.get('Key', ''), e.get('Message', e.get('Code', '')))
+            if self.object_index:
+                self.object_index.remove(bucket, [k for k in batch if k not in failed])
+            result.add_success(count=len(batch) - len(failed))
+
+        return self.run(self._batched(keys, S3ClientWrapper.DELETE_BATCH_SIZE), delete)
+
+    def _make_copy_fn(self, bucket: str, src_prefix: str, dst_bucket: str, dst_prefix: str,
+                      make_public: bool, copied: Optional[list] = None) -> Callable:
+        """创建单个对象的复制函数"""
+        if bucket == dst_bucket and dst_prefix.startswith(src_prefix):
+            # 目标位于源前缀之内时，列举会看到新复制的对象
+            raise ValueError(f'目标前缀不能位于源前缀之内: {dst_prefix}')
+        copied_lock = threading.Lock()
+
+        def copy(obj, result):
+            dst_key = dst_prefix + obj['Key'][len(src_prefix):]
+            self.client.copy_object(bucket, obj['Key'], dst_bucket, dst_key,
+                                    size=obj['Size'], make_public=make_public)
+            if self.object_index:
+                self.object_index.record_upload(dst_bucket, dst_key, obj['Size'])
+            if copied is not None:
+                with copied_lock:
+                    copied.append(obj['Key'])
+            result.add_success(obj['Size'])
+
+        return copy
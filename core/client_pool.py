@@ -0,0 +1,197 @@
+"""
+S3客户端池
+按配置复用boto3客户端：切换配置后在后台预热（创建客户端、解析凭证、DNS解析、建立TLS连接、
+获取存储桶区域和可用的寻址方式），开始上传时工作线程直接使用预热好的客户端，
+第一个请求走已建立的keep-alive连接。
+"""
+
+import threading
+import time
+from typing import Dict, Optional
+
+from botocore.exceptions import ClientError, EndpointConnectionError
+
+from core.s3_client import S3ClientWrapper
+
+
+class PooledClient:
+    """池中的客户端及其预热结果"""
+
+    def __init__(self):
+        self.client = None
+        # 存储桶所在区域（预热时从 x-amz-bucket-region 获取）
+        self.region: Optional[str] = None
+        # 实际使用的寻址方式（None表示botocore默认）
+        self.addressing_style: Optional[str] = None
+        # 预热耗时（秒）和错误
+        self.elapsed = 0.0
+        self.error: Optional[str] = None
+        # created: 客户端已创建（上传可以使用）；ready: 预热结束
+        self.created = threading.Event()
+        self.ready = threading.Event()
+        self.last_used = time.monotonic()
+
+
+class ClientPool:
+    """按 端点 + 凭证 + 区域 + 寻址方式 复用的boto3客户端（线程安全）"""
+
+    # 所有工作线程共用一个客户端，连接池按 10线程 × 分片并发 预留
+    MAX_POOL_CONNECTIONS = 64
+    # 最多保留的客户端数（超出时丢弃最久未使用的）
+    MAX_CLIENTS = 4
+
+    def __init__(self):
+        self._entries: Dict[tuple, PooledClient] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(s3_config: dict) -> Optional[tuple]:
+        """客户端的复用键（预签名上传模式不使用boto3客户端，返回None）"""
+        if s3_config.get('signing_url') or not s3_config.get('endpoint'):
+            return None
+        return (
+            s3_config['endpoint'].strip(),
+            s3_config.get('access_key') or None,
+            s3_config.get('secret_key') or None,
+            s3_config.get('region') or None,
+            s3_config.get('addressing_style') or None,
+        )
+
+    def _create(self, key: tuple, region: Optional[str], addressing_style: Optional[str]):
+        endpoint, access_key, secret_key = key[:3]
+        return S3ClientWrapper(
+            endpoint_url=endpoint,
+            access_key=access_key,
+            secret_key=secret_key,
+            region_name=region,
+            addressing_style=addressing_style,
+            max_pool_connections=self.MAX_POOL_CONNECTIONS
+        )
+
+    def _claim(self, key: tuple) -> tuple:
+        """取得键对应的条目，返回 (条目, 是否由调用方负责创建)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                return entry, False
+            entry = self._entries[key] = PooledClient()
+            while len(self._entries) > self.MAX_CLIENTS:
+                oldest = min(self._entries, key=lambda k: self._entries[k].last_used)
+                del self._entries[oldest]
+            return entry, True
+
+    def _discard(self, key: tuple, entry: PooledClient):
+        """移除创建失败的条目，下次重新创建"""
+        with self._lock:
+            if self._entries.get(key) is entry:
+                del self._entries[key]
+
+    def warm_up(self, s3_config: dict) -> Optional[PooledClient]:
+        """
+        预热配置对应的客户端（阻塞，应在后台线程调用）
+
+        已预热过的配置等待并返回已有结果；预热失败不抛出异常，错误记录在 PooledClient.error 中，
+        上传时仍使用已创建的客户端。
+
+        Returns:
+            预热结果（预签名上传模式返回None）
+        """
+        key = self._key(s3_config)
+        if key is None:
+            return None
+        entry, owner = self._claim(key)
+        if not owner:
+            entry.ready.wait()
+            return entry
+
+        start = time.perf_counter()
+        try:
+            self._warm_up(entry, key, s3_config.get('bucket'))
+        except Exception as e:
+            entry.error = str(e)
+            if entry.client is None:
+                self._discard(key, entry)
+        finally:
+            entry.elapsed = time.perf_counter() - start
+            entry.created.set()
+            entry.ready.set()
+        return entry
+
+    def _warm_up(self, entry: PooledClient, key: tuple, bucket: Optional[str]):
+        region, style = key[3], key[4]
+        entry.addressing_style = style
+        wrapper = self._create(key, region, style)
+        entry.client = wrapper.client
+        # 客户端已可用，不必等探测完成
+        entry.created.set()
+        if not bucket:
+            return
+
+        # 探测请求与上传共用客户端，建立的连接留在连接池中
+        try:
+            headers = wrapper.head_bucket(bucket)
+        except EndpointConnectionError as e:
+            # 虚拟主机方式的域名（bucket.端点）无法解析时改用路径方式
+            if f'//{bucket}.' not in e.kwargs.get('endpoint_url', ''):
+                raise
+            style = 'path'
+            wrapper = self._create(key, region, style)
+            headers = wrapper.head_bucket(bucket)
+        except ClientError as e:
+            # 区域不符（301/400）和无权限（403）的响应中同样带有存储桶区域
+            headers = e.response.get('ResponseMetadata', {}).get('HTTPHeaders', {})
+            entry.error = str(e)
+        region_found = headers.get('x-amz-bucket-region') or wrapper.client.meta.region_name
+
+        # 区域与客户端不同时按存储桶所在区域重建并重新建立连接
+        if region_found != wrapper.client.meta.region_name:
+            wrapper = self._create(key, region_found, style)
+            try:
+                wrapper.head_bucket(bucket)
+                entry.error = None
+            except ClientError:
+                pass
+        entry.client = wrapper.client
+        entry.region = region_found
+        entry.addressing_style = style
+
+    def get(self, s3_config: dict):
+        """
+        获取配置对应的boto3客户端（正在创建时等待，未预热过时直接创建）
+
+        Returns:
+            boto3客户端；预签名上传模式返回None
+        """
+        key = self._key(s3_config)
+        if key is None:
+            return None
+        entry, owner = self._claim(key)
+        if owner:
+            try:
+                entry.client = self._create(key, key[3], key[4]).client
+            except Exception as e:
+                entry.error = str(e)
+                self._discard(key, entry)
+                raise
+            finally:
+                entry.created.set()
+                entry.ready.set()
+        else:
+            entry.created.wait()
+        entry.last_used = time.monotonic()
+        if entry.client is None:
+            raise RuntimeError(entry.error or '创建S3客户端失败')
+        return entry.client
+
+    def bucket_region(self, s3_config: dict) -> Optional[str]:
+        """预热时探测到的存储桶区域（未预热或预热尚未结束时返回None，不等待）"""
+        key = self._key(s3_config)
+        with self._lock:
+            entry = self._entries.get(key) if key else None
+        if entry is None or not entry.ready.is_set():
+            return None
+        return entry.region
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,262 @@
+"""
+上传压缩
+对JS/CSS/JSON/SVG等文本类资源在上传前压缩，设置Content-Encoding并保留原Content-Type
+
+压缩在进程池中进行，不与上传线程争用GIL。大文件切块并行压缩：
+- gzip：各块独立deflate后拼接为单个gzip成员（与pigz相同的做法），CRC32合并计算
+- zstd：各块为独立帧，顺序拼接
+- brotli：格式不支持拼接，整文件在一个进程内流式压缩
+"""
+
+import os
+import shutil
+import struct
+import tempfile
+import threading
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+try:
+    import zstandard
+    HAVE_ZSTD = True
+except ImportError:
+    HAVE_ZSTD = False
+
+try:
+    import brotli
+    HAVE_BROTLI = True
+except ImportError:
+    HAVE_BROTLI = False
+
+
+# 算法 -> Content-Encoding
+ENCODINGS = {'gzip': 'gzip', 'zstd': 'zstd', 'br': 'br'}
+
+DEFAULT_LEVELS = {'gzip': 6, 'zstd': 10, 'br': 9}
+
+# 默认压缩的扩展名
+DEFAULT_EXTENSIONS = (
+    '.js', '.mjs', '.css', '.json', '.map', '.svg', '.html', '.htm',
+    '.xml', '.txt', '.csv', '.wasm', '.ttf', '.otf', '.ico'
+)
+
+GZIP_HEADER = b'\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff'
+
+
+# ==================== 进程池中执行的函数 ====================
+
+def _read_range(path: str, offset: int, length: int) -> bytes:
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        return f.read(length)
+
+
+def _compress_chunk(path: str, offset: int, length: int, algorithm: str, level: int,
+                    last: bool) -> tuple:
+    """压缩文件中的一块，返回 (压缩数据, 原始数据CRC32)"""
+    data = _read_range(path, offset, length)
+    crc = zlib.crc32(data)
+    if algorithm == 'gzip':
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+        # 非最后一块以同步刷新结束（字节对齐、不设结束标记），便于直接拼接
+        output = compressor.compress(data) + compressor.flush(
+            zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH
+        )
+    else:
+        output = zstandard.ZstdCompressor(level=level).compress(data)
+    return output, crc
+
+
+def _compress_brotli(src_path: str, dst_path: str, level: int, block_size: int):
+    """整文件流式brotli压缩"""
+    compressor = brotli.Compressor(quality=level)
+    with open(src_path, 'rb') as src, open(dst_path, 'wb') as dst:
+        for block in iter(lambda: src.read(block_size), b''):
+            dst.write(compressor.process(block))
+        dst.write(compressor.finish())
+
+
+# ==================== CRC32合并 ====================
+
+def _gf2_times(matrix: list, vector: int) -> int:
+    total = 0
+    i = 0
+    while vector:
+        if vector & 1:
+            total ^= matrix[i]
+        vector >>= 1
+        i += 1
+    return total
+
+
+def _gf2_square(matrix: list) -> list:
+    return [_gf2_times(matrix, row) for row in matrix]
+
+
+def crc32_combine(crc1: int, crc2: int, len2: int) -> int:
+    """
+    合并两段数据的CRC32（zlib crc32_combine的Python实现）
+
+    Args:
+        crc1: 第一段的CRC32
+        crc2: 第二段的CRC32
+        len2: 第二段的长度
+    """
+    if len2 == 0:
+        return crc1
+    odd = [0xedb88320] + [1 << n for n in range(31)]
+    even = _gf2_square(odd)
+    odd = _gf2_square(even)
+    while True:
+        even = _gf2_square(odd)
+        if len2 & 1:
+            crc1 = _gf2_times(even, crc1)
+        len2 >>= 1
+        if not len2:
+            break
+        odd = _gf2_square(even)
+        if len2 & 1:
+            crc1 = _gf2_times(odd, crc1)
+        len2 >>= 1
+        if not len2:
+            break
+    return crc1 ^ crc2
+
+
+# ==================== 压缩阶段 ====================
+
+class CompressionStage:
+    """上传前压缩"""
+
+    # 大文件切块大小（每块一个进程任务）
+    CHUNK_SIZE = 4 * 1024 * 1024
+    # 小于该大小的文件不压缩
+    MIN_SIZE = 1024
+    # 压缩后仍大于原大小该比例时放弃压缩，直接上传原文件
+    MIN_RATIO = 0.9
+
+    def __init__(self, algorithm: str = 'gzip', level: Optional[int] = None,
+                 extensions: Optional[tuple] = None, max_workers: Optional[int] = None):
+        """
+        Args:
+            algorithm: gzip / zstd / br
+            level: 压缩级别（默认按算法选择）
+            extensions: 需要压缩的扩展名（默认为常见文本类资源）
+            max_workers: 压缩进程数（默认CPU核数）
+        """
+        if algorithm not in ENCODINGS:
+            raise ValueError(f'不支持的压缩算法: {algorithm}')
+        if algorithm == 'zstd' and not HAVE_ZSTD:
+            raise ValueError('zstd压缩需要安装 zstandard: pip install zstandard')
+        if algorithm == 'br' and not HAVE_BROTLI:
+            raise ValueError('brotli压缩需要安装 brotli: pip install brotli')
+
+        self.algorithm = algorithm
+        self.encoding = ENCODINGS[algorithm]
+        self.level = DEFAULT_LEVELS[algorithm] if level is None else level
+        self.extensions = tuple(e.lower() for e in (extensions or DEFAULT_EXTENSIONS))
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+        self._temp_dir = tempfile.mkdtemp(prefix='s3compress_')
+        self._counter = 0
+
+    @classmethod
+    def from_config(cls, s3_config: dict) -> Optional['CompressionStage']:
+        """
+        按配置创建（未启用时返回None）
+
+        配置项：
+            compression: gzip / zstd / br
+            compression_level: 压缩级别
+            compression_types: 需要压缩的扩展名列表，如 [".js", ".css"]
+        """
+        algorithm = s3_config.get('compression')
+        if not algorithm:
+            return None
+        return cls(
+            algorithm=algorithm,
+            level=s3_config.get('compression_level'),
+            extensions=s3_config.get('compression_types')
+        )
+
+    def should_compress(self, path: str, size: int) -> bool:
+        """是否需要压缩该文件"""
+        return size >= self.MIN_SIZE and path.lower().endswith(self.extensions)
+
+    def compress(self, path: str) -> Optional[str]:
+        """
+        压缩文件到临时文件
+
+        Returns:
+            压缩后的临时文件路径；压缩收益不足时返回None（调用方上传原文件）
+        """
+        size = os.path.getsize(path)
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+            self._counter += 1
+            # 保留原文件名，便于按扩展名推断类型
+            output_path = os.path.join(self._temp_dir, f'{self._counter}_{os.path.basename(path)}')
+
+        try:
+            if self.algorithm == 'br':
+                self._pool.submit(_compress_brotli, path, output_path, self.level,
+                                  self.CHUNK_SIZE).result()
+            else:
+                self._compress_chunks(path, size, output_path)
+        except BaseException:
+            self.discard(output_path)
+            raise
+
+        if os.path.getsize(output_path) > size * self.MIN_RATIO:
+            self.discard(output_path)
+            return None
+        return output_path
+
+    def _compress_chunks(self, path: str, size: int, output_path: str):
+        """切块并行压缩，按顺序写出；同时在途的块数有上限，内存占用恒定"""
+        chunk_count = max(1, -(-size // self.CHUNK_SIZE))
+        pending = deque()
+        crc = 0
+        with open(output_path, 'wb') as out:
+            if self.algorithm == 'gzip':
+                out.write(GZIP_HEADER)
+
+            def write_next():
+                nonlocal crc
+                length, future = pending.popleft()
+                data, chunk_crc = future.result()
+                out.write(data)
+                crc = crc32_combine(crc, chunk_crc, length)
+
+            for index in range(chunk_count):
+                offset = index * self.CHUNK_SIZE
+                length = min(self.CHUNK_SIZE, size - offset)
+                future = self._pool.submit(_compress_chunk, path, offset, length,
+                                           self.algorithm, self.level, index == chunk_count - 1)
+                pending.append((length, future))
+                if len(pending) >= self.max_workers * 2:
+                    write_next()
+            while pending:
+                write_next()
+
+            if self.algorithm == 'gzip':
+                out.write(struct.pack('<II', crc, size & 0xffffffff))
+
+    def discard(self, output_path: str):
+        """删除压缩产生的临时文件"""
+        try:
+            os.remove(output_path)
+        except OSError:
+            pass
+
+    def close(self):
+        """关闭进程池并清理临时目录"""
+        with self._pool_lock:
+            if self._pool:
+                self._pool.shutdown(wait=True)
+                self._pool = None
+        shutil.rmtree(self._temp_dir, ignore_errors=True)
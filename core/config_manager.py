@@ -1,16 +1,25 @@
 """
 配置管理器
 支持多配置保存、加载和切换
+
+修改只标记为待保存，短时间内的多次修改合并为一次写入（退出时写出剩余修改）；
+写入先写临时文件并fsync，再原子替换配置文件，写到一半崩溃也不会损坏原有配置。
 """
 
+import atexit
 import json
 import os
+import tempfile
+import threading
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional
 import sys 
 
 class ConfigManager:
-    """配置管理器"""
+    """配置管理器（线程安全）"""
+    
+    # 修改后延迟写入的时间（秒），期间的修改合并为一次写入
+    SAVE_DELAY = 0.5
     
     def __init__(self, config_file: str = 'uploader_config.json'):
         """
@@ -23,7 +32,15 @@ class ConfigManager:
         self.config_path = self._get_config_path(config_file)
         self.configs: Dict[str, dict] = {}
         self.current_profile: str = 'default'
+        # 保护configs和current_profile；写文件另用一把锁，写入期间不阻塞修改
+        self._lock = threading.RLock()
+        self._write_lock = threading.Lock()
+        self._dirty = False
+        self._save_timer: Optional[threading.Timer] = None
+        # 切换配置后的回调 on_profile_switch(配置名, 配置副本)，如预热该配置的S3客户端
+        self.on_profile_switch: Optional[Callable[[str, dict], None]] = None
         self.load_configs()
+        atexit.register(self.flush)
     
     def _get_config_path(self, config_file: str) -> Path:
         """
@@ -67,6 +84,7 @@ class ConfigManager:
             try:
                 with open(self.config_path, 'r', encoding='utf-8') as f:
                     data = json.load(f)
+                with self._lock:
                     self.configs = data.get('profiles', {})
                     self.current_profile = data.get('current_profile', 'default')
                     
@@ -80,91 +98,197 @@ class ConfigManager:
             # 创建默认配置
             self.configs = {'default': self._get_default_config()}
             # 首次运行时立即保存默认配置
-            self.save_configs()
+            self._dirty = True
+            self.flush()
     
     def save_configs(self):
-        """保存配置到文件"""
-        try:
-            # 确保父目录存在
-            self.config_path.parent.mkdir(parents=True, exist_ok=True)
+        """标记配置已修改，延迟合并写入（需要立即写入时调用flush）"""
+        with self._lock:
+            self._dirty = True
+            if self._save_timer is None:
+                self._save_timer = threading.Timer(self.SAVE_DELAY, self.flush)
+                self._save_timer.daemon = True
+                self._save_timer.start()
+        return True
+    
+    def flush(self) -> bool:
+        """立即写出未保存的修改"""
+        with self._write_lock:
+            with self._lock:
+                if self._save_timer is not None:
+                    self._save_timer.cancel()
+                    self._save_timer = None
+                if not self._dirty:
+                    return True
+                data = {
+                    'profiles': self.configs,
+                    'current_profile': self.current_profile
+                }
+                content = json.dumps(data, ensure_ascii=False, indent=2)
+                self._dirty = False
             
-            data = {
-                'profiles': self.configs,
-                'current_profile': self.current_profile
-            }
-            with open(self.config_path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-            return True
-        except Exception as e:
-            print(f'保存配置失败: {e}')
-            print(f'配置文件路径: {self.config_path}')
-            return False
+            try:
+                self._write_atomic(content)
+                return True
+            except Exception as e:
+                with self._lock:
+                    self._dirty = True
+                print(f'保存配置失败: {e}')
+                print(f'配置文件路径: {self.config_path}')
+                return False
+    
+    def _write_atomic(self, content: str):
+        """写临时文件并fsync后替换配置文件"""
+        # 确保父目录存在
+        directory = self.config_path.parent
+        directory.mkdir(parents=True, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(prefix=f'.{self.config_path.name}.', suffix='.tmp',
+                                         dir=directory)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.config_path)
+        except BaseException:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+        
+        # 替换操作本身也要落盘（Windows不能打开目录）
+        if hasattr(os, 'O_DIRECTORY'):
+            dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
     
     def get_current_config(self) -> dict:
         """获取当前配置"""
-        return self.configs.get(self.current_profile, self._get_default_config()).copy()
+        with self._lock:
+            return self.configs.get(self.current_profile, self._get_default_config()).copy()
     
     def save_current_config(self, config: dict):
         """保存当前配置"""
-        self.configs[self.current_profile] = config.copy()
-        self.save_configs()
+        with self._lock:
+            self.configs[self.current_profile] = config.copy()
+            self.save_configs()
+    
+    def update_profile(self, profile_name: str, values: dict) -> bool:
+        """
+        更新配置中的部分项（可在后台线程中调用，如记录存储桶列表、续传状态）
+        
+        Args:
+            profile_name: 配置名称
+            values: 要更新的项
+        """
+        with self._lock:
+            if profile_name not in self.configs:
+                return False
+            self.configs[profile_name].update(values)
+            self.save_configs()
+            return True
+    
+    def get_data_dir(self) -> Path:
+        """获取数据目录（与配置文件同级）"""
+        return self.config_path.parent
+    
+    def get_index_path(self, profile_name: Optional[str] = None) -> Path:
+        """
+        获取配置对应的对象索引数据库路径
+        
+        Args:
+            profile_name: 配置名称，默认为当前配置
+        """
+        return self.get_data_dir() / 'index' / f'{self._safe_name(profile_name)}.sqlite3'
+    
+    def get_watch_state_path(self, profile_name: Optional[str] = None) -> Path:
+        """获取配置对应的监视文件夹状态文件路径"""
+        return self.get_data_dir() / 'watch' / f'{self._safe_name(profile_name)}.json'
+    
+    def get_log_path(self) -> Path:
+        """获取运行日志文件路径"""
+        return self.get_data_dir() / 'logs' / 'uploader.log'
+    
+    def _safe_name(self, profile_name: Optional[str] = None) -> str:
+        """配置名称转换为安全的文件名"""
+        name = profile_name or self.current_profile
+        return ''.join(c if c.isalnum() or c in '-_.' else '_' for c in name)
     
     def get_profile_names(self) -> List[str]:
         """获取所有配置名称列表"""
-        return list(self.configs.keys())
+        with self._lock:
+            return list(self.configs.keys())
     
     def switch_profile(self, profile_name: str) -> bool:
         """切换配置"""
-        if profile_name in self.configs:
+        with self._lock:
+            if profile_name not in self.configs:
+                return False
             self.current_profile = profile_name
             self.save_configs()
-            return True
-        return False
+            config = self.configs[profile_name].copy()
+        if self.on_profile_switch:
+            try:
+                self.on_profile_switch(profile_name, config)
+            except Exception as e:
+                print(f'处理配置切换出错: {e}')
+        return True
     
     def add_profile(self, profile_name: str, config: dict = None) -> bool:
         """添加新配置"""
-        if profile_name in self.configs:
-            return False  # 配置名已存在
+        with self._lock:
+            if profile_name in self.configs:
+                return False  # 配置名已存在
         
-        if config is None:
-            config = self._get_default_config()
+            if config is None:
+                config = self._get_default_config()
         
-        self.configs[profile_name] = config
-        self.save_configs()
-        return True
+            self.configs[profile_name] = config
+            self.save_configs()
+            return True
     
     def delete_profile(self, profile_name: str) -> bool:
         """删除配置"""
-        if profile_name == 'default':
-            return False  # 不允许删除默认配置
+        with self._lock:
+            if profile_name == 'default':
+                return False  # 不允许删除默认配置
         
-        if profile_name in self.configs:
-            del self.configs[profile_name]
+            if profile_name in self.configs:
+                del self.configs[profile_name]
             
-            # 如果删除的是当前配置，切换到默认配置
-            if self.current_profile == profile_name:
-                self.current_profile = 'default'
+                # 如果删除的是当前配置，切换到默认配置
+                if self.current_profile == profile_name:
+                    self.current_profile = 'default'
             
-            self.save_configs()
-            return True
-        return False
+                self.save_configs()
+                return True
+            return False
     
     def rename_profile(self, old_name: str, new_name: str) -> bool:
         """重命名配置"""
-        if old_name == 'default':
-            return False  # 不允许重命名默认配置
+        with self._lock:
+            if old_name == 'default':
+                return False  # 不允许重命名默认配置
         
-        if old_name not in self.configs or new_name in self.configs:
-            return False
+            if old_name not in self.configs or new_name in self.configs:
+                return False
         
-        self.configs[new_name] = self.configs.pop(old_name)
+            self.configs[new_name] = self.configs.pop(old_name)
         
-        # 如果重命名的是当前配置，更新当前配置名
-        if self.current_profile == old_name:
-            self.current_profile = new_name
+            # 如果重命名的是当前配置，更新当前配置名
+            if self.current_profile == old_name:
+                self.current_profile = new_name
         
-        self.save_configs()
-        return True
+            self.save_configs()
+            return True
+    
+    def is_placeholder(self, config: dict) -> bool:
+        """配置是否仍是未填写的占位配置（端点为默认示例地址或没有密钥）"""
+        return (config.get('endpoint') == self._get_default_config()['endpoint']
+                or not (config.get('access_key') and config.get('secret_key')))
     
     def _get_default_config(self) -> dict:
         """获取默认配置"""
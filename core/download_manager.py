@@ -0,0 +1,345 @@
+"""
+下载引擎
+并发分段GET写入预分配文件，支持断点续传和校验
+"""
+
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+from core.s3_client import S3ClientWrapper, ProgressCallback
+from core.encryption import EnvelopeEncryption, ObjectCipher
+
+
+class DownloadTask:
+    """下载任务（与UploadTask共用调度器和进度统计）"""
+
+    def __init__(self, key: str, local_path: str, size: int = 0):
+        """
+        Args:
+            key: 对象键
+            local_path: 本地保存路径
+            size: 对象大小（来自列举结果，未知时为0）
+        """
+        self.key = key
+        self.file_path = local_path
+        self.filename = os.path.basename(local_path)
+        self.filesize = size
+        self.status = 'pending'  # pending, downloading, completed, failed
+        self.progress = 0.0
+        self.error_message = ''
+        self.public_url = ''
+        self.metadata = {}
+        self.checksum = None
+        self.started_at = 0.0
+        self.finished_at = 0.0
+
+
+class PartBitmap:
+    """分段完成位图（持久化到 <文件>.s3part，用于断点续传）"""
+
+    def __init__(self, state_path: str, etag: str, size: int, part_size: int):
+        self.state_path = state_path
+        self.etag = etag
+        self.size = size
+        self.part_size = part_size
+        self.part_count = max(1, -(-size // part_size))
+        self.bits = bytearray(-(-self.part_count // 8))
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, state_path: str, etag: str, size: int, part_size: int) -> 'PartBitmap':
+        """加载已有状态；对象已变化或参数不一致时返回空位图"""
+        bitmap = cls(state_path, etag, size, part_size)
+        try:
+            with open(state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            if (state.get('etag') == etag and state.get('size') == size
+                    and state.get('part_size') == part_size):
+                bits = bytes.fromhex(state.get('bitmap', ''))
+                if len(bits) == len(bitmap.bits):
+                    bitmap.bits[:] = bits
+        except (OSError, ValueError):
+            pass
+        return bitmap
+
+    def is_done(self, part: int) -> bool:
+        return bool(self.bits[part >> 3] & (1 << (part & 7)))
+
+    def mark_done(self, part: int):
+        """标记分段完成并持久化"""
+        with self._lock:
+            self.bits[part >> 3] |= 1 << (part & 7)
+            self._save()
+
+    def missing_parts(self) -> list:
+        return [p for p in range(self.part_count) if not self.is_done(p)]
+
+    def _save(self):
+        state = {
+            'etag': self.etag,
+            'size': self.size,
+            'part_size': self.part_size,
+            'bitmap': self.bits.hex()
+        }
+        tmp_path = self.state_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.state_path)
+
+    def remove(self):
+        try:
+            os.remove(self.state_path)
+        except OSError:
+            pass
+
+
+class RangedDownloader:
+    """并发分段下载器"""
+
+    # 每次从响应流读取并写入的块大小
+    READ_CHUNK = 1024 * 1024
+
+    def __init__(self, client: S3ClientWrapper, part_size: int = 8 * 1024 * 1024,
+                 max_concurrency: Optional[int] = None):
+        """
+        Args:
+            client: S3客户端
+            part_size: 分段大小
+            max_concurrency: 并发分段数（默认与上传分片并发一致）
+        """
+        self.client = client
+        self.part_size = part_size
+        self.max_concurrency = max_concurrency or client.transfer_config.max_concurrency
+
+    def download(self, bucket: str, key: str, local_path: str,
+                 progress_callback: Optional[Callable] = None, verify: bool = True) -> dict:
+        """
+        下载对象到本地文件
+
+        数据先写入 <文件>.s3download，完成并校验后再原子替换为目标文件。
+
+        Args:
+            bucket: 存储桶名称
+            key: 对象键
+            local_path: 本地保存路径
+            progress_callback: 进度回调函数（与上传相同的签名）
+            verify: 下载完成后校验MD5/ETag
+
+        Returns:
+            HEAD响应（包含ContentLength、ETag、Metadata）
+        """
+        head = self.client.head_object(bucket, key)
+        size = head['ContentLength']
+        etag = head.get('ETag', '')
+
+        # 客户端加密的对象按加密段分段下载，每段解密后写入明文偏移
+        cipher = None
+        part_size = self.part_size
+        plain_size = size
+        if EnvelopeEncryption.is_encrypted(head.get('Metadata', {})):
+            if not self.client.encryption:
+                raise ValueError('对象已加密，需要在配置中设置 encryption_key')
+            cipher = self.client.encryption.open_object(head['Metadata'])
+            part_size = cipher.encrypted_segment_size
+            plain_size = cipher.plain_size(size)
+
+        os.makedirs(os.path.dirname(os.path.abspath(local_path)), exist_ok=True)
+        temp_path = local_path + '.s3download'
+        bitmap = PartBitmap.load(local_path + '.s3part', etag, size, part_size)
+
+        # 预分配目标文件（续传时保留已写入的数据）
+        if not os.path.exists(temp_path):
+            bitmap.bits[:] = bytes(len(bitmap.bits))
+        with open(temp_path, 'ab') as f:
+            if os.fstat(f.fileno()).st_size != plain_size:
+                f.truncate(plain_size)
+
+        callback = None
+        if progress_callback:
+            callback = ProgressCallback(local_path, size, progress_callback)
+            done_bytes = 0
+            for part in range(bitmap.part_count):
+                if bitmap.is_done(part):
+                    start, end = self._part_range(part, size, part_size)
+                    done_bytes += end - start + 1
+            if done_bytes:
+                callback(done_bytes)
+
+        missing = bitmap.missing_parts() if size else []
+        if missing:
+            fd = os.open(temp_path, os.O_RDWR | getattr(os, 'O_BINARY', 0))
+            try:
+                with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(missing))) as pool:
+                    futures = [
+                        pool.submit(self._download_part, bucket, key, etag, fd, temp_path,
+                                    part, size, part_size, bitmap, callback, cipher)
+                        for part in missing
+                    ]
+                    for future in futures:
+                        future.result()
+            finally:
+                os.close(fd)
+
+        if verify:
+            self._verify(bucket, key, temp_path, head, encrypted=cipher is not None)
+
+        os.replace(temp_path, local_path)
+        bitmap.remove()
+        return head
+
+    @staticmethod
+    def _part_range(part: int, size: int, part_size: int) -> tuple:
+        """分段对应的字节范围（闭区间）"""
+        start = part * part_size
+        return start, min(start + part_size, size) - 1
+
+    def _download_part(self, bucket: str, key: str, etag: str, fd: int, temp_path: str,
+                       part: int, size: int, part_size: int, bitmap: PartBitmap,
+                       callback: Optional[ProgressCallback], cipher: Optional[ObjectCipher]):
+        """下载单个分段并写入文件对应偏移"""
+        start, end = self._part_range(part, size, part_size)
+        body = self.client.get_object_range(bucket, key, start, end, if_match=etag)
+        offset = start
+
+        if cipher:
+            self._download_encrypted_part(body, fd, temp_path, part, start, end, size,
+                                          callback, cipher)
+            bitmap.mark_done(part)
+            return
+
+        if hasattr(os, 'pwrite'):
+            for chunk in iter(lambda: body.read(self.READ_CHUNK), b''):
+                view = memoryview(chunk)
+                while view:
+                    written = os.pwrite(fd, view, offset)
+                    offset += written
+                    view = view[written:]
+                if callback:
+                    callback(len(chunk))
+        else:
+            # Windows无pwrite，每个分段使用独立句柄定位写入
+            with open(temp_path, 'r+b') as f:
+                f.seek(start)
+                for chunk in iter(lambda: body.read(self.READ_CHUNK), b''):
+                    f.write(chunk)
+                    offset += len(chunk)
+                    if callback:
+                        callback(len(chunk))
+
+        if offset != end + 1:
+            raise IOError(f'分段 {part + 1} 数据不完整: {offset - start}/{end - start + 1} 字节')
+        bitmap.mark_done(part)
+
+    def _download_encrypted_part(self, body, fd: int, temp_path: str, part: int,
+                                 start: int, end: int, size: int,
+                                 callback: Optional[ProgressCallback], cipher: ObjectCipher):
+        """下载一个加密段，认证解密后写入明文偏移"""
+        data = bytearray(end - start + 1)
+        view = memoryview(data)
+        filled = 0
+        for chunk in iter(lambda: body.read(self.READ_CHUNK), b''):
+            if filled + len(chunk) > len(data):
+                break
+            view[filled:filled + len(chunk)] = chunk
+            filled += len(chunk)
+            if callback:
+                callback(len(chunk))
+        if filled != len(data):
+            raise IOError(f'分段 {part + 1} 数据不完整: {filled}/{len(data)} 字节')
+
+        plain = cipher.decrypt(part, end + 1 == size, data)
+        offset = part * cipher.segment_size
+        if hasattr(os, 'pwrite'):
+            view = memoryview(plain)
+            while view:
+                written = os.pwrite(fd, view, offset)
+                offset += written
+                view = view[written:]
+        else:
+            with open(temp_path, 'r+b') as f:
+                f.seek(offset)
+                f.write(plain)
+
+    def _verify(self, bucket: str, key: str, path: str, head: dict, encrypted: bool = False):
+        """
+        校验下载结果
+
+        - 单次PUT上传：ETag即MD5
+        - 元数据中记录了md5（同步上传）：直接比对（压缩上传的对象除外）
+        - 分片上传：按服务端分片大小重算 "MD5(各分片MD5)-N"；
+          无法取得分片大小（服务端不支持按分片HEAD）时跳过，大小已在下载时校验
+        - 客户端加密：每段已通过GCM认证，ETag对应的是密文，只比对元数据中的md5
+        """
+        etag = head.get('ETag', '').strip('"')
+        expected_md5 = head.get('Metadata', {}).get('md5')
+        if head.get('ContentEncoding'):
+            # 元数据中的md5是压缩前的内容，下载得到的是压缩后的数据
+            expected_md5 = None
+        if encrypted:
+            etag = ''
+
+        if '-' not in etag and etag:
+            expected_md5 = etag
+        if expected_md5:
+            actual = self._file_md5(path, None)
+            if actual != expected_md5:
+                raise IOError(f'校验失败: MD5不一致 ({actual} != {expected_md5})')
+            return
+
+        if '-' in etag:
+            part_sizes = self._part_sizes(bucket, key, head['ContentLength'],
+                                          int(etag.rsplit('-', 1)[1]))
+            if not part_sizes:
+                return
+            actual = self._file_md5(path, part_sizes)
+            if actual != etag:
+                raise IOError(f'校验失败: ETag不一致 ({actual} != {etag})')
+
+    def _part_sizes(self, bucket: str, key: str, size: int, count: int) -> Optional[List[int]]:
+        """
+        分片上传时各分片的大小
+
+        第1片的大小能推出全部分片时（固定分片大小）只HEAD一次，否则（如流式上传分片逐级增大）
+        逐片HEAD。服务端未返回PartsCount（忽略partNumber参数）或分片大小与对象大小不符时返回None。
+        """
+        first = self.client.head_object(bucket, key, part_number=1)
+        if first.get('PartsCount') != count:
+            return None
+        part_size = first['ContentLength']
+        if part_size * (count - 1) < size <= part_size * count:
+            return [part_size] * (count - 1) + [size - part_size * (count - 1)]
+
+        def head_part(part_number: int) -> int:
+            return self.client.head_object(bucket, key, part_number=part_number)['ContentLength']
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as pool:
+            sizes = [part_size] + list(pool.map(head_part, range(2, count + 1)))
+        return sizes if sum(sizes) == size else None
+
+    @staticmethod
+    def _file_md5(path: str, part_sizes: Optional[List[int]]) -> str:
+        """计算文件MD5；指定各分片大小时计算分片上传风格的ETag"""
+        if not part_sizes:
+            md5 = hashlib.md5()
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    md5.update(chunk)
+            return md5.hexdigest()
+
+        digests = []
+        with open(path, 'rb') as f:
+            for part_size in part_sizes:
+                md5 = hashlib.md5()
+                remaining = part_size
+                while remaining:
+                    chunk = f.read(min(remaining, 1024 * 1024))
+                    if not chunk:
+                        break
+                    md5.update(chunk)
+                    remaining -= len(chunk)
+                digests.append(md5.digest())
+        return f'{hashlib.md5(b"".join(digests)).hexdigest()}-{len(digests)}'
@@ -0,0 +1,158 @@
+"""
+客户端加密
+AES-256-GCM信封加密：每个对象生成随机数据密钥，用配置中的主密钥包装后存入对象元数据
+
+对象按固定大小的段加密（段大小与上传分片一致），每段独立的nonce和认证标签，
+因此分片仍可并行上传、分段并行下载解密，内存占用只与段大小有关。
+段序号和“是否最后一段”作为附加认证数据，调换或截断分段都会解密失败。
+"""
+
+import base64
+import hashlib
+import os
+import struct
+from typing import Optional
+
+try:
+    from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+    from cryptography.exceptions import InvalidTag
+    HAVE_CRYPTOGRAPHY = True
+except ImportError:
+    HAVE_CRYPTOGRAPHY = False
+
+
+class ObjectCipher:
+    """单个对象的分段加解密"""
+
+    TAG_SIZE = 16
+
+    def __init__(self, data_key: bytes, base_nonce: bytes, segment_size: int):
+        self.data_key = data_key
+        self.base_nonce = base_nonce
+        self.segment_size = segment_size
+        self.metadata = {}
+
+    @property
+    def encrypted_segment_size(self) -> int:
+        return self.segment_size + self.TAG_SIZE
+
+    def encrypted_size(self, plain_size: int) -> int:
+        """密文总大小（空对象也有一个只含标签的段）"""
+        segments = max(1, -(-plain_size // self.segment_size))
+        return plain_size + segments * self.TAG_SIZE
+
+    def plain_size(self, encrypted_size: int) -> int:
+        """由密文大小推算明文大小"""
+        segments = max(1, -(-encrypted_size // self.encrypted_segment_size))
+        return encrypted_size - segments * self.TAG_SIZE
+
+    def _nonce(self, index: int) -> bytes:
+        counter = int.from_bytes(self.base_nonce[4:], 'big') ^ index
+        return self.base_nonce[:4] + counter.to_bytes(8, 'big')
+
+    @staticmethod
+    def _aad(index: int, last: bool) -> bytes:
+        return struct.pack('>QB', index, 1 if last else 0)
+
+    def encrypt_into(self, index: int, last: bool, src: memoryview, dst: memoryview) -> int:
+        """
+        加密一段，密文和标签写入dst（dst至少 len(src) + 32 字节）
+
+        Returns:
+            写入的字节数（len(src) + 16）
+        """
+        encryptor = Cipher(algorithms.AES(self.data_key), modes.GCM(self._nonce(index))).encryptor()
+        encryptor.authenticate_additional_data(self._aad(index, last))
+        n = encryptor.update_into(src, dst)
+        encryptor.finalize()
+        dst[n:n + self.TAG_SIZE] = encryptor.tag
+        return n + self.TAG_SIZE
+
+    def decrypt(self, index: int, last: bool, data) -> bytes:
+        """解密一段（含标签），认证失败时抛出IOError"""
+        try:
+            return AESGCM(self.data_key).decrypt(self._nonce(index), data, self._aad(index, last))
+        except InvalidTag:
+            raise IOError(f'解密失败: 第 {index + 1} 段认证未通过（密钥错误或数据被篡改）')
+
+
+class EnvelopeEncryption:
+    """信封加密（主密钥只用于包装每个对象的数据密钥）"""
+
+    SCHEME = 'aes256-gcm-seg/1'
+
+    # 对象元数据键（S3用户元数据，x-amz-meta-前缀由boto3添加）
+    META_SCHEME = 's3u-enc'
+    META_KEY = 's3u-key'
+    META_KEY_ID = 's3u-kid'
+    META_SEGMENT = 's3u-segment'
+    META_SIZE = 's3u-size'
+
+    def __init__(self, master_key: bytes):
+        """
+        Args:
+            master_key: 32字节主密钥
+        """
+        if not HAVE_CRYPTOGRAPHY:
+            raise ValueError('客户端加密需要安装 cryptography: pip install cryptography')
+        if len(master_key) != 32:
+            raise ValueError('主密钥必须为32字节（base64编码后44个字符）')
+        self._master = AESGCM(master_key)
+        # 密钥标识，用于提示对象使用的是哪把主密钥
+        self.key_id = hashlib.sha256(master_key).hexdigest()[:16]
+
+    @classmethod
+    def from_config(cls, s3_config: dict) -> Optional['EnvelopeEncryption']:
+        """按配置项 encryption_key（base64）创建，未配置时返回None"""
+        encoded = s3_config.get('encryption_key')
+        if not encoded:
+            return None
+        try:
+            master_key = base64.b64decode(encoded, validate=True)
+        except ValueError:
+            raise ValueError('encryption_key 不是有效的base64')
+        return cls(master_key)
+
+    @staticmethod
+    def generate_key() -> str:
+        """生成新的主密钥（base64）"""
+        return base64.b64encode(os.urandom(32)).decode('ascii')
+
+    @classmethod
+    def is_encrypted(cls, metadata: dict) -> bool:
+        return cls.META_SCHEME in (metadata or {})
+
+    def new_object(self, segment_size: int, plain_size: int) -> ObjectCipher:
+        """为新对象生成数据密钥，返回的cipher.metadata需随对象上传"""
+        data_key = os.urandom(32)
+        base_nonce = os.urandom(12)
+        cipher = ObjectCipher(data_key, base_nonce, segment_size)
+
+        wrap_nonce = os.urandom(12)
+        wrapped = wrap_nonce + self._master.encrypt(wrap_nonce, data_key + base_nonce,
+                                                    self.SCHEME.encode('ascii'))
+        cipher.metadata = {
+            self.META_SCHEME: self.SCHEME,
+            self.META_KEY: base64.b64encode(wrapped).decode('ascii'),
+            self.META_KEY_ID: self.key_id,
+            self.META_SEGMENT: str(segment_size),
+            self.META_SIZE: str(plain_size),
+        }
+        return cipher
+
+    def open_object(self, metadata: dict) -> ObjectCipher:
+        """由对象元数据还原数据密钥"""
+        if metadata.get(self.META_SCHEME) != self.SCHEME:
+            raise ValueError(f'不支持的加密格式: {metadata.get(self.META_SCHEME)}')
+        if metadata.get(self.META_KEY_ID) not in (None, self.key_id):
+            raise ValueError(f'对象使用了其他主密钥加密（密钥标识 {metadata[self.META_KEY_ID]}）')
+
+        wrapped = base64.b64decode(metadata[self.META_KEY])
+        try:
+            unwrapped = self._master.decrypt(wrapped[:12], wrapped[12:], self.SCHEME.encode('ascii'))
+        except InvalidTag:
+            raise ValueError('无法解开数据密钥：主密钥不正确')
+        cipher = ObjectCipher(unwrapped[:32], unwrapped[32:], int(metadata[self.META_SEGMENT]))
+        cipher.metadata = dict(metadata)
+        return cipher
@@ -0,0 +1,95 @@
+"""
+事件总线
+工作线程发布事件只是入队，不等待界面处理；界面线程按批取出后分发。
+同一任务的进度事件只保留最新一条，进度刷新再频繁也不会堆积。
+"""
+
+import queue
+import threading
+from typing import Dict, List, Optional
+
+
+class Event:
+    """事件基类"""
+
+    # 非None时同键的未处理事件只保留最新一条
+    coalesce_key = None
+
+
+class TaskProgress(Event):
+    """任务进度更新"""
+
+    def __init__(self, task):
+        self.task = task
+
+    @property
+    def coalesce_key(self):
+        return ('progress', id(self.task))
+
+
+class TaskCompleted(Event):
+    """任务完成"""
+
+    def __init__(self, task):
+        self.task = task
+
+
+class TaskFailed(Event):
+    """任务失败（task为None表示与具体任务无关的错误）"""
+
+    def __init__(self, task, message: str):
+        self.task = task
+        self.message = message
+
+
+class AllCompleted(Event):
+    """一批任务全部结束"""
+
+
+class ScanProgress(Event):
+    """后台读取文件元数据的进度（pending为尚未读取完的文件数）"""
+
+    coalesce_key = 'scan'
+
+    def __init__(self, pending: int):
+        self.pending = pending
+
+
+class EventBus:
+    """线程安全的事件队列"""
+
+    def __init__(self):
+        self._queue = queue.SimpleQueue()
+        self._latest: Dict[object, Event] = {}
+        self._latest_lock = threading.Lock()
+
+    def publish(self, event: Event):
+        """发布事件（任意线程，不阻塞）"""
+        key = event.coalesce_key
+        if key is None:
+            self._queue.put(event)
+        else:
+            with self._latest_lock:
+                self._latest[key] = event
+
+    def drain(self, limit: Optional[int] = None) -> List[Event]:
+        """
+        取出待处理的事件
+
+        Args:
+            limit: 最多取出的普通事件数（可合并的事件总是全部取出）
+
+        Returns:
+            先是合并后的进度类事件，再按发布顺序排列的其他事件
+        """
+        with self._latest_lock:
+            events = list(self._latest.values())
+            self._latest.clear()
+        count = 0
+        while limit is None or count < limit:
+            try:
+                events.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+            count += 1
+        return events
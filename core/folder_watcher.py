@@ -0,0 +1,389 @@
+"""
+监视文件夹
+新增/修改的文件写入稳定后自动上传，状态持久化，重启后不会重复上传
+
+事件来源通过一个小的抽象层提供：Linux下使用inotify，其他平台退化为轮询。
+"""
+
+import ctypes
+import ctypes.util
+import json
+import os
+import queue
+import select
+import struct
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Callable, Dict, Iterator, Optional, Set
+
+from core.upload_manager import UploadManager, UploadTask
+
+
+class WatchBackend(ABC):
+    """文件变化事件来源"""
+
+    @abstractmethod
+    def start(self, root: str):
+        """开始监视目录"""
+
+    @abstractmethod
+    def read_events(self, timeout: float) -> Optional[Set[str]]:
+        """
+        等待并返回发生变化的文件路径
+
+        Returns:
+            变化的路径集合；返回None表示事件丢失，需要全量扫描
+        """
+
+    def close(self):
+        """停止监视"""
+
+
+class PollingBackend(WatchBackend):
+    """轮询实现（跨平台后备方案）"""
+
+    def __init__(self, interval: float = 2.0):
+        self.interval = interval
+        self.root = ''
+        self._snapshot: Dict[str, tuple] = {}
+
+    def start(self, root: str):
+        self.root = root
+        self._snapshot = dict(scan_files(root))
+
+    def read_events(self, timeout: float) -> Optional[Set[str]]:
+        time.sleep(min(timeout, self.interval))
+        current = dict(scan_files(self.root))
+        changed = {p for p, sig in current.items() if self._snapshot.get(p) != sig}
+        self._snapshot = current
+        return changed
+
+
+class InotifyBackend(WatchBackend):
+    """Linux inotify实现（通过ctypes调用libc，无第三方依赖）"""
+
+    IN_MODIFY = 0x00000002
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ISDIR = 0x40000000
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+
+    WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+    EVENT_HEADER = struct.Struct('iIII')
+
+    def __init__(self):
+        if not sys.platform.startswith('linux'):
+            raise OSError('inotify仅在Linux上可用')
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._libc = libc
+        self._fd = libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 失败')
+        self._watches: Dict[int, str] = {}
+
+    def start(self, root: str):
+        self._add_tree(root)
+
+    def _add_watch(self, path: str):
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), self.WATCH_MASK)
+        if wd >= 0:
+            self._watches[wd] = path
+
+    def _add_tree(self, root: str) -> Set[str]:
+        """递归添加监视，返回目录下已有的文件（新目录移入时需要补扫）"""
+        files = set()
+        self._add_watch(root)
+        for dir_path, dir_names, file_names in os.walk(root):
+            for name in dir_names:
+                self._add_watch(os.path.join(dir_path, name))
+            for name in file_names:
+                files.add(os.path.join(dir_path, name))
+        return files
+
+    def read_events(self, timeout: float) -> Optional[Set[str]]:
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return set()
+
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+
+        changed = set()
+        offset = 0
+        header_size = self.EVENT_HEADER.size
+        while offset + header_size <= len(data):
+            wd, mask, _, name_len = self.EVENT_HEADER.unpack_from(data, offset)
+            name = data[offset + header_size:offset + header_size + name_len].rstrip(b'\0')
+            offset += header_size + name_len
+
+            if mask & self.IN_Q_OVERFLOW:
+                return None
+            if mask & self.IN_IGNORED:
+                self._watches.pop(wd, None)
+                continue
+
+            parent = self._watches.get(wd)
+            if parent is None or not name:
+                continue
+            path = os.path.join(parent, os.fsdecode(name))
+            if mask & self.IN_ISDIR:
+                if mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                    changed |= self._add_tree(path)
+            else:
+                changed.add(path)
+        return changed
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+def create_backend(poll_interval: float = 2.0) -> WatchBackend:
+    """优先使用inotify，不可用时退化为轮询"""
+    try:
+        return InotifyBackend()
+    except (OSError, AttributeError):
+        return PollingBackend(poll_interval)
+
+
+def scan_files(root: str) -> Iterator[tuple]:
+    """递归扫描目录，产生 (路径, (大小, 修改时间ns))"""
+    stack = [root]
+    while stack:
+        dir_path = stack.pop()
+        try:
+            entries = list(os.scandir(dir_path))
+        except OSError:
+            continue
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file():
+                    st = entry.stat()
+                    yield entry.path, (st.st_size, st.st_mtime_ns)
+            except OSError:
+                continue
+
+
+class FolderWatcher:
+    """监视文件夹并自动上传"""
+
+    # 上传失败后的重试：首次等待秒数（每次翻倍）和最多尝试次数，用完后等文件再次变化
+    RETRY_DELAY = 10.0
+    MAX_ATTEMPTS = 5
+    # 上传管理器任务列表中保留的已结束任务数（监视期间任务持续产生，更早的从列表移除）
+    KEEP_FINISHED = 200
+
+    def __init__(self, upload_manager: UploadManager, s3_config: dict, watch_dir: str,
+                 state_path: str, settle_seconds: float = 2.0,
+                 backend: Optional[WatchBackend] = None):
+        """
+        Args:
+            upload_manager: 执行上传的管理器
+            s3_config: S3配置字典
+            watch_dir: 监视的目录
+            state_path: 已上传状态文件路径（JSON）
+            settle_seconds: 文件大小/修改时间保持不变多久后视为写入完成
+            backend: 事件来源（默认自动选择）
+        """
+        if not os.path.isdir(watch_dir):
+            raise ValueError(f'监视目录不存在: {watch_dir}')
+
+        self.upload_manager = upload_manager
+        self.s3_config = s3_config
+        self.watch_dir = os.path.abspath(watch_dir)
+        self.state_path = str(state_path)
+        self.settle_seconds = settle_seconds
+        self.backend = backend or create_backend()
+
+        prefix = s3_config.get('prefix', '').strip('/')
+        self.prefix = f'{prefix}/' if prefix else ''
+
+        self.stop_flag = threading.Event()
+        self._ready: queue.Queue = queue.Queue()
+        # 等待写入稳定的文件：路径 -> (上次观察到的签名, 签名最后变化时间)
+        self._pending: Dict[str, tuple] = {}
+        # 已提交上传的任务：任务 -> (相对路径, 签名)
+        self._inflight: Dict[UploadTask, tuple] = {}
+        # 上传失败次数：路径 -> 连续失败次数
+        self._failures: Dict[str, int] = {}
+        # 已结束的任务（超过 KEEP_FINISHED 个时从上传管理器的列表中移除）
+        self._finished: deque = deque()
+        # 已上传文件：相对路径 -> [大小, 修改时间ns]
+        self._uploaded: Dict[str, list] = {}
+        self._state_dirty = False
+        self._thread: Optional[threading.Thread] = None
+
+        # 文件入队回调：on_file_queued(task)
+        self.on_file_queued: Optional[Callable] = None
+
+    # ==================== 状态持久化 ====================
+
+    def _load_state(self):
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('watch_dir') == self.watch_dir and data.get('prefix') == self.prefix:
+                self._uploaded = data.get('files', {})
+        except (OSError, ValueError):
+            self._uploaded = {}
+
+    def _save_state(self):
+        if not self._state_dirty:
+            return
+        data = {'watch_dir': self.watch_dir, 'prefix': self.prefix, 'files': self._uploaded}
+        os.makedirs(os.path.dirname(self.state_path) or '.', exist_ok=True)
+        tmp_path = self.state_path + '.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.state_path)
+            self._state_dirty = False
+        except OSError as e:
+            print(f'保存监视状态失败: {e}')
+
+    # ==================== 运行 ====================
+
+    def start(self, max_threads: int = 3):
+        """开始监视，并以流式任务来源启动UploadManager"""
+        self._load_state()
+        self.stop_flag.clear()
+        self.backend.start(self.watch_dir)
+
+        # 启动时全量扫描一次，补传离线期间的变化，并清理已删除文件的记录
+        now = time.monotonic()
+        present = set()
+        for path, _ in scan_files(self.watch_dir):
+            present.add(self._rel_path(path))
+            self._pending.setdefault(path, (None, now))
+        for rel_path in set(self._uploaded) - present:
+            del self._uploaded[rel_path]
+            self._state_dirty = True
+
+        self._thread = threading.Thread(target=self._watch_loop, daemon=True, name='FolderWatcher')
+        self._thread.start()
+        self.upload_manager.start_upload(self.s3_config, max_threads, task_source=self.iter_tasks())
+
+    def stop(self):
+        """停止监视（已在上传的任务会继续完成，完成后在后台记录状态）"""
+        self.stop_flag.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+        self.backend.close()
+        self._collect_finished()
+        self._save_state()
+        if self._inflight:
+            workers = list(self.upload_manager.worker_threads)
+            threading.Thread(target=self._finish_inflight, args=(workers,), daemon=True,
+                             name='FolderWatcher-Finish').start()
+
+    def _finish_inflight(self, workers: list):
+        """等待上传管理器的工作线程处理完剩余任务后记录结果"""
+        for t in workers:
+            t.join()
+        self._collect_finished()
+        self._save_state()
+
+    def iter_tasks(self) -> Iterator[UploadTask]:
+        """流式任务来源：阻塞等待写入稳定的文件"""
+        while not self.stop_flag.is_set():
+            try:
+                yield self._ready.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+    def _watch_loop(self):
+        """事件循环：合并事件、判断写入稳定、回收上传结果"""
+        while not self.stop_flag.is_set():
+            events = self.backend.read_events(timeout=min(1.0, self.settle_seconds / 2))
+            now = time.monotonic()
+            if events is None:
+                events = {path for path, _ in scan_files(self.watch_dir)}
+            for path in events:
+                # 同一文件的连续事件只保留一条，稳定计时重新开始
+                previous = self._pending.get(path)
+                self._pending[path] = (previous[0] if previous else None, now)
+                self._failures.pop(path, None)
+
+            self._check_pending(now)
+            self._collect_finished()
+            self._save_state()
+
+    def _rel_path(self, path: str) -> str:
+        return os.path.relpath(path, self.watch_dir).replace(os.sep, '/')
+
+    def _check_pending(self, now: float):
+        """把大小和修改时间已稳定的文件交给上传队列"""
+        for path, (last_sig, changed_at) in list(self._pending.items()):
+            try:
+                st = os.stat(path)
+            except OSError:
+                del self._pending[path]  # 文件已删除或被移走
+                continue
+
+            sig = (st.st_size, st.st_mtime_ns)
+            if sig != last_sig:
+                self._pending[path] = (sig, now)
+                continue
+            if now - changed_at < self.settle_seconds:
+                continue
+
+            del self._pending[path]
+            rel_path = self._rel_path(path)
+            if self._uploaded.get(rel_path) == list(sig):
+                continue  # 内容未变化（例如仅触发了事件）
+            if any(info[0] == rel_path for info in self._inflight.values()):
+                self._pending[path] = (sig, now)  # 上一版本仍在上传，稍后再试
+                continue
+
+            try:
+                task = UploadTask(path, key=self.prefix + rel_path)
+            except OSError:
+                continue
+            self._inflight[task] = (rel_path, sig)
+            self._ready.put(task)
+            if self.on_file_queued:
+                self.on_file_queued(task)
+
+    def _collect_finished(self):
+        """记录已完成的上传；失败的文件按指数退避重新排队"""
+        finished = []
+        for task, (rel_path, sig) in list(self._inflight.items()):
+            if task.status == 'completed':
+                self._uploaded[rel_path] = list(sig)
+                self._state_dirty = True
+                self._failures.pop(task.file_path, None)
+            elif task.status == 'failed':
+                self._retry_later(task.file_path, sig)
+            else:
+                continue
+            del self._inflight[task]
+            finished.append(task)
+
+        self._finished.extend(finished)
+        if len(self._finished) > self.KEEP_FINISHED:
+            expired = [self._finished.popleft()
+                       for _ in range(len(self._finished) - self.KEEP_FINISHED)]
+            self.upload_manager.remove_tasks(expired)
+
+    def _retry_later(self, path: str, sig: tuple):
+        """失败的文件延迟后重新排队，连续失败 MAX_ATTEMPTS 次后不再重试"""
+        attempts = self._failures.get(path, 0) + 1
+        self._failures[path] = attempts
+        if attempts >= self.MAX_ATTEMPTS:
+            print(f'上传失败 {attempts} 次，文件再次变化时重试: {path}')
+            return
+        # 等待时间记为未来的变化时间，到期后再经过稳定等待才重新上传
+        delay = self.RETRY_DELAY * 2 ** (attempts - 1)
+        self._pending.setdefault(path, (sig, time.monotonic() + delay))
@@ -0,0 +1,233 @@
+"""
+图片衍生版本
+上传原图的同时生成缩略图、WebP/AVIF等衍生版本（缩放、转码、去除EXIF），
+衍生文件生成后直接加入上传队列，以各自的对象键上传
+
+解码和编码在进程池中进行，不与上传线程争用GIL；
+每张原图只解码一次，在同一个进程任务内依次生成所有衍生版本。
+"""
+
+import os
+import posixpath
+import shutil
+import tempfile
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+try:
+    from PIL import Image, ImageOps
+    HAVE_PIL = True
+except ImportError:
+    HAVE_PIL = False
+
+
+# 格式 -> (Pillow格式名, 扩展名, Content-Type)
+FORMATS = {
+    'webp': ('WEBP', 'webp', 'image/webp'),
+    'avif': ('AVIF', 'avif', 'image/avif'),
+    'jpeg': ('JPEG', 'jpg', 'image/jpeg'),
+    'png': ('PNG', 'png', 'image/png'),
+}
+
+# 默认处理的原图扩展名
+DEFAULT_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.tif', '.tiff', '.bmp')
+
+# 衍生对象键模板（相对于原图所在目录）
+DEFAULT_KEY_TEMPLATE = '{stem}_{name}.{ext}'
+
+# EXIF方向标记
+EXIF_ORIENTATION = 0x0112
+
+
+# ==================== 进程池中执行的函数 ====================
+
+def _render(image, spec: dict, output_path: str):
+    """按规格生成一个衍生文件"""
+    pil_format = FORMATS[spec['format']][0]
+    width, height = spec.get('width'), spec.get('height')
+    if width or height:
+        image = image.copy()
+        # thumbnail只缩小不放大，并保持宽高比
+        image.thumbnail((width or image.width, height or image.height), Image.LANCZOS)
+
+    # JPEG不支持透明通道，其他格式保留
+    if pil_format == 'JPEG' and image.mode != 'RGB':
+        image = image.convert('RGB')
+    elif image.mode not in ('RGB', 'RGBA', 'L', 'LA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info
+                              else 'RGB')
+
+    options = {'quality': spec.get('quality', 80)}
+    # 保留色彩配置，EXIF只在显式要求时保留
+    if image.info.get('icc_profile'):
+        options['icc_profile'] = image.info['icc_profile']
+    if not spec.get('strip_exif', True) and spec.get('_exif'):
+        options['exif'] = spec['_exif']
+    image.save(output_path, pil_format, **options)
+
+
+def _generate(path: str, specs: List[dict], output_paths: List[str]) -> List[int]:
+    """解码原图一次，依次生成所有衍生版本，返回各文件大小"""
+    with Image.open(path) as source:
+        # 按EXIF方向旋转后再去除EXIF，否则去除后图片方向会错
+        image = ImageOps.exif_transpose(source)
+        image.load()
+    # 保留EXIF时取旋转后的EXIF（不含方向标记），否则查看器会再旋转一次
+    exif = image.getexif()
+    exif.pop(EXIF_ORIENTATION, None)
+    exif = exif.tobytes() if exif else None
+    sizes = []
+    for spec, output_path in zip(specs, output_paths):
+        _render(image, dict(spec, _exif=exif), output_path)
+        sizes.append(os.path.getsize(output_path))
+    return sizes
+
+
+# ==================== 衍生阶段 ====================
+
+class ImageDerivativeStage:
+    """图片衍生版本生成"""
+
+    def __init__(self, specs: List[dict], key_template: str = DEFAULT_KEY_TEMPLATE,
+                 extensions: Optional[tuple] = None, max_workers: Optional[int] = None):
+        """
+        Args:
+            specs: 衍生版本规格列表，每项包含
+                name（必填）、format（webp/avif/jpeg/png，默认webp）、
+                width/height（最大边长，省略则不缩放）、quality（默认80）、
+                strip_exif（默认True）
+            key_template: 衍生对象键模板，可用 {stem} {name} {ext}
+            extensions: 需要处理的原图扩展名
+            max_workers: 进程数（默认CPU核数）
+        """
+        if not HAVE_PIL:
+            raise ValueError('生成图片衍生版本需要安装 Pillow: pip install Pillow')
+        Image.init()
+
+        self.specs = []
+        names = set()
+        for spec in specs:
+            spec = dict(spec)
+            spec.setdefault('format', 'webp')
+            name = spec.get('name')
+            if not name or name in names:
+                raise ValueError(f'衍生版本名称为空或重复: {name!r}')
+            if spec['format'] not in FORMATS:
+                raise ValueError(f'不支持的衍生格式: {spec["format"]}')
+            if FORMATS[spec['format']][0] not in Image.SAVE:
+                raise ValueError(f'当前Pillow不支持编码 {spec["format"]}，请升级Pillow')
+            names.add(name)
+            self.specs.append(spec)
+
+        self.key_template = key_template
+        self.extensions = tuple(e.lower() for e in (extensions or DEFAULT_EXTENSIONS))
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._closed = False
+        self._temp_dir = tempfile.mkdtemp(prefix='s3derive_')
+        self._counter = 0
+
+    @classmethod
+    def from_config(cls, s3_config: dict) -> Optional['ImageDerivativeStage']:
+        """
+        按配置创建（未配置时返回None）
+
+        配置项：
+            image_derivatives: 衍生版本规格列表
+            image_derivative_key: 衍生对象键模板
+            image_types: 需要处理的原图扩展名列表
+        """
+        specs = s3_config.get('image_derivatives')
+        if not specs:
+            return None
+        return cls(
+            specs,
+            key_template=s3_config.get('image_derivative_key') or DEFAULT_KEY_TEMPLATE,
+            extensions=s3_config.get('image_types')
+        )
+
+    def should_process(self, path: str) -> bool:
+        """是否为需要生成衍生版本的图片"""
+        return path.lower().endswith(self.extensions)
+
+    def derivative_key(self, key: str, name: str) -> str:
+        """原图对象键对应的衍生对象键（与原图在同一目录）"""
+        spec = next(s for s in self.specs if s['name'] == name)
+        directory, filename = posixpath.split(key)
+        stem = posixpath.splitext(filename)[0]
+        derived = self.key_template.format(stem=stem, name=name, ext=FORMATS[spec['format']][1])
+        return posixpath.join(directory, derived) if directory else derived
+
+    def derivative_keys(self, key: str) -> Dict[str, str]:
+        """原图对象键对应的所有衍生对象键 {名称: 对象键}"""
+        return {spec['name']: self.derivative_key(key, spec['name']) for spec in self.specs}
+
+    def content_type(self, name: str) -> str:
+        spec = next(s for s in self.specs if s['name'] == name)
+        return FORMATS[spec['format']][2]
+
+    @property
+    def pending(self) -> int:
+        """正在生成的原图数量"""
+        return self._pending
+
+    def submit(self, path: str, on_done: Callable):
+        """
+        提交一张原图，生成完成后在后台线程调用 on_done(结果, 错误)
+
+        结果为 [(名称, 临时文件路径, 大小), ...]，临时文件由调用方上传后用discard删除
+
+        Raises:
+            RuntimeError: 已调用close
+        """
+        stem = os.path.splitext(os.path.basename(path))[0]
+        with self._lock:
+            if self._closed:
+                raise RuntimeError('衍生阶段已关闭')
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+            self._counter += 1
+            output_paths = [
+                os.path.join(self._temp_dir,
+                             f'{self._counter}_{stem}_{spec["name"]}.{FORMATS[spec["format"]][1]}')
+                for spec in self.specs
+            ]
+            self._pending += 1
+            future = self._pool.submit(_generate, path, self.specs, output_paths)
+
+        def done(future: Future):
+            try:
+                if future.cancelled():
+                    return
+                error = future.exception()
+                if error:
+                    for output_path in output_paths:
+                        self.discard(output_path)
+                    on_done(None, error)
+                else:
+                    names = [spec['name'] for spec in self.specs]
+                    on_done(list(zip(names, output_paths, future.result())), None)
+            finally:
+                with self._lock:
+                    self._pending -= 1
+
+        future.add_done_callback(done)
+
+    def discard(self, output_path: str):
+        """删除生成的临时文件"""
+        try:
+            os.remove(output_path)
+        except OSError:
+            pass
+
+    def close(self):
+        """关闭进程池（未开始的任务取消）并清理临时目录"""
+        with self._lock:
+            self._closed = True
+            pool, self._pool = self._pool, None
+        if pool:
+            pool.shutdown(wait=True, cancel_futures=True)
+        shutil.rmtree(self._temp_dir, ignore_errors=True)
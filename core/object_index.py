@@ -0,0 +1,285 @@
+"""
+远程对象元数据索引
+使用本地SQLite缓存存储桶对象列表，支持增量刷新和前缀查询
+"""
+
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, Tuple
+
+
+def _prefix_upper(prefix: str) -> Optional[str]:
+    """
+    计算前缀的上界（不含），用于范围查询
+
+    SQLite的BINARY排序与S3列举顺序一致（UTF-8字节序），
+    因此前缀查询可转换为 key >= prefix AND key < upper，直接命中主键索引。
+    """
+    while prefix:
+        last = ord(prefix[-1])
+        if last < 0x10FFFF:
+            # 代理区（U+D800~U+DFFF）不是有效字符，无法编码为UTF-8，直接跳到U+E000
+            return prefix[:-1] + chr(0xE000 if last == 0xD7FF else last + 1)
+        prefix = prefix[:-1]
+    return None
+
+
+def _to_epoch(value) -> Optional[float]:
+    """将boto3返回的datetime转换为时间戳"""
+    if value is None:
+        return None
+    if hasattr(value, 'timestamp'):
+        return value.timestamp()
+    return float(value)
+
+
+class ObjectIndex:
+    """远程对象索引（每个配置一个数据库文件）"""
+
+    # 增量刷新时每批比对的对象数量（与ListObjectsV2单页大小一致）
+    BATCH_SIZE = 1000
+
+    def __init__(self, db_path):
+        """
+        打开或创建索引数据库
+
+        Args:
+            db_path: SQLite数据库文件路径
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        # 上传线程和界面线程共用同一连接，由锁串行化
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS objects ('
+                '  bucket TEXT NOT NULL,'
+                '  key TEXT NOT NULL,'
+                '  size INTEGER NOT NULL,'
+                '  etag TEXT,'
+                '  last_modified REAL,'
+                '  checksum TEXT,'
+                '  original_size INTEGER,'
+                '  PRIMARY KEY (bucket, key)'
+                ') WITHOUT ROWID'
+            )
+            # 旧版本的索引没有 original_size 列
+            columns = {row['name'] for row in self._conn.execute('PRAGMA table_info(objects)')}
+            if 'original_size' not in columns:
+                self._conn.execute('ALTER TABLE objects ADD COLUMN original_size INTEGER')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS refreshes ('
+                '  bucket TEXT NOT NULL,'
+                '  prefix TEXT NOT NULL,'
+                '  refreshed_at REAL NOT NULL,'
+                '  PRIMARY KEY (bucket, prefix)'
+                ')'
+            )
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
+
+    # ==================== 写入 ====================
+
+    def record_upload(self, bucket: str, key: str, size: int,
+                      etag: Optional[str] = None, checksum: Optional[str] = None,
+                      last_modified: Optional[float] = None,
+                      original_size: Optional[int] = None):
+        """
+        记录一次成功的上传
+
+        Args:
+            bucket: 存储桶名称
+            key: 对象键
+            size: 对象大小（服务端存储的大小，与列举结果一致）
+            etag: 服务端返回的ETag（可选）
+            checksum: 本地文件的校验和（可选）
+            last_modified: 服务端的修改时间戳（可选，为空时在下次刷新时补上）
+            original_size: 压缩或加密上传时本地文件的大小（对象大小与本地不同）
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO objects '
+                '(bucket, key, size, etag, last_modified, checksum, original_size) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (bucket, key, size, etag, last_modified, checksum, original_size)
+            )
+
+    def remove(self, bucket: str, keys: Iterable[str]):
+        """从索引中移除对象"""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                'DELETE FROM objects WHERE bucket = ? AND key = ?',
+                ((bucket, k) for k in keys)
+            )
+
+    def refresh(self, client, bucket: str, prefix: str = '') -> Tuple[int, int]:
+        """
+        增量刷新前缀下的索引
+
+        按键名顺序分批列举远程对象，每批只与本地同一键区间内的记录比对：
+        仅写入新增/变化的行，并删除区间内远程已不存在的行。
+
+        Args:
+            client: S3ClientWrapper实例
+            bucket: 存储桶名称
+            prefix: 键前缀
+
+        Returns:
+            (新增或更新数量, 删除数量)
+        """
+        changed = removed = 0
+        lower = prefix
+        inclusive = True
+        batch = []
+
+        for obj in client.iter_objects(bucket, prefix):
+            batch.append(obj)
+            if len(batch) >= self.BATCH_SIZE:
+                c, r = self._merge_batch(bucket, batch, lower, inclusive)
+                changed += c
+                removed += r
+                lower = batch[-1]['Key']
+                inclusive = False
+                batch = []
+
+        c, r = self._merge_batch(bucket, batch, lower, inclusive, last=True,
+                                 upper=_prefix_upper(prefix))
+        changed += c
+        removed += r
+
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO refreshes (bucket, prefix, refreshed_at) VALUES (?, ?, ?)',
+                (bucket, prefix, time.time())
+            )
+        return changed, removed
+
+    def _merge_batch(self, bucket: str, batch: list, lower: str, inclusive: bool,
+                     last: bool = False, upper: Optional[str] = None) -> Tuple[int, int]:
+        """
+        合并一批列举结果
+
+        批次覆盖区间为 (lower, 最后一个键]；最后一批额外覆盖到前缀上界，
+        以清理尾部已删除的对象。
+        """
+        op = '>=' if inclusive else '>'
+        sql = f'SELECT key, size, etag, last_modified FROM objects WHERE bucket = ? AND key {op} ?'
+        params = [bucket, lower]
+        if not last:
+            sql += ' AND key <= ?'
+            params.append(batch[-1]['Key'])
+        elif upper is not None:
+            sql += ' AND key < ?'
+            params.append(upper)
+
+        with self._lock, self._conn:
+            existing = {
+                row['key']: (row['size'], row['etag'], row['last_modified'])
+                for row in self._conn.execute(sql, params)
+            }
+
+            upserts = []
+            for obj in batch:
+                key = obj['Key']
+                record = (obj.get('Size', 0), obj.get('ETag'), _to_epoch(obj.get('LastModified')))
+                if existing.pop(key, None) != record:
+                    upserts.append((bucket, key) + record)
+
+            if upserts:
+                # 保留本地记录的校验和与原始大小，除非ETag已变化
+                self._conn.executemany(
+                    'INSERT INTO objects (bucket, key, size, etag, last_modified) '
+                    'VALUES (?, ?, ?, ?, ?) '
+                    'ON CONFLICT (bucket, key) DO UPDATE SET '
+                    '  checksum = CASE WHEN objects.etag IS excluded.etag '
+                    '                   OR objects.etag IS NULL '
+                    '              THEN objects.checksum ELSE NULL END, '
+                    '  original_size = CASE WHEN objects.etag IS excluded.etag '
+                    '                   OR objects.etag IS NULL '
+                    '              THEN objects.original_size ELSE NULL END, '
+                    '  size = excluded.size, etag = excluded.etag, '
+                    '  last_modified = excluded.last_modified',
+                    upserts
+                )
+            if existing:
+                self._conn.executemany(
+                    'DELETE FROM objects WHERE bucket = ? AND key = ?',
+                    ((bucket, k) for k in existing)
+                )
+        return len(upserts), len(existing)
+
+    # ==================== 查询 ====================
+
+    def get(self, bucket: str, key: str) -> Optional[dict]:
+        """获取单个对象的索引记录"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT key, size, etag, last_modified, checksum, original_size FROM objects '
+                'WHERE bucket = ? AND key = ?',
+                (bucket, key)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def exists(self, bucket: str, key: str, size: Optional[int] = None) -> bool:
+        """
+        判断对象是否已存在（本地查询，替代逐个HEAD请求）
+
+        Args:
+            size: 若提供，还要求大小一致
+        """
+        record = self.get(bucket, key)
+        if record is None:
+            return False
+        return size is None or record['size'] == size
+
+    def iter_prefix(self, bucket: str, prefix: str = '') -> Iterator[dict]:
+        """按键名顺序遍历前缀下的索引记录"""
+        sql = ('SELECT key, size, etag, last_modified, checksum, original_size FROM objects '
+               'WHERE bucket = ? AND key >= ?')
+        params = [bucket, prefix]
+        upper = _prefix_upper(prefix)
+        if upper is not None:
+            sql += ' AND key < ?'
+            params.append(upper)
+        sql += ' ORDER BY key'
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        for row in rows:
+            yield dict(row)
+
+    def count(self, bucket: str, prefix: str = '') -> Tuple[int, int]:
+        """
+        统计前缀下的对象
+
+        Returns:
+            (对象数量, 总字节数)
+        """
+        sql = 'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM objects WHERE bucket = ? AND key >= ?'
+        params = [bucket, prefix]
+        upper = _prefix_upper(prefix)
+        if upper is not None:
+            sql += ' AND key < ?'
+            params.append(upper)
+        with self._lock:
+            count, total = self._conn.execute(sql, params).fetchone()
+        return count, total
+
+    def last_refreshed(self, bucket: str, prefix: str = '') -> Optional[float]:
+        """获取前缀最近一次完整刷新的时间戳"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT refreshed_at FROM refreshes WHERE bucket = ? AND prefix = ?',
+                (bucket, prefix)
+            ).fetchone()
+        return row[0] if row else None
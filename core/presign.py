@@ -0,0 +1,229 @@
+"""
+预签名URL
+本地按SigV4查询参数方式签名，不发起网络请求；私有存储桶（未公开）的对象通过预签名链接分享。
+
+签名密钥按日期派生一次后复用，批量签名时公共部分只构造一次，每个键只做一次SHA-256和一次HMAC。
+生成的链接缓存到接近过期，同一对象再次分享时直接返回。
+"""
+
+import hashlib
+import hmac
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+from urllib.parse import quote, urlsplit
+
+
+class Presigner:
+    """S3预签名URL生成器（线程安全）"""
+
+    ALGORITHM = 'AWS4-HMAC-SHA256'
+    # SigV4允许的最长有效期（7天）
+    MAX_EXPIRES = 7 * 24 * 3600
+    DEFAULT_EXPIRES = MAX_EXPIRES
+    DEFAULT_REGION = 'us-east-1'
+    # 剩余有效期不足该比例时重新签名
+    REFRESH_RATIO = 0.2
+    # 缓存的最大链接数
+    CACHE_SIZE = 100000
+
+    def __init__(self, endpoint_url: str, access_key: str, secret_key: str,
+                 region: Optional[str] = None, expires: Optional[int] = None,
+                 session_token: Optional[str] = None):
+        """
+        Args:
+            endpoint_url: S3端点URL
+            access_key: 访问密钥ID
+            secret_key: 秘密访问密钥
+            region: 签名使用的区域（默认us-east-1）
+            expires: 默认有效期（秒，默认7天）
+            session_token: 临时凭证的会话令牌（可选）
+        """
+        if not endpoint_url:
+            raise ValueError('端点URL不能为空')
+        if not access_key or not secret_key:
+            raise ValueError('预签名需要访问密钥')
+
+        parts = urlsplit(endpoint_url)
+        self.scheme = parts.scheme or 'https'
+        self.netloc = parts.netloc
+        # 默认端口不参与签名（与botocore一致）
+        host = parts.netloc
+        default_port = {'http': ':80', 'https': ':443'}.get(self.scheme)
+        if default_port and host.endswith(default_port):
+            host = host[:-len(default_port)]
+        self.host = host
+        self.base_path = parts.path.rstrip('/')
+
+        self.access_key = access_key
+        self._secret = ('AWS4' + secret_key).encode('utf-8')
+        self.region = region or self.DEFAULT_REGION
+        self.expires = self._check_expires(expires or self.DEFAULT_EXPIRES)
+        self.session_token = session_token
+
+        self._signing_keys: Dict[str, bytes] = {}
+        self._cache: 'OrderedDict[tuple, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, s3_config: dict, region: Optional[str] = None) -> Optional['Presigner']:
+        """
+        按配置创建（公开访问、关闭了presign_urls或缺少密钥时返回None）
+
+        Args:
+            region: 配置中没有 region 时使用的区域（如预热时探测到的存储桶区域）
+        """
+        if s3_config.get('make_public') or s3_config.get('presign_urls') is False:
+            return None
+        if not (s3_config.get('access_key') and s3_config.get('secret_key')):
+            return None
+        return cls(
+            s3_config['endpoint'],
+            s3_config['access_key'],
+            s3_config['secret_key'],
+            region=s3_config.get('region') or region,
+            expires=s3_config.get('presign_expires')
+        )
+
+    def _check_expires(self, expires) -> int:
+        expires = int(expires)
+        if not 1 <= expires <= self.MAX_EXPIRES:
+            raise ValueError(f'预签名有效期应在 1 ~ {self.MAX_EXPIRES} 秒之间: {expires}')
+        return expires
+
+    def _signing_key(self, datestamp: str) -> bytes:
+        """派生当天的签名密钥（每个日期只计算一次）"""
+        key = self._signing_keys.get(datestamp)
+        if key is None:
+            key = self._secret
+            for part in (datestamp, self.region, 's3', 'aws4_request'):
+                key = hmac.new(key, part.encode('utf-8'), hashlib.sha256).digest()
+            # 只保留最近的日期
+            self._signing_keys = {datestamp: key}
+        return key
+
+    def _path(self, bucket: str, key: str) -> str:
+        return f"{self.base_path}/{bucket}/{quote(key, safe='/~')}"
+
+    def presign(self, bucket: str, key: str, method: str = 'GET',
+                expires: Optional[int] = None) -> str:
+        """生成单个对象的预签名URL"""
+        return self.presign_many(bucket, [key], method, expires)[0]
+
+    def presign_get(self, bucket: str, key: str, expires: Optional[int] = None) -> str:
+        """下载链接"""
+        return self.presign(bucket, key, 'GET', expires)
+
+    def presign_put(self, bucket: str, key: str, expires: Optional[int] = None) -> str:
+        """上传链接（PUT请求体即对象内容）"""
+        return self.presign(bucket, key, 'PUT', expires)
+
+    def presign_many(self, bucket: str, keys: List[str], method: str = 'GET',
+                     expires: Optional[int] = None, now: Optional[float] = None,
+                     params: Optional[Dict[str, str]] = None) -> List[str]:
+        """
+        批量生成预签名URL
+
+        Args:
+            bucket: 存储桶名称
+            keys: 对象键列表
+            method: HTTP方法（GET / PUT / POST / HEAD / DELETE）
+            expires: 有效期（秒，默认使用创建时的设置）
+            now: 签名时间（默认当前时间）
+            params: 附加的查询参数（参与签名，如 uploads、x-amz-acl、x-amz-meta-*）
+
+        Returns:
+            与keys顺序一致的URL列表
+        """
+        method = method.upper()
+        expires = self._check_expires(expires) if expires else self.expires
+        now = time.time() if now is None else now
+        # 剩余有效期低于该值的缓存链接不再使用
+        min_remaining = expires * self.REFRESH_RATIO
+        extra = tuple(sorted(params.items())) if params else ()
+
+        urls: List[Optional[str]] = [None] * len(keys)
+        missing = []
+        with self._lock:
+            for i, key in enumerate(keys):
+                cache_key = (method, bucket, key, expires, extra)
+                cached = self._cache.get(cache_key)
+                if cached and cached[1] - now > min_remaining:
+                    urls[i] = cached[0]
+                    self._cache.move_to_end(cache_key)
+                else:
+                    missing.append(i)
+        if not missing:
+            return urls
+
+        signed = self._sign(method, bucket, [(keys[i], params) for i in missing], expires, now)
+        valid_until = now + expires
+        with self._lock:
+            for i, url in zip(missing, signed):
+                urls[i] = url
+                self._cache[(method, bucket, keys[i], expires, extra)] = (url, valid_until)
+            while len(self._cache) > self.CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return urls
+
+    def presign_parts(self, bucket: str, key: str, upload_id: str, part_numbers: List[int],
+                      expires: Optional[int] = None, now: Optional[float] = None) -> List[str]:
+        """批量生成分片上传（UploadPart）的预签名URL，不缓存"""
+        expires = self._check_expires(expires) if expires else self.expires
+        now = time.time() if now is None else now
+        items = [(key, {'partNumber': str(n), 'uploadId': upload_id}) for n in part_numbers]
+        return self._sign('PUT', bucket, items, expires, now)
+
+    def _sign(self, method: str, bucket: str, items: List[tuple], expires: int,
+              now: float) -> List[str]:
+        """对 [(对象键, 附加查询参数)] 逐个签名，同一批共用日期、范围和签名密钥"""
+        amz_date = time.strftime('%Y%m%dT%H%M%SZ', time.gmtime(now))
+        with self._lock:
+            signing_key = self._signing_key(amz_date[:8])
+
+        scope = f'{amz_date[:8]}/{self.region}/s3/aws4_request'
+        params = {
+            'X-Amz-Algorithm': self.ALGORITHM,
+            'X-Amz-Credential': f'{self.access_key}/{scope}',
+            'X-Amz-Date': amz_date,
+            'X-Amz-Expires': str(expires),
+            'X-Amz-SignedHeaders': 'host',
+        }
+        if self.session_token:
+            params['X-Amz-Security-Token'] = self.session_token
+        base_pairs = [_encode_pair(name, value) for name, value in params.items()]
+        base_query = _join_query(base_pairs)
+        request_head = f'{method}\n'
+        request_tail = f'\nhost:{self.host}\n\nhost\nUNSIGNED-PAYLOAD'
+        string_head = f'{self.ALGORITHM}\n{amz_date}\n{scope}\n'
+        url_head = f'{self.scheme}://{self.netloc}'
+        # 复制已载入密钥的HMAC对象，省去每个键重新处理密钥
+        mac = hmac.new(signing_key, digestmod=hashlib.sha256)
+        sha256 = hashlib.sha256
+
+        urls = []
+        for key, extra in items:
+            path = self._path(bucket, key)
+            query = base_query
+            if extra:
+                query = _join_query(base_pairs + [_encode_pair(k, v) for k, v in extra.items()])
+            request = f'{request_head}{path}\n{query}{request_tail}'
+            h = mac.copy()
+            h.update((string_head + sha256(request.encode('utf-8')).hexdigest()).encode('utf-8'))
+            urls.append(f'{url_head}{path}?{query}&X-Amz-Signature={h.hexdigest()}')
+        return urls
+
+    def clear_cache(self):
+        with self._lock:
+            self._cache.clear()
+
+
+def _encode_pair(name: str, value) -> tuple:
+    """查询参数按SigV4规则编码"""
+    return quote(name, safe='-_.~'), quote(str(value), safe='-_.~')
+
+
+def _join_query(pairs: List[tuple]) -> str:
+    """规范查询字符串（按编码后的参数名、参数值排序）"""
+    return '&'.join(f'{name}={value}' for name, value in sorted(pairs))
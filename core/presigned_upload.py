@@ -0,0 +1,383 @@
+"""
+预签名上传
+持有密钥的签名服务按请求签发PUT/分片上传的预签名URL，上传端配置中不需要 secret_key。
+
+- SigningService：小型HTTP签名服务（可与上传端运行在同一台机器上，见 signing_helper.py）
+- PresignedClient：提供上传用到的boto3客户端方法（put_object、分片上传），
+  请求直接发往签发的URL。S3ClientWrapper换用它之后，分片读取、缓冲池和并发逻辑不变
+
+x-amz-*参数（ACL、元数据、存储类型等）作为查询参数参与签名，
+Content-Type、Cache-Control等普通请求头不参与签名，由上传端直接发送。
+"""
+
+import hmac
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape
+
+import urllib3
+
+from core.presign import Presigner
+
+
+# 以普通请求头发送的上传参数
+HEADER_ARGS = {
+    'ContentType': 'Content-Type',
+    'CacheControl': 'Cache-Control',
+    'ContentDisposition': 'Content-Disposition',
+    'ContentEncoding': 'Content-Encoding',
+    'ContentLanguage': 'Content-Language',
+    'Expires': 'Expires',
+}
+
+# 作为签名查询参数发送的上传参数
+QUERY_ARGS = {
+    'ACL': 'x-amz-acl',
+    'StorageClass': 'x-amz-storage-class',
+    'Tagging': 'x-amz-tagging',
+    'WebsiteRedirectLocation': 'x-amz-website-redirect-location',
+    'ServerSideEncryption': 'x-amz-server-side-encryption',
+    'SSEKMSKeyId': 'x-amz-server-side-encryption-aws-kms-key-id',
+}
+SIGNED_PARAMS = frozenset(QUERY_ARGS.values())
+
+
+class SigningService:
+    """预签名签发服务（只为一个存储桶签名，可限制对象键前缀）"""
+
+    # 签发的上传URL有效期（秒）
+    UPLOAD_EXPIRES = 3600
+    # 单次请求最多签发的分片URL数
+    MAX_PARTS_PER_REQUEST = 1000
+    OPERATIONS = ('put_object', 'create_multipart_upload', 'upload_part',
+                  'complete_multipart_upload', 'abort_multipart_upload')
+
+    def __init__(self, presigner: Presigner, bucket: str, token: Optional[str] = None,
+                 prefix: str = '', host: str = '127.0.0.1', port: int = 0,
+                 expires: Optional[int] = None):
+        """
+        Args:
+            presigner: 持有密钥的签名器
+            bucket: 允许上传的存储桶
+            token: 访问令牌（请求头 Authorization: Bearer <token>，None表示不校验）
+            prefix: 允许上传的对象键前缀
+            host: 监听地址
+            port: 监听端口（0表示自动分配）
+            expires: 签发URL的有效期（秒，默认1小时）
+        """
+        self.presigner = presigner
+        self.bucket = bucket
+        self.token = token
+        self.prefix = prefix.lstrip('/')
+        self.expires = expires or self.UPLOAD_EXPIRES
+
+        handler = type('Handler', (_SigningHandler,), {'service': self})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @classmethod
+    def from_config(cls, s3_config: dict, **kwargs) -> 'SigningService':
+        """按（持有密钥的）配置创建"""
+        presigner = Presigner(
+            s3_config['endpoint'],
+            s3_config.get('access_key'),
+            s3_config.get('secret_key'),
+            region=s3_config.get('region')
+        )
+        kwargs.setdefault('prefix', s3_config.get('prefix', ''))
+        return cls(presigner, s3_config['bucket'], **kwargs)
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self) -> 'SigningService':
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True,
+                                        name='SigningService')
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self.httpd.serve_forever()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def authorized(self, header: Optional[str]) -> bool:
+        if not self.token:
+            return True
+        return hmac.compare_digest(header or '', f'Bearer {self.token}')
+
+    def sign(self, request: dict) -> List[str]:
+        """
+        处理一个签名请求
+
+        Args:
+            request: {"op", "bucket", "key", "upload_id", "parts", "params"}
+
+        Returns:
+            URL列表（upload_part按parts顺序，其他操作一个）
+        """
+        op = request.get('op')
+        key = request.get('key') or ''
+        if op not in self.OPERATIONS:
+            raise ValueError(f'不支持的操作: {op}')
+        if request.get('bucket') != self.bucket:
+            raise PermissionError(f'不允许上传到存储桶: {request.get("bucket")}')
+        if not key or not key.startswith(self.prefix):
+            raise PermissionError(f'不允许上传的对象键: {key}')
+
+        # 只签上传参数和用户元数据（复制源、授权、SSE-C、对象锁定等参数一律拒绝）
+        params = request.get('params') or {}
+        for name in params:
+            if name not in SIGNED_PARAMS and not name.startswith('x-amz-meta-'):
+                raise ValueError(f'不允许的签名参数: {name}')
+
+        if op == 'put_object':
+            return self.presigner.presign_many(self.bucket, [key], 'PUT', self.expires,
+                                               params=params)
+        if op == 'create_multipart_upload':
+            return self.presigner.presign_many(self.bucket, [key], 'POST', self.expires,
+                                               params={**params, 'uploads': ''})
+
+        upload_id = request.get('upload_id')
+        if not upload_id:
+            raise ValueError('缺少 upload_id')
+        if op == 'upload_part':
+            parts = [int(n) for n in request.get('parts') or ()]
+            if not parts or len(parts) > self.MAX_PARTS_PER_REQUEST:
+                raise ValueError(f'分片数应在 1 ~ {self.MAX_PARTS_PER_REQUEST} 之间')
+            return self.presigner.presign_parts(self.bucket, key, upload_id, parts, self.expires)
+        method = 'POST' if op == 'complete_multipart_upload' else 'DELETE'
+        return self.presigner.presign_many(self.bucket, [key], method, self.expires,
+                                           params={'uploadId': upload_id})
+
+
+class _SigningHandler(BaseHTTPRequestHandler):
+    """POST /sign，请求和响应均为JSON"""
+
+    protocol_version = 'HTTP/1.1'
+    service: SigningService = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, data: dict):
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length) if length else b''
+        if self.path.rstrip('/') != '/sign':
+            return self._send_json(404, {'error': 'not found'})
+        if not self.service.authorized(self.headers.get('Authorization')):
+            return self._send_json(401, {'error': '访问令牌无效'})
+        try:
+            urls = self.service.sign(json.loads(body or b'{}'))
+        except PermissionError as e:
+            return self._send_json(403, {'error': str(e)})
+        except (ValueError, TypeError) as e:
+            return self._send_json(400, {'error': str(e)})
+        self._send_json(200, {'urls': urls, 'expires': self.service.expires})
+
+
+class PresignedClient:
+    """
+    经预签名URL上传的最小S3客户端
+
+    方法签名和返回值与boto3客户端的对应方法一致，供S3ClientWrapper直接替换使用。
+    分片URL按批向签名服务申请，HTTP连接池化复用。
+    """
+
+    # 每次申请的分片URL数
+    PART_URL_BATCH = 64
+    # URL剩余有效期不足该比例时重新申请
+    REFRESH_RATIO = 0.2
+    RETRY_STATUS = (500, 502, 503, 504)
+
+    def __init__(self, signing_url: str, token: Optional[str] = None,
+                 max_pool_connections: int = 10, connect_timeout: Optional[float] = None,
+                 read_timeout: Optional[float] = None, max_attempts: Optional[int] = None):
+        """
+        Args:
+            signing_url: 签名服务地址
+            token: 签名服务访问令牌
+            max_pool_connections: 每个主机保持的最大连接数
+            connect_timeout: 建立连接超时（秒，默认60）
+            read_timeout: 读取响应超时（秒，默认60）
+            max_attempts: 每个请求最多尝试次数（默认3）
+        """
+        self.signing_url = signing_url.rstrip('/') + '/sign'
+        self.token = token
+        self.max_attempts = max_attempts or 3
+        self.http = urllib3.PoolManager(
+            maxsize=max_pool_connections,
+            retries=False,
+            timeout=urllib3.Timeout(connect=connect_timeout or 60, read=read_timeout or 60)
+        )
+        # upload_id -> {分片号: (过期时间, URL)}
+        self._part_urls: Dict[str, Dict[int, tuple]] = {}
+        self._lock = threading.Lock()
+
+    # ==================== 签名服务 ====================
+
+    def _sign(self, op: str, bucket: str, key: str, **fields) -> tuple:
+        """向签名服务申请URL，返回 (URL列表, 有效期)"""
+        headers = {'Content-Type': 'application/json'}
+        if self.token:
+            headers['Authorization'] = f'Bearer {self.token}'
+        body = json.dumps({'op': op, 'bucket': bucket, 'key': key, **fields}).encode('utf-8')
+        response = self._request('POST', self.signing_url, body, headers)
+        data = json.loads(response.data or b'{}')
+        if response.status != 200:
+            raise IOError(f'签名服务拒绝请求 ({response.status}): {data.get("error", "")}')
+        return data['urls'], data.get('expires') or SigningService.UPLOAD_EXPIRES
+
+    def _sign_one(self, op: str, bucket: str, key: str, **fields) -> str:
+        return self._sign(op, bucket, key, **fields)[0][0]
+
+    def _part_url(self, bucket: str, key: str, upload_id: str, part_number: int) -> str:
+        """分片URL（首次用到某段分片时一次申请一批，申请期间不阻塞其他分片）"""
+        with self._lock:
+            deadline, url = self._part_urls.get(upload_id, {}).pop(part_number, (0, None))
+        if url and time.monotonic() < deadline:
+            return url
+
+        parts = list(range(part_number, min(part_number + self.PART_URL_BATCH, 10001)))
+        signed, expires = self._sign('upload_part', bucket, key, upload_id=upload_id,
+                                     parts=parts)
+        deadline = time.monotonic() + expires * (1 - self.REFRESH_RATIO)
+        urls = dict(zip(parts, signed))
+        url = urls.pop(part_number)
+        with self._lock:
+            # 合并到已有的URL中，其他线程尚未使用的URL保留
+            self._part_urls.setdefault(upload_id, {}).update(
+                (n, (deadline, u)) for n, u in urls.items()
+            )
+        return url
+
+    # ==================== HTTP ====================
+
+    def _request(self, method: str, url: str, body=None, headers: Optional[dict] = None):
+        """发送请求，连接错误和5xx时重试（请求体回到开头重发）"""
+        for attempt in range(1, self.max_attempts + 1):
+            if hasattr(body, 'seek'):
+                body.seek(0)
+            try:
+                response = self.http.request(method, url, body=body, headers=headers,
+                                             redirect=False, preload_content=True)
+            except urllib3.exceptions.HTTPError:
+                if attempt == self.max_attempts:
+                    raise
+            else:
+                if response.status not in self.RETRY_STATUS or attempt == self.max_attempts:
+                    return response
+            time.sleep(min(0.2 * 2 ** (attempt - 1), 5))
+
+    @staticmethod
+    def _check(response, xml: bool = False):
+        """检查S3响应，失败时抛出IOError；xml=True时返回解析后的根元素"""
+        root = None
+        if response.data and (xml or response.status >= 300):
+            try:
+                root = ElementTree.fromstring(response.data)
+            except ElementTree.ParseError:
+                root = None
+        if response.status >= 300 or (root is not None and _local_name(root.tag) == 'Error'):
+            code = _find_text(root, 'Code') or response.status
+            message = _find_text(root, 'Message') or ''
+            raise IOError(f'上传请求失败 ({code}): {message}'.rstrip(': '))
+        return root
+
+    @staticmethod
+    def _split_args(extra_args: dict) -> tuple:
+        """上传参数拆分为 (请求头, 签名查询参数)"""
+        headers, params = {}, {}
+        for name, value in extra_args.items():
+            if name in HEADER_ARGS:
+                headers[HEADER_ARGS[name]] = str(value)
+            elif name in QUERY_ARGS:
+                params[QUERY_ARGS[name]] = str(value)
+            elif name == 'Metadata':
+                for meta_key, meta_value in value.items():
+                    params[f'x-amz-meta-{meta_key.lower()}'] = str(meta_value)
+            else:
+                raise ValueError(f'预签名上传不支持的参数: {name}')
+        return headers, params
+
+    # ==================== boto3客户端方法 ====================
+
+    def put_object(self, Bucket: str, Key: str, Body, **extra_args) -> dict:
+        headers, params = self._split_args(extra_args)
+        headers['Content-Length'] = str(len(Body))
+        url = self._sign_one('put_object', Bucket, Key, params=params)
+        response = self._request('PUT', url, Body, headers)
+        self._check(response)
+        return {'ETag': response.headers.get('ETag', '')}
+
+    def create_multipart_upload(self, Bucket: str, Key: str, **extra_args) -> dict:
+        headers, params = self._split_args(extra_args)
+        url = self._sign_one('create_multipart_upload', Bucket, Key, params=params)
+        root = self._check(self._request('POST', url, b'', headers), xml=True)
+        upload_id = _find_text(root, 'UploadId')
+        if not upload_id:
+            raise IOError('创建分片上传失败: 响应中没有UploadId')
+        return {'UploadId': upload_id}
+
+    def upload_part(self, Bucket: str, Key: str, UploadId: str, PartNumber: int, Body) -> dict:
+        url = self._part_url(Bucket, Key, UploadId, PartNumber)
+        response = self._request('PUT', url, Body, {'Content-Length': str(len(Body))})
+        self._check(response)
+        return {'ETag': response.headers.get('ETag', '')}
+
+    def complete_multipart_upload(self, Bucket: str, Key: str, UploadId: str,
+                                  MultipartUpload: dict) -> dict:
+        with self._lock:
+            self._part_urls.pop(UploadId, None)
+        body = '<CompleteMultipartUpload>' + ''.join(
+            f'<Part><PartNumber>{p["PartNumber"]}</PartNumber><ETag>{escape(p["ETag"])}</ETag></Part>'
+            for p in MultipartUpload['Parts']
+        ) + '</CompleteMultipartUpload>'
+        url = self._sign_one('complete_multipart_upload', Bucket, Key, upload_id=UploadId)
+        root = self._check(self._request('POST', url, body.encode('utf-8'),
+                                         {'Content-Type': 'application/xml'}), xml=True)
+        return {'ETag': _find_text(root, 'ETag') or ''}
+
+    def abort_multipart_upload(self, Bucket: str, Key: str, UploadId: str) -> dict:
+        with self._lock:
+            self._part_urls.pop(UploadId, None)
+        url = self._sign_one('abort_multipart_upload', Bucket, Key, upload_id=UploadId)
+        self._check(self._request('DELETE', url))
+        return {}
+
+
+def _local_name(tag: str) -> str:
+    return tag.rsplit('}', 1)[-1]
+
+
+def _find_text(root, name: str) -> Optional[str]:
+    """按不带命名空间的标签名查找子元素文本"""
+    if root is None:
+        return None
+    for element in root.iter():
+        if _local_name(element.tag) == name:
+            return element.text
+    return None
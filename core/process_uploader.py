@@ -0,0 +1,138 @@
+"""
+多进程上传
+高速网络下大量分片并发时，签名、校验和与SSL写入在单进程中受GIL限制。
+启用后文件上传任务分发到多个进程执行，每个进程有自己的S3客户端（连接池）和缓冲池；
+进度通过共享内存计数器回报，主进程轮询计数器后按原有方式更新任务进度。
+"""
+
+import multiprocessing
+import queue
+from concurrent.futures import ProcessPoolExecutor, wait
+from typing import Callable, Optional
+
+from core.buffer_pool import BufferPool
+from core.s3_client import S3ClientWrapper
+
+
+class ProcessUploadBackend:
+    """文件上传的多进程执行后端"""
+
+    # 主进程读取进度计数器的间隔（秒）
+    POLL_INTERVAL = 0.1
+
+    def __init__(self, s3_config: dict, processes: int, slots: int, buffer_pool_mb: float):
+        """
+        Args:
+            s3_config: S3配置（子进程据此创建客户端）
+            processes: 进程数
+            slots: 同时在途的上传数（每个上传占用一组进度计数器）
+            buffer_pool_mb: 缓冲池总容量（MB），按进程均分（每个进程不少于一个并发窗口的分片）
+        """
+        self.processes = processes
+        # 子进程由spawn启动，不继承主进程中正在运行的线程和锁
+        context = multiprocessing.get_context('spawn')
+        # 每个槽位两个计数：已上传字节数、总字节数（每个槽位同一时间只有一个写入方）
+        self._counters = context.Array('q', slots * 2, lock=False)
+        self._free_slots = queue.Queue()
+        for slot in range(slots):
+            self._free_slots.put(slot)
+
+        # 缓冲池容量按进程均分，但每个进程至少能容纳一个并发窗口的分片
+        window = S3ClientWrapper.buffer_window(
+            s3_config.get('chunk_size') or S3ClientWrapper.DEFAULT_CHUNK_SIZE,
+            s3_config.get('part_concurrency') or S3ClientWrapper.DEFAULT_CONCURRENCY,
+            bool(s3_config.get('encryption_key'))
+        )
+        config = dict(s3_config, buffer_pool_mb=max(buffer_pool_mb / processes, window / 1024 / 1024))
+        self._pool = ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=context,
+            initializer=_init_process,
+            initargs=(config, self._counters)
+        )
+
+    @classmethod
+    def from_config(cls, s3_config: dict, slots: int,
+                    buffer_pool_mb: float) -> Optional['ProcessUploadBackend']:
+        """
+        按配置创建（upload_processes 未设置或不大于1时返回None）
+
+        Raises:
+            ValueError: 分片大小超过单个分片的上限
+        """
+        processes = int(s3_config.get('upload_processes') or 0)
+        if processes <= 1:
+            return None
+        chunk_size = s3_config.get('chunk_size') or S3ClientWrapper.DEFAULT_CHUNK_SIZE
+        if chunk_size > S3ClientWrapper.MAX_PART_SIZE:
+            raise ValueError(f'分片大小 {chunk_size} 超过单个分片 5GB 的上限')
+        return cls(s3_config, processes, max(slots, processes), buffer_pool_mb)
+
+    def upload_file(self, local_path: str, bucket: str, key: str, make_public: bool = False,
+                    progress_callback: Optional[Callable] = None,
+                    extra_args: Optional[dict] = None) -> str:
+        """在子进程中上传文件（参数与 S3ClientWrapper.upload_file 相同），等待完成并回报进度"""
+        slot = self._free_slots.get()
+        counters = self._counters
+        try:
+            counters[2 * slot] = 0
+            counters[2 * slot + 1] = 0
+            future = self._pool.submit(_upload_file, slot, local_path, bucket, key,
+                                       make_public, extra_args)
+            last_seen = 0
+            while True:
+                done, _ = wait([future], timeout=self.POLL_INTERVAL)
+                seen, total = counters[2 * slot], counters[2 * slot + 1]
+                if progress_callback and total and seen != last_seen:
+                    last_seen = seen
+                    progress_callback(local_path, seen, total, seen / total * 100)
+                if done:
+                    return future.result()
+        finally:
+            self._free_slots.put(slot)
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+
+
+# ==================== 子进程 ====================
+
+_client = None
+_counters = None
+
+
+def _init_process(s3_config: dict, counters):
+    """子进程初始化：创建本进程的S3客户端和缓冲池"""
+    global _client, _counters
+    from core.encryption import EnvelopeEncryption
+    from core.s3_client import ContentTypeResolver, S3ClientWrapper
+
+    _counters = counters
+    _client = S3ClientWrapper(
+        endpoint_url=s3_config['endpoint'],
+        access_key=s3_config.get('access_key'),
+        secret_key=s3_config.get('secret_key'),
+        chunk_size=s3_config.get('chunk_size'),
+        max_concurrency=s3_config.get('part_concurrency'),
+        buffer_pool=BufferPool(int(s3_config['buffer_pool_mb'] * 1024 * 1024)),
+        encryption=EnvelopeEncryption.from_config(s3_config),
+        content_types=ContentTypeResolver.from_config(s3_config),
+        signing_url=s3_config.get('signing_url'),
+        signing_token=s3_config.get('signing_token'),
+        region_name=s3_config.get('region'),
+        addressing_style=s3_config.get('addressing_style')
+    )
+
+
+def _upload_file(slot: int, local_path: str, bucket: str, key: str, make_public: bool,
+                 extra_args: Optional[dict]) -> str:
+    def progress(filename, seen, size, percent):
+        _counters[2 * slot + 1] = size
+        _counters[2 * slot] = seen
+
+    try:
+        return _client.upload_file(local_path, bucket, key, make_public=make_public,
+                                   progress_callback=progress, extra_args=extra_args)
+    except Exception as e:
+        # botocore的异常不一定能跨进程传递，只传回消息
+        raise IOError(str(e)) from None
@@ -4,9 +4,16 @@ S3客户端封装类
 """
 
 import os
+import re
+import mmap
+import codecs
+import fnmatch
 import mimetypes
+import posixpath
 import threading
-from typing import Optional, Callable
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, Optional, Callable, Iterable, Iterator
 
 try:
     import boto3
@@ -15,6 +22,10 @@ try:
 except ImportError as e:
     raise ImportError('需要安装 boto3 和 botocore: pip install boto3')
 
+from core.buffer_pool import BufferPool
+from core.encryption import EnvelopeEncryption, ObjectCipher
+from core.presigned_upload import PresignedClient
+
 
 class ProgressCallback:
     """上传进度回调处理器"""
@@ -34,11 +45,325 @@ class ProgressCallback:
             self.update_fn(self.filename, self.seen_so_far, self.filesize, percent)
 
 
+class ContentTypeResolver:
+    """
+    Content-Type解析器
+    
+    扩展名表在导入时一次性加载（不在第一个上传线程中初始化mimetypes），
+    未知扩展名的查询结果也会缓存。可按配置添加覆盖规则，
+    扩展名无法判断时可根据上传时已读取的开头字节识别文件类型。
+    """
+    
+    # 识别类型时查看的开头字节数
+    SNIFF_SIZE = 512
+    
+    # mimetypes缺失或与浏览器期望不一致的类型
+    EXTRA_TYPES = {
+        '.js': 'text/javascript',
+        '.mjs': 'text/javascript',
+        '.wasm': 'application/wasm',
+        '.json': 'application/json',
+        '.map': 'application/json',
+        '.webmanifest': 'application/manifest+json',
+        '.svg': 'image/svg+xml',
+        '.webp': 'image/webp',
+        '.avif': 'image/avif',
+        '.heic': 'image/heic',
+        '.woff': 'font/woff',
+        '.woff2': 'font/woff2',
+        '.md': 'text/markdown',
+    }
+    
+    # (偏移, 魔数, 类型)
+    SIGNATURES = (
+        (0, b'\x89PNG\r\n\x1a\n', 'image/png'),
+        (0, b'\xff\xd8\xff', 'image/jpeg'),
+        (0, b'GIF87a', 'image/gif'),
+        (0, b'GIF89a', 'image/gif'),
+        (0, b'%PDF-', 'application/pdf'),
+        (0, b'PK\x03\x04', 'application/zip'),
+        (0, b'\x1f\x8b', 'application/gzip'),
+        (0, b'\x28\xb5\x2f\xfd', 'application/zstd'),
+        (0, b'BZh', 'application/x-bzip2'),
+        (0, b'\xfd7zXZ\x00', 'application/x-xz'),
+        (0, b"7z\xbc\xaf'\x1c", 'application/x-7z-compressed'),
+        (0, b'\x00asm', 'application/wasm'),
+        (0, b'wOF2', 'font/woff2'),
+        (0, b'wOFF', 'font/woff'),
+        (0, b'OggS', 'audio/ogg'),
+        (0, b'fLaC', 'audio/flac'),
+        (0, b'ID3', 'audio/mpeg'),
+        (0, b'\x1a\x45\xdf\xa3', 'video/webm'),
+        (0, b'SQLite format 3\x00', 'application/vnd.sqlite3'),
+        (257, b'ustar', 'application/x-tar'),
+    )
+    RIFF_TYPES = {b'WEBP': 'image/webp', b'WAVE': 'audio/wav', b'AVI ': 'video/x-msvideo'}
+    FTYP_TYPES = {b'avif': 'image/avif', b'avis': 'image/avif', b'heic': 'image/heic',
+                  b'heix': 'image/heic', b'mif1': 'image/heic', b'qt  ': 'video/quicktime'}
+    
+    _base_types: Dict[str, str] = {}
+    
+    def __init__(self, overrides: Optional[Dict[str, str]] = None, sniffing: bool = True):
+        """
+        Args:
+            overrides: 覆盖规则 {通配模式: 类型}，如 {"*.wasm": "application/wasm"}，
+                       按对象键匹配（不区分大小写），优先于扩展名表
+            sniffing: 扩展名无法判断时是否根据开头字节识别
+        """
+        self.sniffing = sniffing
+        # 扩展名 -> 类型（None表示已查询过但未知）
+        self._types: Dict[str, Optional[str]] = dict(self._load_base_types())
+        patterns = []
+        for pattern, content_type in (overrides or {}).items():
+            ext = pattern[1:].lower()
+            if pattern.startswith('*.') and not any(c in ext for c in '*?[/'):
+                self._types[ext] = content_type
+            else:
+                patterns.append((pattern, content_type))
+        # 其他规则合并为一个正则，按配置顺序优先
+        self._pattern_types = [content_type for _, content_type in patterns]
+        self._pattern = re.compile(
+            '|'.join(f'(?P<p{i}>{fnmatch.translate(pattern)})' for i, (pattern, _) in enumerate(patterns)),
+            re.IGNORECASE
+        ) if patterns else None
+    
+    @classmethod
+    def _load_base_types(cls) -> Dict[str, str]:
+        if not cls._base_types:
+            mimetypes.init()
+            types = {ext.lower(): t for ext, t in mimetypes.types_map.items()}
+            types.update(cls.EXTRA_TYPES)
+            cls._base_types = types
+        return cls._base_types
+    
+    @classmethod
+    def from_config(cls, s3_config: dict) -> 'ContentTypeResolver':
+        """
+        按配置创建（未配置时返回共享的默认解析器）
+        
+        配置项：
+            content_types: 覆盖规则 {通配模式: 类型}
+            content_sniffing: 是否根据开头字节识别（默认true）
+        """
+        overrides = s3_config.get('content_types')
+        sniffing = s3_config.get('content_sniffing', True)
+        if not overrides and sniffing:
+            return DEFAULT_CONTENT_TYPES
+        return cls(overrides, sniffing)
+    
+    def lookup(self, name: str) -> Optional[str]:
+        """按覆盖规则和扩展名判断类型"""
+        if self._pattern:
+            match = self._pattern.match(name)
+            if match:
+                return self._pattern_types[int(match.lastgroup[1:])]
+        
+        ext = posixpath.splitext(name.replace('\\', '/'))[1].lower()
+        if not ext:
+            return None
+        try:
+            return self._types[ext]
+        except KeyError:
+            content_type = mimetypes.guess_type('x' + ext)[0]
+            self._types[ext] = content_type
+            return content_type
+    
+    def sniff(self, head) -> Optional[str]:
+        """
+        根据开头字节识别类型
+        
+        Args:
+            head: 文件开头的字节（bytes或memoryview，SNIFF_SIZE字节即可）
+        """
+        head = bytes(head[:self.SNIFF_SIZE])
+        for offset, magic, content_type in self.SIGNATURES:
+            if head.startswith(magic, offset):
+                return content_type
+        if head[:4] == b'RIFF' and head[8:12] in self.RIFF_TYPES:
+            return self.RIFF_TYPES[head[8:12]]
+        if head[4:8] == b'ftyp':
+            return self.FTYP_TYPES.get(head[8:12], 'video/mp4')
+        
+        if not head or b'\x00' in head:
+            return None
+        try:
+            # 末尾可能截断在多字节字符中间
+            text = codecs.getincrementaldecoder('utf-8-sig')().decode(head, final=False)
+        except UnicodeDecodeError:
+            return None
+        start = text.lstrip()[:256].lower()
+        if start.startswith('<svg') or (start.startswith('<?xml') and '<svg' in start):
+            return 'image/svg+xml'
+        if start.startswith('<?xml'):
+            return 'application/xml'
+        if start.startswith(('<!doctype html', '<html')):
+            return 'text/html; charset=utf-8'
+        return 'text/plain; charset=utf-8'
+    
+    def resolve(self, name: str, head=None) -> Optional[str]:
+        """按名称判断，无法判断且提供了开头字节时识别内容"""
+        content_type = self.lookup(name)
+        if content_type is None and head is not None and self.sniffing:
+            content_type = self.sniff(head)
+        return content_type
+
+
+# 导入时预加载，各线程共用
+DEFAULT_CONTENT_TYPES = ContentTypeResolver()
+
+
+class PartReader:
+    """
+    分片读取器
+    
+    以memoryview切片的形式把文件映射中的一段直接交给HTTP层，
+    读取、计算校验和、写入socket全程不产生中间的bytes拷贝。
+    """
+    
+    def __init__(self, view: memoryview, callback: Optional[Callable] = None):
+        """
+        Args:
+            view: 分片数据
+            callback: 进度回调，参数为本次传输的字节数（回退时为负数）
+        """
+        self._view = view
+        self._pos = 0
+        self._callback = callback
+        # 签名阶段读取数据计算哈希时不计入进度
+        self._transferring = True
+    
+    def __len__(self) -> int:
+        return len(self._view)
+    
+    def read(self, amount: Optional[int] = -1) -> memoryview:
+        end = len(self._view)
+        if amount is not None and amount >= 0:
+            end = min(self._pos + amount, end)
+        chunk = self._view[self._pos:end]
+        self._pos = end
+        if chunk and self._callback and self._transferring:
+            self._callback(len(chunk))
+        return chunk
+    
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        if whence == os.SEEK_CUR:
+            offset += self._pos
+        elif whence == os.SEEK_END:
+            offset += len(self._view)
+        offset = max(0, min(offset, len(self._view)))
+        # 重试时回退到开头，撤销已计入的进度
+        if offset < self._pos and self._callback and self._transferring:
+            self._callback(offset - self._pos)
+        self._pos = offset
+        return offset
+    
+    def tell(self) -> int:
+        return self._pos
+    
+    def peek(self, size: int) -> memoryview:
+        """查看开头的size字节（不移动位置，不计入进度）"""
+        return self._view[:size]
+    
+    def signal_transferring(self):
+        self._transferring = True
+    
+    def signal_not_transferring(self):
+        self._transferring = False
+    
+    def close(self):
+        pass
+
+
+def _stream_filler(stream) -> Callable[[memoryview], int]:
+    """
+    把流适配为填充函数：fill(view) 尽量读满view，返回读入的字节数（不足表示流结束）
+    
+    支持readinto（直接读入缓冲区）、read，以及产生bytes的迭代器
+    """
+    if hasattr(stream, 'readinto'):
+        def fill(view: memoryview) -> int:
+            filled = 0
+            while filled < len(view):
+                n = stream.readinto(view[filled:])
+                if not n:
+                    break
+                filled += n
+            return filled
+        return fill
+    
+    if hasattr(stream, 'read'):
+        def fill(view: memoryview) -> int:
+            filled = 0
+            while filled < len(view):
+                data = stream.read(len(view) - filled)
+                if not data:
+                    break
+                view[filled:filled + len(data)] = data
+                filled += len(data)
+            return filled
+        return fill
+    
+    chunks = iter(stream)
+    pending = memoryview(b'')
+    
+    def fill(view: memoryview) -> int:
+        nonlocal pending
+        filled = 0
+        while filled < len(view):
+            if not pending:
+                try:
+                    pending = memoryview(next(chunks))
+                except StopIteration:
+                    break
+                continue
+            n = min(len(pending), len(view) - filled)
+            view[filled:filled + n] = pending[:n]
+            pending = pending[n:]
+            filled += n
+        return filled
+    return fill
+
+
+def _signal_not_transferring(request, **kwargs):
+    if hasattr(request.body, 'signal_not_transferring'):
+        request.body.signal_not_transferring()
+
+
+def _signal_transferring(request, **kwargs):
+    if hasattr(request.body, 'signal_transferring'):
+        request.body.signal_transferring()
+
+
 class S3ClientWrapper:
     """S3客户端包装器"""
     
+    # 服务端复制：超过该大小时使用并发UploadPartCopy（单次CopyObject上限为5GB）
+    COPY_PART_SIZE = 256 * 1024 * 1024
+    # DeleteObjects单次请求最多1000个键
+    DELETE_BATCH_SIZE = 1000
+    
+    # 默认分片大小和分片并发数
+    DEFAULT_CHUNK_SIZE = 5 * 1024 * 1024
+    DEFAULT_CONCURRENCY = 4
+    # 分片上传最多10000个分片，单个分片最大5GB
+    MAX_PARTS = 10000
+    MAX_PART_SIZE = 5 * 1024 * 1024 * 1024
+    # 流式上传：每上传这么多个分片，分片大小翻倍（5MB起步时10000个分片可覆盖约5TB）
+    STREAM_PARTS_PER_STEP = 1000
+    # 未指定共享缓冲池时，流式上传使用的缓冲上限
+    STREAM_BUFFER_SIZE = 64 * 1024 * 1024
+    
     def __init__(self, endpoint_url: str, access_key: Optional[str] = None, 
-                 secret_key: Optional[str] = None):
+                 secret_key: Optional[str] = None,
+                 chunk_size: Optional[int] = None, max_concurrency: Optional[int] = None,
+                 buffer_pool: Optional[BufferPool] = None,
+                 encryption: Optional[EnvelopeEncryption] = None,
+                 content_types: Optional[ContentTypeResolver] = None,
+                 connect_timeout: Optional[float] = None, read_timeout: Optional[float] = None,
+                 max_attempts: Optional[int] = None,
+                 signing_url: Optional[str] = None, signing_token: Optional[str] = None,
+                 region_name: Optional[str] = None, addressing_style: Optional[str] = None,
+                 max_pool_connections: Optional[int] = None, client=None):
         """
         初始化S3客户端
         
@@ -46,28 +371,80 @@ class S3ClientWrapper:
             endpoint_url: S3端点URL
             access_key: 访问密钥ID（可选）
             secret_key: 访问密钥（可选）
+            chunk_size: 分片大小（默认5MB）
+            max_concurrency: 单文件分片并发数（默认4）
+            buffer_pool: 共享缓冲池（可选）。加密上传的分片和流式上传的数据读入池中缓冲区，
+                         内存占用受池容量限制；未加密的文件分片直接映射文件
+            encryption: 客户端加密（可选）。上传时逐分片加密，下载时逐段解密
+            content_types: Content-Type解析器（默认使用共享的预加载解析器）
+            connect_timeout: 建立连接超时（秒，默认使用botocore的60秒）
+            read_timeout: 读取响应超时（秒，默认使用botocore的60秒）
+            max_attempts: 最多尝试次数（含首次，默认使用botocore的重试设置）
+            signing_url: 签名服务地址（可选）。指定时不使用密钥，
+                         上传请求发往签名服务签发的预签名URL（只支持上传）
+            signing_token: 签名服务访问令牌
+            region_name: 区域（默认由botocore决定）
+            addressing_style: 寻址方式 auto / path / virtual（默认auto）
+            max_pool_connections: 连接池大小（默认使用botocore的10个）
+            client: 复用已创建的boto3客户端（如ClientPool中预热过的客户端），指定时忽略连接相关参数
         """
-        if not endpoint_url:
+        if not endpoint_url and not signing_url:
             raise ValueError('端点URL不能为空')
         
-        config = Config(signature_version='s3v4')
-        session = boto3.session.Session()
-        
-        self.client = session.client(
-            's3',
-            endpoint_url=endpoint_url,
-            aws_access_key_id=access_key,
-            aws_secret_access_key=secret_key,
-            config=config
-        )
-        
-        # 传输配置：5MB分片，最多4个并发
+        # 传输配置：默认5MB分片，最多4个并发
+        chunk_size = chunk_size or self.DEFAULT_CHUNK_SIZE
         self.transfer_config = TransferConfig(
-            multipart_threshold=5 * 1024 * 1024,
-            max_concurrency=4,
-            multipart_chunksize=5 * 1024 * 1024,
+            multipart_threshold=chunk_size,
+            max_concurrency=max_concurrency or self.DEFAULT_CONCURRENCY,
+            multipart_chunksize=chunk_size,
             use_threads=True
         )
+        self.buffer_pool = buffer_pool
+        self.encryption = encryption
+        self.content_types = content_types or DEFAULT_CONTENT_TYPES
+        
+        if signing_url:
+            self.client = PresignedClient(
+                signing_url, signing_token,
+                max_pool_connections=max(10, self.transfer_config.max_concurrency),
+                connect_timeout=connect_timeout,
+                read_timeout=read_timeout,
+                max_attempts=max_attempts
+            )
+            return
+        
+        if client is not None:
+            self.client = client
+        else:
+            options = {}
+            if connect_timeout:
+                options['connect_timeout'] = connect_timeout
+            if read_timeout:
+                options['read_timeout'] = read_timeout
+            if max_attempts:
+                options['retries'] = {'max_attempts': max_attempts, 'mode': 'standard'}
+            if addressing_style:
+                options['s3'] = {'addressing_style': addressing_style}
+            if max_pool_connections:
+                options['max_pool_connections'] = max_pool_connections
+            config = Config(signature_version='s3v4', **options)
+            session = boto3.session.Session()
+            
+            self.client = session.client(
+                's3',
+                endpoint_url=endpoint_url,
+                region_name=region_name,
+                aws_access_key_id=access_key,
+                aws_secret_access_key=secret_key,
+                config=config
+            )
+        
+        # 签名（request-created）期间读取请求体不计入进度
+        events = self.client.meta.events
+        events.register_first('request-created.s3', _signal_not_transferring,
+                              unique_id='s3uploader-not-transferring')
+        events.register_last('request-created.s3', _signal_transferring,
+                             unique_id='s3uploader-transferring')
     
     def test_connection(self) -> tuple[bool, str]:
         """
@@ -85,43 +462,517 @@ class S3ClientWrapper:
     
     def upload_file(self, local_path: str, bucket: str, key: str, 
                    make_public: bool = False, 
-                   progress_callback: Optional[Callable] = None) -> None:
+                   progress_callback: Optional[Callable] = None,
+                   extra_args: Optional[dict] = None) -> str:
         """
         上传文件到S3
         
+        每个分片以memoryview的形式交给HTTP层（文件映射或缓冲池中的缓冲区），
+        数据写入socket前不经过中间拷贝。
+        
         Args:
             local_path: 本地文件路径
             bucket: 存储桶名称
             key: 对象键（S3中的路径）
             make_public: 是否设置为公开可读
             progress_callback: 进度回调函数
+            extra_args: 额外的上传参数（如Metadata）
+            
+        Returns:
+            对象的ETag
         """
-        extra_args = {}
+        extra_args = dict(extra_args or {})
         
-        # 设置ACL
+        # 设置ACL（上传规则指定的ACL优先）
         if make_public:
-            extra_args['ACL'] = 'public-read'
+            extra_args.setdefault('ACL', 'public-read')
+        
+        # 自动检测Content-Type（扩展名无法判断时识别已读入的开头字节）
+        if 'ContentType' not in extra_args:
+            content_type = self.content_types.lookup(key) or self.content_types.lookup(local_path)
+            if content_type:
+                extra_args['ContentType'] = content_type
+        sniff = 'ContentType' not in extra_args and self.content_types.sniffing
         
-        # 自动检测Content-Type
-        content_type, _ = mimetypes.guess_type(local_path)
+        with open(local_path, 'rb') as f:
+            filesize = os.fstat(f.fileno()).st_size
+            part_size = self._file_part_size(filesize)
+            
+            # 客户端加密：每个分片为一个独立加密的段，信封信息写入对象元数据
+            cipher = None
+            upload_size = filesize
+            if self.encryption:
+                cipher = self.encryption.new_object(part_size, filesize)
+                extra_args['Metadata'] = {**extra_args.get('Metadata', {}), **cipher.metadata}
+                extra_args['ContentType'] = 'application/octet-stream'
+                upload_size = cipher.encrypted_size(filesize)
+                sniff = False
+            
+            # 分片随文件增大（最多10000个），缓冲池至少容纳该文件一个并发窗口的分片
+            if self.buffer_pool and cipher:
+                parts = min(self.transfer_config.max_concurrency, -(-filesize // part_size))
+                self.buffer_pool.ensure_capacity(
+                    self.buffer_window(min(part_size, filesize), max(1, parts), True)
+                )
+            
+            # 创建进度回调
+            callback = None
+            if progress_callback:
+                callback = ProgressCallback(local_path, upload_size, progress_callback)
+            
+            if filesize <= self.transfer_config.multipart_threshold:
+                with self._open_part(f, filesize, 0, filesize, callback, cipher) as body:
+                    if sniff:
+                        self._sniff_content_type(body.peek(ContentTypeResolver.SNIFF_SIZE), extra_args)
+                    return self._put_object(bucket, key, body, extra_args)
+            if sniff:
+                # 分片上传创建时就要确定类型，读取的是第一个分片随后会从页缓存读取的数据
+                head = memoryview(bytearray(ContentTypeResolver.SNIFF_SIZE))
+                self._read_into(f, head, 0)
+                self._sniff_content_type(head, extra_args)
+            return self._upload_multipart(bucket, key, f, filesize, part_size, callback,
+                                          cipher, extra_args)
+    
+    def _sniff_content_type(self, head, extra_args: dict):
+        content_type = self.content_types.sniff(head)
         if content_type:
             extra_args['ContentType'] = content_type
+    
+    @staticmethod
+    def _part_buffer_size(length: int, encrypted: bool) -> int:
+        """读取一个分片所需的缓冲区大小（加密时明文和密文共用一块缓冲区）"""
+        # 密文比明文多一个标签，update_into还需要一个块的余量
+        return 2 * length + 2 * ObjectCipher.TAG_SIZE if encrypted else length
+    
+    @classmethod
+    def buffer_window(cls, part_size: int, parts: int, encrypted: bool = False) -> int:
+        """同时在途的parts个分片占用的缓冲池容量"""
+        return parts * BufferPool.size_class(cls._part_buffer_size(part_size, encrypted))
+    
+    def _file_part_size(self, filesize: int) -> int:
+        """文件分片大小（不超过10000个分片，按映射分配粒度对齐）"""
+        part_size = max(self.transfer_config.multipart_chunksize, -(-filesize // self.MAX_PARTS))
+        granularity = mmap.ALLOCATIONGRANULARITY
+        return -(-part_size // granularity) * granularity
+    
+    @contextmanager
+    def _open_part(self, f, filesize: int, offset: int, length: int,
+                   callback: Optional[ProgressCallback],
+                   cipher: Optional[ObjectCipher] = None, index: int = 0) -> Iterator[PartReader]:
+        """
+        打开文件中的一段作为请求体
+        
+        未加密时只读映射该段（映射的页在页缓存中，不占用缓冲池）；
+        加密时用preadv读入缓冲区（有缓冲池时从池中获取，池满时阻塞），明文和密文共用一块缓冲区。
+        两种方式都不在Python层产生额外拷贝。
+        """
+        if length == 0 and cipher is None:
+            yield PartReader(memoryview(b''), callback)
+            return
+        
+        if cipher:
+            size = self._part_buffer_size(length, True)
+            pool = self.buffer_pool
+            buffer = pool.acquire(size) if pool else bytearray(size)
+            try:
+                view = memoryview(buffer)
+                body = view[:length]
+                self._read_into(f, body, offset)
+                if cipher:
+                    n = cipher.encrypt_into(index, offset + length >= filesize, body, view[length:])
+                    body = view[length:length + n]
+                yield PartReader(body, callback)
+            finally:
+                if pool:
+                    pool.release(buffer)
+            return
+        
+        # 映射期间文件被截断时访问会触发SIGBUS，映射前先检查
+        if os.fstat(f.fileno()).st_size != filesize:
+            raise IOError(f'上传过程中文件被修改: {f.name}')
+        mapping = mmap.mmap(f.fileno(), length, access=mmap.ACCESS_READ, offset=offset)
+        try:
+            yield PartReader(memoryview(mapping), callback)
+        finally:
+            try:
+                mapping.close()
+            except BufferError:
+                pass  # HTTP层仍持有切片时，由垃圾回收释放映射
+    
+    @staticmethod
+    def _read_into(f, view: memoryview, offset: int):
+        """从文件指定偏移读满view（多线程共用文件对象，不移动文件指针）"""
+        filled = 0
+        if hasattr(os, 'preadv'):
+            while filled < len(view):
+                n = os.preadv(f.fileno(), [view[filled:]], offset + filled)
+                if n == 0:
+                    raise IOError(f'上传过程中文件被修改: {f.name}')
+                filled += n
+            return
+        
+        # Windows没有preadv，每个分片使用独立的文件句柄
+        with open(f.name, 'rb') as part_file:
+            part_file.seek(offset)
+            while filled < len(view):
+                n = part_file.readinto(view[filled:])
+                if not n:
+                    raise IOError(f'上传过程中文件被修改: {f.name}')
+                filled += n
+    
+    def _put_object(self, bucket: str, key: str, body: PartReader, extra_args: dict) -> str:
+        """单次PUT上传"""
+        response = self.client.put_object(Bucket=bucket, Key=key, Body=body, **extra_args)
+        return response.get('ETag', '')
+    
+    def _upload_multipart(self, bucket: str, key: str, f, filesize: int, part_size: int,
+                          callback: Optional[ProgressCallback],
+                          cipher: Optional[ObjectCipher], extra_args: dict) -> str:
+        """并发分片上传"""
+        part_count = -(-filesize // part_size)
+        
+        upload_id = self.client.create_multipart_upload(
+            Bucket=bucket, Key=key, **extra_args
+        )['UploadId']
+        
+        def upload_part(part_number: int) -> dict:
+            start = (part_number - 1) * part_size
+            length = min(part_size, filesize - start)
+            with self._open_part(f, filesize, start, length, callback,
+                                 cipher, part_number - 1) as body:
+                response = self.client.upload_part(
+                    Bucket=bucket,
+                    Key=key,
+                    UploadId=upload_id,
+                    PartNumber=part_number,
+                    Body=body
+                )
+            return {'PartNumber': part_number, 'ETag': response['ETag']}
+        
+        try:
+            with ThreadPoolExecutor(max_workers=self.transfer_config.max_concurrency) as pool:
+                parts = list(pool.map(upload_part, range(1, part_count + 1)))
+            response = self.client.complete_multipart_upload(
+                Bucket=bucket,
+                Key=key,
+                UploadId=upload_id,
+                MultipartUpload={'Parts': parts}
+            )
+            return response.get('ETag', '')
+        except Exception:
+            self.client.abort_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id)
+            raise
+    
+    def upload_stream(self, stream, bucket: str, key: str,
+                      make_public: bool = False,
+                      progress_callback: Optional[Callable] = None,
+                      extra_args: Optional[dict] = None,
+                      content_type: Optional[str] = None) -> str:
+        """
+        上传长度未知的流（不可seek的文件对象、管道、bytes迭代器）
         
-        # 创建进度回调
-        callback = None
-        if progress_callback:
-            filesize = os.path.getsize(local_path)
-            callback = ProgressCallback(local_path, filesize, progress_callback)
+        数据按分片读入缓冲池，缓冲池满时暂停读取；分片大小随分片数增长翻倍，
+        因此无需预知总长度。流不足一个分片时使用单次PUT。
         
-        # 执行上传
-        self.client.upload_file(
-            Filename=local_path,
+        Args:
+            stream: 可读对象（readinto/read）或产生bytes的迭代器
+            bucket: 存储桶名称
+            key: 对象键
+            make_public: 是否设置为公开可读
+            progress_callback: 进度回调函数（总大小为已读取的字节数）
+            extra_args: 额外的上传参数（如Metadata）
+            content_type: Content-Type（默认按对象键推断，无法推断时识别流的开头字节）
+            
+        Returns:
+            对象的ETag
+        """
+        if self.encryption:
+            raise ValueError('流式上传暂不支持客户端加密')
+        
+        extra_args = dict(extra_args or {})
+        if make_public:
+            extra_args.setdefault('ACL', 'public-read')
+        content_type = content_type or extra_args.get('ContentType') or self.content_types.lookup(key)
+        if content_type:
+            extra_args['ContentType'] = content_type
+        
+        fill = _stream_filler(stream)
+        concurrency = self.transfer_config.max_concurrency
+        chunk_size = self.transfer_config.multipart_chunksize
+        pool = self.buffer_pool or BufferPool(
+            max(self.STREAM_BUFFER_SIZE, (concurrency + 1) * chunk_size)
+        )
+        callback = ProgressCallback(key, 0, progress_callback) if progress_callback else None
+        
+        buffer = pool.acquire(chunk_size)
+        single = True
+        try:
+            view = memoryview(buffer)[:chunk_size]
+            filled = fill(view)
+            if callback:
+                callback.filesize = filled
+            if not content_type and self.content_types.sniffing:
+                self._sniff_content_type(view[:min(filled, ContentTypeResolver.SNIFF_SIZE)], extra_args)
+            if filled < chunk_size:
+                return self._put_object(bucket, key, PartReader(view[:filled], callback), extra_args)
+            single = False
+        finally:
+            if single:
+                pool.release(buffer)
+        
+        # 流至少有一个完整分片，改用分片上传
+        try:
+            upload_id = self.client.create_multipart_upload(
+                Bucket=bucket, Key=key, **extra_args
+            )['UploadId']
+        except BaseException:
+            pool.release(buffer)
+            raise
+        
+        failed = threading.Event()
+        
+        def upload_part(part_number: int, part_buffer: bytearray, part: memoryview) -> dict:
+            try:
+                if failed.is_set():
+                    raise RuntimeError('分片上传已中止')
+                response = self.client.upload_part(
+                    Bucket=bucket,
+                    Key=key,
+                    UploadId=upload_id,
+                    PartNumber=part_number,
+                    Body=PartReader(part, callback)
+                )
+                return {'PartNumber': part_number, 'ETag': response['ETag']}
+            except BaseException:
+                failed.set()
+                raise
+            finally:
+                pool.release(part_buffer)
+        
+        executor = ThreadPoolExecutor(max_workers=concurrency)
+        futures = []
+        try:
+            part_number = 1
+            while True:
+                futures.append(executor.submit(upload_part, part_number, buffer, view[:filled]))
+                buffer = None
+                if filled < len(view) or failed.is_set():
+                    break
+                
+                part_number += 1
+                if part_number > self.MAX_PARTS:
+                    raise ValueError(f'流超过 {self.MAX_PARTS} 个分片的上限')
+                part_size = self._stream_part_size(part_number, chunk_size, pool.capacity)
+                buffer = pool.acquire(part_size)  # 池满时在此等待已提交的分片完成
+                view = memoryview(buffer)[:part_size]
+                filled = fill(view)
+                if callback:
+                    callback.filesize += filled
+                if filled == 0:
+                    pool.release(buffer)
+                    buffer = None
+                    break
+            
+            parts = [future.result() for future in futures]
+            response = self.client.complete_multipart_upload(
+                Bucket=bucket,
+                Key=key,
+                UploadId=upload_id,
+                MultipartUpload={'Parts': parts}
+            )
+            return response.get('ETag', '')
+        except BaseException:
+            if buffer is not None:
+                pool.release(buffer)
+            # 已提交的分片见到失败标志后直接退出并归还缓冲区
+            failed.set()
+            executor.shutdown(wait=True)
+            self.client.abort_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id)
+            raise
+        finally:
+            executor.shutdown(wait=True)
+    
+    def _stream_part_size(self, part_number: int, chunk_size: int, limit: int) -> int:
+        """流式上传第part_number个分片的大小（不超过缓冲池容量）"""
+        size = chunk_size << ((part_number - 1) // self.STREAM_PARTS_PER_STEP)
+        return min(size, self.MAX_PART_SIZE, limit)
+    
+    def iter_objects(self, bucket: str, prefix: str = '') -> Iterator[dict]:
+        """
+        分页遍历存储桶中的对象（按键名字典序）
+        
+        Args:
+            bucket: 存储桶名称
+            prefix: 键前缀过滤
+            
+        Yields:
+            ListObjectsV2返回的对象字典（Key, Size, ETag, LastModified）
+        """
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+            for obj in page.get('Contents', []):
+                yield obj
+    
+    def delete_object(self, bucket: str, key: str) -> None:
+        """删除单个对象"""
+        self.client.delete_object(Bucket=bucket, Key=key)
+    
+    def delete_objects(self, bucket: str, keys: Iterable[str]) -> list[dict]:
+        """
+        批量删除对象（每次请求最多1000个键）
+        
+        Args:
+            bucket: 存储桶名称
+            keys: 要删除的对象键
+            
+        Returns:
+            删除失败的条目列表（Key, Code, Message）
+        """
+        errors = []
+        batch = []
+        for key in keys:
+            batch.append({'Key': key})
+            if len(batch) >= self.DELETE_BATCH_SIZE:
+                errors.extend(self._delete_batch(bucket, batch))
+                batch = []
+        if batch:
+            errors.extend(self._delete_batch(bucket, batch))
+        return errors
+    
+    def _delete_batch(self, bucket: str, batch: list) -> list[dict]:
+        """执行一次DeleteObjects请求"""
+        response = self.client.delete_objects(
             Bucket=bucket,
-            Key=key,
-            ExtraArgs=extra_args,
-            Config=self.transfer_config,
-            Callback=callback
+            Delete={'Objects': batch, 'Quiet': True}
         )
+        return response.get('Errors', [])
+    
+    def copy_object(self, src_bucket: str, src_key: str, dst_bucket: str, dst_key: str,
+                    size: Optional[int] = None, make_public: bool = False) -> None:
+        """
+        服务端复制对象（数据不经过本地）
+        
+        小对象使用CopyObject；大对象使用并发UploadPartCopy，
+        并保留源对象的Content-Type和元数据。
+        
+        Args:
+            src_bucket: 源存储桶
+            src_key: 源对象键
+            dst_bucket: 目标存储桶
+            dst_key: 目标对象键
+            size: 源对象大小（未知时通过HEAD获取）
+            make_public: 是否设置为公开可读
+        """
+        source = {'Bucket': src_bucket, 'Key': src_key}
+        extra_args = {'ACL': 'public-read'} if make_public else {}
+        
+        head = None
+        if size is None:
+            head = self.head_object(src_bucket, src_key)
+            size = head['ContentLength']
+        
+        if size <= self.COPY_PART_SIZE:
+            self.client.copy_object(
+                CopySource=source,
+                Bucket=dst_bucket,
+                Key=dst_key,
+                **extra_args
+            )
+            return
+        
+        if head is None:
+            head = self.head_object(src_bucket, src_key)
+        for name in ('ContentType', 'ContentEncoding', 'CacheControl',
+                     'ContentDisposition', 'Metadata'):
+            if head.get(name):
+                extra_args[name] = head[name]
+        
+        upload_id = self.client.create_multipart_upload(
+            Bucket=dst_bucket, Key=dst_key, **extra_args
+        )['UploadId']
+        
+        # 超过 10000×256MB（约2.5TB）的对象按分片数上限增大分片
+        part_size = max(self.COPY_PART_SIZE, -(-size // self.MAX_PARTS))
+        
+        def copy_part(part_number: int) -> dict:
+            start = (part_number - 1) * part_size
+            end = min(start + part_size, size) - 1
+            response = self.client.upload_part_copy(
+                Bucket=dst_bucket,
+                Key=dst_key,
+                UploadId=upload_id,
+                PartNumber=part_number,
+                CopySource=source,
+                CopySourceRange=f'bytes={start}-{end}'
+            )
+            return {'PartNumber': part_number, 'ETag': response['CopyPartResult']['ETag']}
+        
+        part_count = -(-size // part_size)
+        try:
+            with ThreadPoolExecutor(max_workers=self.transfer_config.max_concurrency) as pool:
+                parts = list(pool.map(copy_part, range(1, part_count + 1)))
+            self.client.complete_multipart_upload(
+                Bucket=dst_bucket,
+                Key=dst_key,
+                UploadId=upload_id,
+                MultipartUpload={'Parts': parts}
+            )
+        except Exception:
+            self.client.abort_multipart_upload(Bucket=dst_bucket, Key=dst_key, UploadId=upload_id)
+            raise
+    
+    def head_object(self, bucket: str, key: str, part_number: Optional[int] = None) -> dict:
+        """
+        获取对象元数据
+        
+        Args:
+            part_number: 指定时返回该分片的大小（用于校验分片上传的ETag）
+        """
+        params = {'Bucket': bucket, 'Key': key}
+        if part_number:
+            params['PartNumber'] = part_number
+        return self.client.head_object(**params)
+    
+    def get_object_range(self, bucket: str, key: str, start: int, end: int,
+                         if_match: Optional[str] = None):
+        """
+        分段读取对象
+        
+        Args:
+            start: 起始字节（含）
+            end: 结束字节（含）
+            if_match: ETag条件，防止下载过程中对象被替换
+            
+        Returns:
+            响应体流（StreamingBody）
+        """
+        params = {'Bucket': bucket, 'Key': key, 'Range': f'bytes={start}-{end}'}
+        if if_match:
+            params['IfMatch'] = if_match
+        return self.client.get_object(**params)['Body']
+    
+    def probe(self) -> list[str]:
+        """
+        一次ListBuckets请求同时验证连接并获取存储桶列表
+        
+        Returns:
+            存储桶名称列表
+            
+        Raises:
+            连接或认证失败时抛出botocore异常
+        """
+        response = self.client.list_buckets()
+        return [b['Name'] for b in response.get('Buckets', [])]
+    
+    def head_bucket(self, bucket: str) -> dict:
+        """
+        HEAD存储桶（验证访问权限，同时建立连接）
+        
+        Returns:
+            响应头（含 x-amz-bucket-region）
+        """
+        response = self.client.head_bucket(Bucket=bucket)
+        return response['ResponseMetadata'].get('HTTPHeaders', {})
     
     def list_buckets(self) -> list[str]:
         """获取所有存储桶列表"""
@@ -158,4 +1009,38 @@ class URLGenerator:
             endpoint = endpoint_url.rstrip('/')
             return f"{endpoint}/{bucket}/{key}"
         
-        return None
\ No newline at end of file
+        return None
+    
+    @staticmethod
+    def generate_variant_urls(base_url: str, endpoint_url: str, bucket: str,
+                              keys: Dict[str, str]) -> Dict[str, Optional[str]]:
+        """
+        生成各衍生版本的公开访问URL
+        
+        Args:
+            keys: {版本名称: 对象键}
+            
+        Returns:
+            {版本名称: URL}
+        """
+        return {
+            name: URLGenerator.generate_url(base_url, endpoint_url, bucket, key)
+            for name, key in keys.items()
+        }
+    
+    @staticmethod
+    def generate_presigned_urls(presigner, bucket: str,
+                                keys: Dict[str, str]) -> Dict[str, Optional[str]]:
+        """
+        生成预签名下载URL（私有存储桶，一次批量签名）
+        
+        Args:
+            presigner: core.presign.Presigner
+            keys: {名称: 对象键}
+            
+        Returns:
+            {名称: URL}
+        """
+        names = list(keys)
+        urls = presigner.presign_many(bucket, [keys[name] for name in names])
+        return dict(zip(names, urls))
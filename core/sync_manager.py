@@ -0,0 +1,335 @@
+"""
+同步管理器
+比对本地目录与存储桶前缀，只上传有变化的文件
+
+比对采用"边规划边执行"的流水线：本地目录按S3键名顺序惰性遍历，
+远程列举本身即按键名有序，两者做归并比对，产生的动作立即交给
+UploadManager执行，无需等待完整差异计算完成。
+"""
+
+import hashlib
+import os
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from core.s3_client import S3ClientWrapper
+from core.encryption import EnvelopeEncryption
+from core.upload_manager import UploadManager, UploadTask
+from core.download_manager import DownloadTask
+from core.tracing import get_tracer
+
+
+class SyncAction:
+    """同步动作"""
+
+    UPLOAD = 'upload'
+    DELETE = 'delete'
+    DOWNLOAD = 'download'
+    SKIP = 'skip'
+
+    def __init__(self, action: str, key: str, local_path: Optional[str] = None,
+                 size: int = 0, reason: str = '', checksum: Optional[str] = None):
+        self.action = action
+        self.key = key
+        self.local_path = local_path
+        self.size = size
+        self.reason = reason
+        self.checksum = checksum
+
+    def __str__(self):
+        return f'{self.action:<8} {self.key} ({self.reason})'
+
+
+class SyncManager:
+    """本地目录 ↔ 存储桶前缀 同步"""
+
+    # 比较模式
+    COMPARE_SIZE = 'size'
+    COMPARE_MTIME = 'mtime'
+    COMPARE_CHECKSUM = 'checksum'
+
+    # 本地修改时间与远程时间比较的容差（秒）
+    MTIME_TOLERANCE = 2.0
+
+    def __init__(self, upload_manager: UploadManager, s3_config: dict, local_dir: str,
+                 compare: str = COMPARE_MTIME, remote_only: Optional[str] = None,
+                 use_index: bool = False):
+        """
+        Args:
+            upload_manager: 执行上传的管理器
+            s3_config: S3配置字典
+            local_dir: 本地目录
+            compare: 比较模式（size / mtime / checksum）
+            remote_only: 仅远程存在的对象的处理方式（None / 'delete' / 'download'）
+            use_index: 使用本地对象索引代替远程列举
+        """
+        if not os.path.isdir(local_dir):
+            raise ValueError(f'本地目录不存在: {local_dir}')
+        if remote_only not in (None, SyncAction.DELETE, SyncAction.DOWNLOAD):
+            raise ValueError(f'不支持的远程处理方式: {remote_only}')
+
+        self.upload_manager = upload_manager
+        self.s3_config = s3_config
+        self.local_dir = os.path.abspath(local_dir)
+        self.compare = compare
+        self.remote_only = remote_only
+        self.use_index = use_index
+
+        self.bucket = s3_config['bucket']
+        # 启用压缩或加密时对象大小与本地不同，比对前从对象元数据读取原文件的大小和MD5
+        self.transformed = bool(s3_config.get('compression') or s3_config.get('encryption_key'))
+        prefix = s3_config.get('prefix', '').strip('/')
+        self.prefix = f'{prefix}/' if prefix else ''
+
+        # 动作回调（删除等非传输动作完成时触发）
+        self.on_action: Optional[Callable] = None
+
+        self._client: Optional[S3ClientWrapper] = None
+
+    @property
+    def client(self) -> S3ClientWrapper:
+        """规划和删除使用的客户端（延迟创建）"""
+        if self._client is None:
+            self._client = S3ClientWrapper(
+                endpoint_url=self.s3_config['endpoint'],
+                access_key=self.s3_config.get('access_key'),
+                secret_key=self.s3_config.get('secret_key')
+            )
+        return self._client
+
+    # ==================== 规划 ====================
+
+    def plan(self) -> Iterator[SyncAction]:
+        """
+        流式生成同步动作（按键名顺序）
+
+        Yields:
+            SyncAction，包括跳过的文件
+        """
+        local_iter = self._iter_local()
+        remote_iter = self._iter_remote()
+        local = next(local_iter, None)
+        remote = next(remote_iter, None)
+
+        while local is not None or remote is not None:
+            local_key = local[0].encode('utf-8') if local else None
+            remote_key = remote['Key'].encode('utf-8') if remote else None
+
+            if remote is None or (local is not None and local_key < remote_key):
+                key, path, stat = local
+                yield SyncAction(SyncAction.UPLOAD, key, path, stat.st_size, '新文件')
+                local = next(local_iter, None)
+            elif local is None or remote_key < local_key:
+                yield self._plan_remote_only(remote)
+                remote = next(remote_iter, None)
+            else:
+                yield self._plan_both(local, remote)
+                local = next(local_iter, None)
+                remote = next(remote_iter, None)
+
+    def dry_run(self) -> List[str]:
+        """
+        预演同步，不执行任何传输
+
+        Returns:
+            需要执行的动作描述列表
+        """
+        return [str(a) for a in self.plan() if a.action != SyncAction.SKIP]
+
+    def _iter_local(self) -> Iterator[Tuple[str, str, os.stat_result]]:
+        """
+        按S3键名顺序惰性遍历本地目录
+
+        同一目录内按 "名称 + '/'（目录）" 的UTF-8字节序排序，
+        递归展开后即与ListObjectsV2的顺序一致。
+        """
+        def walk(dir_path: str, key_prefix: str):
+            try:
+                entries = list(os.scandir(dir_path))
+            except OSError:
+                return
+
+            items = []
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        items.append(((entry.name + '/').encode('utf-8'), entry, True))
+                    elif entry.is_file():
+                        items.append((entry.name.encode('utf-8'), entry, False))
+                except OSError:
+                    continue
+            items.sort(key=lambda item: item[0])
+
+            for _, entry, is_dir in items:
+                key = key_prefix + entry.name
+                if is_dir:
+                    yield from walk(entry.path, key + '/')
+                else:
+                    yield key, entry.path, entry.stat()
+
+        yield from walk(self.local_dir, self.prefix)
+
+    def _iter_remote(self) -> Iterator[dict]:
+        """遍历远程对象（来自索引或实时列举）"""
+        index = self.upload_manager.object_index
+        if self.use_index and index is not None:
+            for record in index.iter_prefix(self.bucket, self.prefix):
+                yield {
+                    'Key': record['key'],
+                    'Size': record['size'],
+                    'ETag': record['etag'],
+                    'LastModified': record['last_modified'],
+                    'Checksum': record['checksum'],
+                    'OriginalSize': record['original_size']
+                }
+            return
+
+        for obj in self.client.iter_objects(self.bucket, self.prefix):
+            if obj['Key'].endswith('/'):
+                continue  # 目录占位对象
+            if index is not None:
+                record = index.get(self.bucket, obj['Key'])
+                if record and record['checksum']:
+                    obj = dict(obj, Checksum=record['checksum'])
+                if record and record['original_size'] is not None and record['etag'] == obj.get('ETag'):
+                    obj = dict(obj, OriginalSize=record['original_size'])
+            yield obj
+
+    def _plan_remote_only(self, remote: dict) -> SyncAction:
+        """处理仅远程存在的对象"""
+        key = remote['Key']
+        size = remote.get('Size', 0)
+        if self.remote_only == SyncAction.DELETE:
+            return SyncAction(SyncAction.DELETE, key, size=size, reason='本地已删除')
+        if self.remote_only == SyncAction.DOWNLOAD:
+            return SyncAction(SyncAction.DOWNLOAD, key, self._local_path_for(key), size, '仅远程存在')
+        return SyncAction(SyncAction.SKIP, key, size=size, reason='仅远程存在')
+
+    def _plan_both(self, local: tuple, remote: dict) -> SyncAction:
+        """比对两端都存在的文件"""
+        key, path, stat = local
+        if (self.transformed and remote.get('OriginalSize') is None
+                and stat.st_size != remote.get('Size')):
+            remote = self._original_info(remote)
+        remote_size = remote.get('OriginalSize')
+        if remote_size is None:
+            remote_size = remote.get('Size')
+        if stat.st_size != remote_size:
+            return SyncAction(SyncAction.UPLOAD, key, path, stat.st_size, '大小不同')
+
+        if self.compare == self.COMPARE_CHECKSUM:
+            remote_md5 = self._remote_md5(remote)
+            if remote_md5 is not None:
+                local_md5 = self._file_md5(path)
+                if local_md5 != remote_md5:
+                    return SyncAction(SyncAction.UPLOAD, key, path, stat.st_size,
+                                      '校验和不同', checksum=local_md5)
+                return SyncAction(SyncAction.SKIP, key, path, stat.st_size, '校验和一致')
+
+        if self.compare in (self.COMPARE_MTIME, self.COMPARE_CHECKSUM):
+            remote_mtime = remote.get('LastModified')
+            if hasattr(remote_mtime, 'timestamp'):
+                remote_mtime = remote_mtime.timestamp()
+            if remote_mtime is not None and stat.st_mtime > remote_mtime + self.MTIME_TOLERANCE:
+                return SyncAction(SyncAction.UPLOAD, key, path, stat.st_size, '本地较新')
+
+        return SyncAction(SyncAction.SKIP, key, path, stat.st_size, '未变化')
+
+    def _original_info(self, remote: dict) -> dict:
+        """
+        压缩或加密上传的对象：HEAD读取元数据中记录的原文件大小和MD5
+
+        Returns:
+            补充了 OriginalSize / Checksum 的远程对象信息；未压缩也未加密的对象原样返回
+        """
+        try:
+            head = self.client.head_object(self.bucket, remote['Key'])
+        except Exception:
+            return remote
+        metadata = head.get('Metadata', {})
+        if not (head.get('ContentEncoding') or EnvelopeEncryption.is_encrypted(metadata)):
+            return remote
+        size = metadata.get(UploadManager.META_ORIGINAL_SIZE)
+        # 没有记录原文件大小的旧对象视为大小未知（-1，必然重新上传）
+        return dict(remote, OriginalSize=int(size) if size else -1,
+                    Checksum=metadata.get(UploadManager.META_MD5) or remote.get('Checksum'))
+
+    @staticmethod
+    def _remote_md5(remote: dict) -> Optional[str]:
+        """
+        获取远程对象的MD5
+
+        单次PUT上传的ETag即为MD5；分片上传的ETag带 "-N" 后缀，
+        此时使用索引中记录的本地校验和。压缩或加密的对象ETag对应的不是原文件，只使用记录的校验和。
+        """
+        etag = (remote.get('ETag') or '').strip('"')
+        if etag and '-' not in etag and remote.get('OriginalSize') is None:
+            return etag
+        return remote.get('Checksum')
+
+    @staticmethod
+    def _file_md5(path: str) -> str:
+        """计算文件MD5"""
+        md5 = hashlib.md5()
+        with get_tracer().span('hash', 'upload', {'file': os.path.basename(path)}):
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    md5.update(chunk)
+        return md5.hexdigest()
+
+    def _local_path_for(self, key: str) -> str:
+        """对象键对应的本地路径"""
+        relative = key[len(self.prefix):]
+        return os.path.join(self.local_dir, *relative.split('/'))
+
+    # ==================== 执行 ====================
+
+    def iter_upload_tasks(self) -> Iterator[UploadTask]:
+        """
+        执行规划，把上传/下载动作转换为传输任务，删除动作攒批执行
+
+        作为UploadManager的流式任务来源使用，第一个任务产生后即可开始传输。
+        """
+        pending_deletes = []
+        for action in self.plan():
+            if action.action == SyncAction.UPLOAD:
+                checksum = action.checksum
+                if checksum is None and self.compare == self.COMPARE_CHECKSUM:
+                    checksum = self._file_md5(action.local_path)
+                metadata = {'md5': checksum} if checksum else None
+                yield UploadTask(action.local_path, key=action.key,
+                                 metadata=metadata, checksum=checksum)
+            elif action.action == SyncAction.DELETE:
+                pending_deletes.append(action)
+                if len(pending_deletes) >= S3ClientWrapper.DELETE_BATCH_SIZE:
+                    self._delete_batch(pending_deletes)
+                    pending_deletes = []
+            elif action.action == SyncAction.DOWNLOAD:
+                yield DownloadTask(action.key, action.local_path, action.size)
+
+        if pending_deletes:
+            self._delete_batch(pending_deletes)
+
+    def run(self, max_threads: int = 3):
+        """开始同步（异步执行，完成时触发UploadManager的on_all_complete）"""
+        self.upload_manager.start_upload(
+            self.s3_config,
+            max_threads,
+            task_source=self.iter_upload_tasks()
+        )
+
+    def _delete_batch(self, actions: List[SyncAction]):
+        """批量删除远程对象（一次DeleteObjects请求）并触发回调"""
+        keys = [a.key for a in actions]
+        try:
+            errors = {e.get('Key'): e.get('Message', e.get('Code', ''))
+                      for e in self.client.delete_objects(self.bucket, keys)}
+        except Exception as e:
+            errors = {key: str(e) for key in keys}
+
+        index = self.upload_manager.object_index
+        if index is not None:
+            index.remove(self.bucket, [k for k in keys if k not in errors])
+
+        if self.on_action:
+            for action in actions:
+                self.on_action(action, errors.get(action.key))
@@ -0,0 +1,292 @@
+"""
+性能追踪
+可选的埋点层：任务阶段耗时、botocore请求时序和采样分析，
+输出Chrome Trace JSON（可用 chrome://tracing 或 https://ui.perfetto.dev 离线打开）
+
+默认关闭，关闭时每个埋点只有一次属性判断的开销。
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+
+class _NullSpan:
+    """追踪关闭时使用的空上下文"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Tracer:
+    """事件记录器（Chrome Trace Event格式）"""
+
+    def __init__(self):
+        self.enabled = False
+        self.events = []
+        self._pid = os.getpid()
+        self._origin = time.perf_counter()
+        self._local = threading.local()
+        self._named_threads = set()
+        self._lock = threading.Lock()
+        self.profiler: Optional['SamplingProfiler'] = None
+
+    # ==================== 开关 ====================
+
+    def start(self, sample_interval: Optional[float] = None):
+        """
+        开始记录
+
+        Args:
+            sample_interval: 采样间隔（秒），指定时同时启动采样分析器
+        """
+        self.events = []
+        self._named_threads.clear()
+        self._origin = time.perf_counter()
+        self.enabled = True
+        if sample_interval:
+            self.profiler = SamplingProfiler(self, sample_interval)
+            self.profiler.start()
+
+    def stop(self):
+        """停止记录"""
+        self.enabled = False
+        if self.profiler:
+            self.profiler.stop()
+
+    def save(self, path: str):
+        """写出Chrome Trace JSON"""
+        data = {'traceEvents': list(self.events), 'displayTimeUnit': 'ms'}
+        if self.profiler:
+            data['stackFrames'] = self.profiler.stack_frames
+            data['samples'] = self.profiler.samples
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+
+    # ==================== 记录 ====================
+
+    def now_us(self) -> float:
+        """相对追踪起点的微秒数"""
+        return (time.perf_counter() - self._origin) * 1e6
+
+    def _tid(self) -> int:
+        tid = threading.get_ident()
+        if tid not in self._named_threads:
+            with self._lock:
+                if tid not in self._named_threads:
+                    self._named_threads.add(tid)
+                    self.events.append({
+                        'ph': 'M', 'name': 'thread_name', 'pid': self._pid, 'tid': tid,
+                        'args': {'name': threading.current_thread().name}
+                    })
+        return tid
+
+    def complete(self, name: str, cat: str, start_us: float, args: Optional[dict] = None):
+        """记录一个已结束的区间事件"""
+        event = {
+            'ph': 'X', 'name': name, 'cat': cat, 'pid': self._pid, 'tid': self._tid(),
+            'ts': start_us, 'dur': self.now_us() - start_us
+        }
+        if args:
+            event['args'] = args
+        self.events.append(event)
+
+    def instant(self, name: str, cat: str = 'mark', args: Optional[dict] = None):
+        """记录一个瞬时事件"""
+        if not self.enabled:
+            return
+        event = {'ph': 'i', 's': 't', 'name': name, 'cat': cat, 'pid': self._pid,
+                 'tid': self._tid(), 'ts': self.now_us()}
+        if args:
+            event['args'] = args
+        self.events.append(event)
+
+    def span(self, name: str, cat: str = 'task', args: Optional[dict] = None):
+        """
+        区间埋点
+
+        Usage:
+            with tracer.span('hash', 'upload', {'file': name}):
+                ...
+        """
+        if not self.enabled:
+            return _NULL_SPAN
+        return self._span(name, cat, args)
+
+    @contextmanager
+    def _span(self, name: str, cat: str, args: Optional[dict]):
+        start = self.now_us()
+        try:
+            yield
+        finally:
+            self.complete(name, cat, start, args)
+
+    # ==================== botocore ====================
+
+    def attach_botocore(self, client):
+        """
+        注册botocore事件钩子，记录每个请求的阶段耗时
+
+        - api:   before-call → after-call（整个操作，含重试）
+        - sign:  request-created → before-send（签名）
+        - connect: 新建连接（含TLS握手），复用连接时不出现
+        - http:  before-send → needs-retry（发送请求体、等待响应首字节）
+        """
+        _instrument_connections(self)
+        events = client.meta.events
+        # 多个工作线程共用同一客户端时只注册一次
+        events.register('before-call.s3', self._on_before_call,
+                        unique_id='s3uploader-trace-call')
+        events.register('after-call.s3', self._on_after_call,
+                        unique_id='s3uploader-trace-after-call')
+        events.register_first('request-created.s3', self._on_request_created,
+                              unique_id='s3uploader-trace-request-created')
+        events.register('before-send.s3', self._on_before_send,
+                        unique_id='s3uploader-trace-before-send')
+        events.register('needs-retry.s3', self._on_needs_retry,
+                        unique_id='s3uploader-trace-needs-retry')
+
+    def _marks(self) -> dict:
+        marks = getattr(self._local, 'marks', None)
+        if marks is None:
+            marks = self._local.marks = {}
+        return marks
+
+    def _on_before_call(self, model=None, **kwargs):
+        if self.enabled:
+            self._marks()['call'] = (self.now_us(), model.name if model else '')
+
+    def _on_after_call(self, http_response=None, **kwargs):
+        mark = self._marks().pop('call', None)
+        if self.enabled and mark:
+            args = {'status': getattr(http_response, 'status_code', None)}
+            self.complete(mark[1], 'api', mark[0], args)
+
+    def _on_request_created(self, operation_name=None, **kwargs):
+        if self.enabled:
+            self._marks()['sign'] = (self.now_us(), operation_name or '')
+
+    def _on_before_send(self, request=None, **kwargs):
+        if not self.enabled:
+            return None
+        marks = self._marks()
+        mark = marks.pop('sign', None)
+        if mark:
+            self.complete('sign', 'sign', mark[0], {'op': mark[1]})
+        marks['http'] = (self.now_us(), mark[1] if mark else '')
+        return None  # 返回值非None会被botocore当作响应
+
+    def _on_needs_retry(self, attempts=None, caught_exception=None, **kwargs):
+        mark = self._marks().pop('http', None)
+        if self.enabled and mark:
+            args = {'op': mark[1], 'attempt': attempts}
+            if caught_exception is not None:
+                args['error'] = str(caught_exception)
+            self.complete('http', 'http', mark[0], args)
+        return None
+
+
+class SamplingProfiler:
+    """
+    采样分析器
+
+    后台线程定期抓取所有线程的调用栈，写入Chrome Trace的samples/stackFrames，
+    在时间线上与埋点区间对照，可以看出时间花在磁盘、签名、SSL还是界面回调上。
+    """
+
+    def __init__(self, tracer: Tracer, interval: float = 0.005):
+        self.tracer = tracer
+        self.interval = interval
+        self.stack_frames = {}
+        self.samples = []
+        self._frame_ids = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True, name='SamplingProfiler')
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=1)
+
+    def _frame_id(self, key: tuple, parent: Optional[str]) -> str:
+        frame_id = self._frame_ids.get((key, parent))
+        if frame_id is None:
+            frame_id = str(len(self._frame_ids) + 1)
+            self._frame_ids[(key, parent)] = frame_id
+            frame = {'name': f'{key[0]} ({os.path.basename(key[1])}:{key[2]})', 'category': 'py'}
+            if parent:
+                frame['parent'] = parent
+            self.stack_frames[frame_id] = frame
+        return frame_id
+
+    def _run(self):
+        own = threading.get_ident()
+        pid = os.getpid()
+        while not self._stop.wait(self.interval):
+            ts = self.tracer.now_us()
+            for tid, frame in sys._current_frames().items():
+                if tid == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append((code.co_name, code.co_filename, frame.f_lineno))
+                    frame = frame.f_back
+                parent = None
+                for key in reversed(stack):
+                    parent = self._frame_id(key, parent)
+                if parent:
+                    self.samples.append({'cpu': 0, 'tid': tid, 'pid': pid, 'ts': ts,
+                                         'sf': parent, 'weight': 1, 'name': 'sample'})
+
+
+_connections_instrumented = False
+
+
+def _instrument_connections(tracer: Tracer):
+    """包装urllib3的建连方法以记录connect阶段（只包装一次，关闭追踪时直接透传）"""
+    global _connections_instrumented
+    if _connections_instrumented:
+        return
+    try:
+        from urllib3.connection import HTTPConnection, HTTPSConnection
+    except ImportError:
+        return
+
+    def wrap(original):
+        def connect(conn):
+            if not tracer.enabled:
+                return original(conn)
+            with tracer.span('connect', 'connect', {'host': conn.host}):
+                return original(conn)
+        return connect
+
+    # HTTPS连接重写了connect（含TLS握手），两个类分别包装
+    for cls in (HTTPConnection, HTTPSConnection):
+        if 'connect' in cls.__dict__:
+            cls.connect = wrap(cls.__dict__['connect'])
+    _connections_instrumented = True
+
+
+# 全局追踪器（默认关闭）
+_tracer = Tracer()
+
+
+def get_tracer() -> Tracer:
+    """获取全局追踪器"""
+    return _tracer
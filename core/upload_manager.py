@@ -3,45 +3,178 @@
 处理多线程上传任务的调度和管理
 """
 
+import hashlib
 import os
 import threading
 import queue
 import time
 from pathlib import Path
-from typing import Callable, List, Optional
+from typing import Callable, Iterable, List, Optional
 
-from core.s3_client import S3ClientWrapper, URLGenerator
+from core.s3_client import S3ClientWrapper, URLGenerator, ContentTypeResolver
+from core.buffer_pool import BufferPool
+from core.compression import CompressionStage
+from core.encryption import EnvelopeEncryption
+from core.image_derivatives import ImageDerivativeStage
+from core.upload_rules import UploadRules
+from core.object_index import ObjectIndex
+from core.download_manager import DownloadTask, RangedDownloader
+from core.tracing import get_tracer
+from core.batch_links import BatchLinks
+from core.presign import Presigner
+from core.process_uploader import ProcessUploadBackend
+from core.file_scanner import FileScanner
+from core.client_pool import ClientPool
+from core.events import EventBus, TaskProgress, TaskCompleted, TaskFailed, AllCompleted, ScanProgress
 
 
 class UploadTask:
     """上传任务"""
     
-    def __init__(self, file_path: str):
+    def __init__(self, file_path: str, key: Optional[str] = None,
+                 metadata: Optional[dict] = None, checksum: Optional[str] = None,
+                 filesize: Optional[int] = None):
+        """
+        Args:
+            file_path: 本地文件路径
+            key: 指定对象键（默认使用 前缀/文件名）
+            metadata: 附加的对象元数据
+            checksum: 本地计算的校验和（写入索引）
+            filesize: 已知的文件大小（指定时不再stat）
+        """
         self.file_path = file_path
         self.filename = os.path.basename(file_path)
-        self.filesize = os.path.getsize(file_path)
-        self.status = 'pending'  # pending, uploading, completed, failed
+        if filesize is None:
+            with get_tracer().span('stat', 'upload', {'file': self.filename}):
+                filesize = self._stat()
+        self.filesize = filesize
+        self.status = 'pending'  # scanning, pending, uploading, completed, failed
         self.progress = 0.0
         self.error_message = ''
         self.public_url = ''
+        self.etag = ''
+        # 图片衍生版本的公开URL {名称: URL}
+        self.variant_urls = {}
+        self.key = key or ''
+        self.metadata = metadata or {}
+        self.checksum = checksum
+        # 开始/结束时间（time.perf_counter），用于统计单个对象耗时
+        self.started_at = 0.0
+        self.finished_at = 0.0
+    
+    def _stat(self) -> int:
+        """获取上传大小"""
+        return os.path.getsize(self.file_path)
+
+
+class StreamUploadTask(UploadTask):
+    """流式上传任务（数据来自管道、不可seek的文件对象或bytes迭代器，长度未知）"""
+    
+    def __init__(self, stream, name: str, key: Optional[str] = None,
+                 content_type: Optional[str] = None, metadata: Optional[dict] = None):
+        """
+        Args:
+            stream: 可读对象或产生bytes的迭代器
+            name: 对象名（未指定key时使用 前缀/对象名）
+            key: 指定对象键
+            content_type: Content-Type（默认按对象名推断）
+            metadata: 附加的对象元数据
+        """
+        self.stream = stream
+        self.content_type = content_type
+        super().__init__(f'stream:{key or name}', key=key, metadata=metadata)
+        self.filename = name
+    
+    def _stat(self) -> int:
+        # 总长度未知，上传过程中按已读取的字节数更新
+        return 0
+
+
+class DerivativeUploadTask(UploadTask):
+    """图片衍生版本上传任务（文件为衍生阶段生成的临时文件）"""
+    
+    def __init__(self, parent: UploadTask, variant: str, file_path: str, content_type: str,
+                 stage: ImageDerivativeStage):
+        """
+        Args:
+            parent: 原图的上传任务
+            variant: 衍生版本名称
+            file_path: 生成的临时文件
+            content_type: 衍生文件的Content-Type
+            stage: 生成该文件的衍生阶段（推导对象键、上传后删除临时文件）
+        """
+        self.parent = parent
+        self.variant = variant
+        self.content_type = content_type
+        self.stage = stage
+        super().__init__(file_path)
+        stem = os.path.splitext(parent.filename)[0]
+        self.filename = f'{stem}_{variant}{os.path.splitext(file_path)[1]}'
 
 
 class UploadManager:
     """上传任务管理器"""
     
+    # 分片缓冲池默认容量（MB），可通过配置项 buffer_pool_mb 修改
+    DEFAULT_BUFFER_POOL_MB = 64
+    # 对象与本地文件内容不同（压缩、加密）时记录原文件大小和MD5的元数据键，同步据此比对
+    META_ORIGINAL_SIZE = EnvelopeEncryption.META_SIZE
+    META_MD5 = 'md5'
+    # 批次结束时等待任务来源线程退出的最长时间（秒）
+    FEEDER_JOIN_TIMEOUT = 2
+    
     def __init__(self):
         self.tasks: List[UploadTask] = []
+        # 扫描线程、任务来源线程和界面线程都会修改任务列表；其他线程遍历时使用 get_tasks() 的副本
+        self._tasks_lock = threading.RLock()
         self.task_queue = queue.Queue()
         self.stop_flag = threading.Event()
+        # 流式任务来源仍在产生任务时置位，工作线程不会因队列暂空而退出
+        self.feeding = threading.Event()
         self.worker_threads: List[threading.Thread] = []
+        self._feeder: Optional[threading.Thread] = None
         # 记录当前批次的任务（用于统计本次上传的成功/失败数量）
         self.current_batch_tasks: List[UploadTask] = []
+        # 远程对象索引（可选，上传成功后写入）
+        self.object_index: Optional[ObjectIndex] = None
+        # 所有工作线程共用的分片缓冲池（每次开始上传时按配置创建）
+        self.buffer_pool: Optional[BufferPool] = None
+        # 上传前压缩（按配置项 compression 启用）
+        self.compression: Optional[CompressionStage] = None
+        # 客户端加密（按配置项 encryption_key 启用）
+        self.encryption: Optional[EnvelopeEncryption] = None
+        # Content-Type解析（按配置项 content_types 添加覆盖规则）
+        self.content_types: Optional[ContentTypeResolver] = None
+        # 按对象键附加上传参数的规则（配置项 upload_rules）
+        self.upload_rules: Optional[UploadRules] = None
+        # 图片衍生版本（按配置项 image_derivatives 启用）
+        self.derivatives: Optional[ImageDerivativeStage] = None
+        # 多进程上传（按配置项 upload_processes 启用，只用于文件上传）
+        self.process_backend: Optional[ProcessUploadBackend] = None
+        # 预热过的boto3客户端（可选，设置后所有工作线程共用池中同一配置的客户端）
+        self.client_pool: Optional[ClientPool] = None
+        # 性能追踪（默认关闭，见 core/tracing.py）
+        self.tracer = get_tracer()
+        
+        # 后台读取添加文件的元数据
+        self.scanner = FileScanner()
+        # 清空列表时递增，之前提交的扫描不再添加目录中的文件
+        self._scan_generation = 0
         
-        # 回调函数
+        # 本批上传完成的对象链接（每次开始上传时清空）
+        self.batch_links = BatchLinks()
+        # 未公开的对象生成预签名下载链接（每次开始上传时按配置创建）
+        self.presigner: Optional[Presigner] = None
+        # 事件总线（可选）。界面使用事件总线，工作线程不直接调用界面代码
+        self.events: Optional[EventBus] = None
+        
+        # 回调函数（在工作线程中调用）
         self.on_task_progress: Optional[Callable] = None
         self.on_task_complete: Optional[Callable] = None
         self.on_task_error: Optional[Callable] = None
         self.on_all_complete: Optional[Callable] = None
+        # 后台读取文件元数据的进度，参数为尚未读取完的文件数（在扫描线程中调用）
+        self.on_scan_progress: Optional[Callable] = None
         
         # 统计数据
         self.total_bytes = 0
@@ -49,46 +182,159 @@ class UploadManager:
         self._uploaded_bytes_lock = threading.Lock()
         self._last_seen_per_file = {}
     
-    def add_files(self, file_paths: List[str]) -> int:
+    def add_files(self, file_paths: List[str], background: bool = False) -> int:
         """
         添加文件到上传列表
         
+        Args:
+            file_paths: 文件路径（background为True时也可以是目录）
+            background: 是否在后台读取文件元数据。为True时立即返回，任务状态为scanning，
+                        大小读取完成后变为pending（通过 ScanProgress 事件通知）；
+                        目录展开为其中的文件，对象键保留目录结构。
+                        为False时在当前线程中解析路径（含符号链接）并读取大小
+        
         Returns:
-            添加的文件数量
-        """
-        added = 0
-        for path in file_paths:
-            path = str(Path(path).resolve())
-            # 避免重复添加
-            if not any(t.file_path == path for t in self.tasks):
-                task = UploadTask(path)
-                self.tasks.append(task)
-                added += 1
-        return added
+            添加的路径数量
+        """
+        if not background:
+            new_tasks = []
+            existing = {t.file_path for t in self.get_tasks()}
+            for path in file_paths:
+                path = str(Path(path).resolve())
+                # 避免重复添加
+                if path in existing:
+                    continue
+                existing.add(path)
+                new_tasks.append(UploadTask(path))
+            with self._tasks_lock:
+                self.tasks.extend(new_tasks)
+            return len(new_tasks)
+        
+        # 只做字符串处理，不访问文件系统
+        new_tasks = []
+        with self._tasks_lock:
+            existing = {t.file_path for t in self.tasks}
+            for path in file_paths:
+                path = os.path.abspath(path)
+                # 避免重复添加
+                if path in existing:
+                    continue
+                existing.add(path)
+                task = UploadTask(path, filesize=0)
+                task.status = 'scanning'
+                new_tasks.append(task)
+            self.tasks.extend(new_tasks)
+            generation = self._scan_generation
+        self.scanner.submit(new_tasks, lambda done, added, removed:
+                            self._on_scanned(generation, added, removed))
+        return len(new_tasks)
+    
+    def _on_scanned(self, generation: int, added: List[UploadTask], removed: List[UploadTask]):
+        """一批文件元数据读取完成（扫描线程中调用，多个扫描线程可能同时调用）"""
+        with self._tasks_lock:
+            if generation == self._scan_generation and (added or removed):
+                removed = set(removed)
+                existing = {t.file_path for t in self.tasks if t not in removed}
+                tasks = [t for t in self.tasks if t not in removed]
+                for task in added:
+                    if task.file_path not in existing:
+                        existing.add(task.file_path)
+                        tasks.append(task)
+                self.tasks[:] = tasks
+        
+        pending = self.scanner.pending
+        if self.events:
+            self.events.publish(ScanProgress(pending))
+        if self.on_scan_progress:
+            self.on_scan_progress(pending)
+    
+    def is_scanning(self) -> bool:
+        """是否还有文件在读取元数据"""
+        return self.scanner.pending > 0
+    
+    def add_stream(self, stream, name: str, key: Optional[str] = None,
+                   content_type: Optional[str] = None) -> StreamUploadTask:
+        """
+        添加流式上传任务（例如数据库导出、tar输出的管道），不落盘直接上传
+        
+        Args:
+            stream: 可读对象或产生bytes的迭代器
+            name: 对象名（未指定key时使用 前缀/对象名）
+            key: 指定对象键
+            content_type: Content-Type（默认按对象名推断）
+        """
+        task = StreamUploadTask(stream, name, key, content_type)
+        with self._tasks_lock:
+            self.tasks.append(task)
+        return task
+    
+    def add_download(self, key: str, local_path: str, size: int = 0) -> DownloadTask:
+        """
+        添加下载任务（与上传任务共用队列、线程和进度统计）
+        
+        Args:
+            key: 对象键
+            local_path: 本地保存路径
+            size: 对象大小（未知时为0，开始下载后更新）
+        """
+        task = DownloadTask(key, str(Path(local_path).resolve()), size)
+        with self._tasks_lock:
+            self.tasks.append(task)
+        return task
     
     def remove_task(self, file_path: str) -> bool:
         """移除指定任务"""
-        for task in self.tasks:
-            if task.file_path == file_path:
-                self.tasks.remove(task)
-                return True
+        with self._tasks_lock:
+            for task in self.tasks:
+                if task.file_path == file_path:
+                    self.tasks.remove(task)
+                    return True
         return False
     
+    def remove_tasks(self, tasks: Iterable[UploadTask]):
+        """
+        从任务列表中移除已结束的任务（如监视文件夹持续产生的任务），
+        由这些任务生成、同样已结束的衍生版本任务一并移除
+        """
+        removed = set(tasks)
+        if not removed:
+            return
+
+        def keep(task) -> bool:
+            if task in removed:
+                return False
+            return not (isinstance(task, DerivativeUploadTask) and task.parent in removed
+                        and task.status in ('completed', 'failed'))
+
+        with self._tasks_lock:
+            self.tasks[:] = [t for t in self.tasks if keep(t)]
+            self.current_batch_tasks[:] = [t for t in self.current_batch_tasks if keep(t)]
+    
     def clear_tasks(self):
         """清空所有任务"""
-        self.tasks.clear()
+        with self._tasks_lock:
+            self._scan_generation += 1
+            self.tasks.clear()
+    
+    def get_tasks(self) -> List[UploadTask]:
+        """任务列表的副本（可在其他线程修改列表的同时遍历）"""
+        with self._tasks_lock:
+            return list(self.tasks)
     
     def get_pending_tasks(self) -> List[UploadTask]:
         """获取待上传的任务"""
-        return [t for t in self.tasks if t.status == 'pending']
+        with self._tasks_lock:
+            return [t for t in self.tasks if t.status == 'pending']
     
-    def start_upload(self, s3_config: dict, max_threads: int = 3):
+    def start_upload(self, s3_config: dict, max_threads: int = 3,
+                     task_source: Optional[Iterable[UploadTask]] = None):
         """
         开始上传
         
         Args:
             s3_config: S3配置字典，包含endpoint, access_key, secret_key, bucket等
             max_threads: 最大并发线程数
+            task_source: 流式任务来源（可选），边产生边上传
         """
         # 重置状态
         self.stop_flag.clear()
@@ -97,17 +343,48 @@ class UploadManager:
         
         # 计算总大小
         pending_tasks = self.get_pending_tasks()
-        if not pending_tasks:
+        if not pending_tasks and task_source is None:
             return
 
         # 记录当前批次的任务
         self.current_batch_tasks = list(pending_tasks)
+        self.batch_links.clear()
+        
+        # 加密分片和流式数据的内存上限由缓冲池容量决定，池满时读取分片的线程等待（未加密的分片直接映射文件）
+        pool_mb = s3_config.get('buffer_pool_mb') or self.DEFAULT_BUFFER_POOL_MB
+        self.buffer_pool = BufferPool(int(pool_mb * 1024 * 1024))
+        self.encryption = EnvelopeEncryption.from_config(s3_config)
+        # 每个进程同一时间处理一个文件，工作线程数不少于进程数（先于其他阶段创建，配置有误时尽早报错）
+        self.process_backend = ProcessUploadBackend.from_config(s3_config, max_threads, pool_mb)
+        if self.process_backend:
+            max_threads = max(max_threads, self.process_backend.processes)
+        # 密文无法被HTTP客户端按Content-Encoding解压，加密时不压缩
+        self.compression = None if self.encryption else CompressionStage.from_config(s3_config)
+        self.derivatives = ImageDerivativeStage.from_config(s3_config)
+        self.content_types = ContentTypeResolver.from_config(s3_config)
+        self.upload_rules = UploadRules.from_config(s3_config)
+        # 未配置区域时按预热探测到的存储桶区域签名（us-east-1签名的链接在其他区域会被拒绝）
+        self.presigner = Presigner.from_config(
+            s3_config, self.client_pool.bucket_region(s3_config) if self.client_pool else None
+        )
 
         self.total_bytes = sum(t.filesize for t in pending_tasks)
         
         # 将任务加入队列
         for task in pending_tasks:
-            self.task_queue.put(task)
+            self._enqueue(task)
+        
+        # 启动任务来源线程
+        self._feeder = None
+        if task_source is not None:
+            self.feeding.set()
+            self._feeder = threading.Thread(
+                target=self._feeder_thread,
+                args=(task_source,),
+                daemon=True,
+                name='Uploader-Feeder'
+            )
+            self._feeder.start()
         
         # 启动工作线程
         self.worker_threads.clear()
@@ -121,8 +398,9 @@ class UploadManager:
             t.start()
             self.worker_threads.append(t)
         
-        # 启动监控线程
-        monitor = threading.Thread(target=self._monitor_thread, daemon=True)
+        # 启动监控线程（只关闭本批创建的各阶段）
+        stages = (self.compression, self.derivatives, self.process_backend)
+        monitor = threading.Thread(target=self._monitor_thread, args=(stages,), daemon=True)
         monitor.start()
     
     def stop_upload(self):
@@ -136,34 +414,110 @@ class UploadManager:
             except queue.Empty:
                 break
     
+    def _feeder_thread(self, task_source: Iterable[UploadTask]):
+        """任务来源线程，把流式产生的任务逐个加入队列"""
+        try:
+            for task in task_source:
+                if self.stop_flag.is_set():
+                    break
+                with self._tasks_lock:
+                    self.tasks.append(task)
+                    self.current_batch_tasks.append(task)
+                with self._uploaded_bytes_lock:
+                    self.total_bytes += task.filesize
+                self._enqueue(task)
+        except Exception as e:
+            self._notify_error(None, f'生成上传任务失败: {e}')
+        finally:
+            self.feeding.clear()
+    
+    def _enqueue(self, task):
+        """任务加入队列；原图同时提交衍生版本生成，与原图上传并行"""
+        self.task_queue.put(task)
+        derivatives = self.derivatives
+        if (derivatives and type(task) is UploadTask and not self.stop_flag.is_set()
+                and derivatives.should_process(task.file_path)):
+            try:
+                derivatives.submit(
+                    task.file_path,
+                    lambda results, error: self._on_derivatives(derivatives, task, results, error)
+                )
+            except RuntimeError:
+                pass  # 已停止，衍生阶段随批次关闭
+    
+    def _on_derivatives(self, derivatives: ImageDerivativeStage, parent: UploadTask,
+                        results: Optional[list], error: Optional[Exception]):
+        """衍生版本生成完成（在进程池的回调线程中执行），加入上传队列"""
+        if error:
+            self._notify_error(None, f'生成衍生版本失败: {parent.filename}: {error}')
+            return
+        for variant, path, size in results:
+            if self.stop_flag.is_set():
+                derivatives.discard(path)
+                continue
+            task = DerivativeUploadTask(parent, variant, path, derivatives.content_type(variant),
+                                        derivatives)
+            with self._tasks_lock:
+                self.tasks.append(task)
+                self.current_batch_tasks.append(task)
+            with self._uploaded_bytes_lock:
+                self.total_bytes += size
+            self.task_queue.put(task)
+    
+    def _expecting_tasks(self) -> bool:
+        """是否还有任务会被加入队列（流式任务来源或衍生版本生成中）"""
+        return self.feeding.is_set() or bool(self.derivatives and self.derivatives.pending)
+    
     def _worker_thread(self, s3_config: dict):
         """工作线程"""
         try:
-            # 创建S3客户端
+            # 创建S3客户端（有客户端池时复用池中已建立连接的客户端）
             client = S3ClientWrapper(
                 endpoint_url=s3_config['endpoint'],
                 access_key=s3_config.get('access_key'),
-                secret_key=s3_config.get('secret_key')
+                secret_key=s3_config.get('secret_key'),
+                chunk_size=s3_config.get('chunk_size'),
+                max_concurrency=s3_config.get('part_concurrency'),
+                buffer_pool=self.buffer_pool,
+                encryption=self.encryption,
+                content_types=self.content_types,
+                signing_url=s3_config.get('signing_url'),
+                signing_token=s3_config.get('signing_token'),
+                region_name=s3_config.get('region'),
+                addressing_style=s3_config.get('addressing_style'),
+                client=self.client_pool.get(s3_config) if self.client_pool else None
             )
         except Exception as e:
-            if self.on_task_error:
-                self.on_task_error(None, f'创建S3客户端失败: {e}')
+            self._notify_error(None, f'创建S3客户端失败: {e}')
             return
         
+        # 预签名上传模式不经过botocore，没有可追踪的请求事件
+        if self.tracer.enabled and not s3_config.get('signing_url'):
+            self.tracer.attach_botocore(client.client)
+        
         while not self.stop_flag.is_set():
             try:
                 task = self.task_queue.get(timeout=1)
             except queue.Empty:
+                # 先检查是否还会有任务，再确认队列为空，避免与入队竞争
+                if self._expecting_tasks() or not self.task_queue.empty():
+                    continue
                 break
             
+            task.started_at = time.perf_counter()
+            kind = 'download' if isinstance(task, DownloadTask) else 'upload'
             try:
-                self._upload_task(client, task, s3_config)
+                with self.tracer.span(kind, 'task', {'file': task.filename, 'size': task.filesize}):
+                    if kind == 'download':
+                        self._download_task(client, task, s3_config)
+                    else:
+                        self._upload_task(client, task, s3_config)
             except Exception as e:
                 task.status = 'failed'
                 task.error_message = str(e)
-                if self.on_task_error:
-                    self.on_task_error(task, str(e))
+                self._notify_error(task, str(e))
             finally:
+                task.finished_at = time.perf_counter()
                 self.task_queue.task_done()
     
     def _upload_task(self, client: S3ClientWrapper, task: UploadTask, s3_config: dict):
@@ -171,63 +525,250 @@ class UploadManager:
         task.status = 'uploading'
         
         bucket = s3_config['bucket']
-        prefix = s3_config.get('prefix', '').lstrip('/')
         make_public = s3_config.get('make_public', False)
-        
-        # 构建对象键
-        key = task.filename
-        if prefix:
-            key = f"{prefix.rstrip('/')}/{key}"
+        key = self._object_key(task, s3_config)
         
         # 进度回调
+        progress_callback = self._make_progress_callback(task)
+        
+        # 执行上传
+        extra_args = {'Metadata': dict(task.metadata)} if task.metadata else {}
+        # 进度回调会把filesize改为实际上传的大小（压缩后、密文），先记下原文件大小
+        original_size = task.filesize
+        transformed = False
+        if isinstance(task, DerivativeUploadTask):
+            extra_args['ContentType'] = task.content_type
+        if self.upload_rules:
+            self.upload_rules.apply(key, extra_args)
+        # 使用任务开始时的多进程后端，批次结束时后端关闭不影响进行中的任务
+        backend = self.process_backend
+        if isinstance(task, DerivativeUploadTask):
+            try:
+                task.etag = self._upload_file(
+                    client, backend,
+                    local_path=task.file_path,
+                    bucket=bucket,
+                    key=key,
+                    make_public=make_public,
+                    progress_callback=progress_callback,
+                    extra_args=extra_args
+                )
+            finally:
+                task.stage.discard(task.file_path)
+        elif isinstance(task, StreamUploadTask):
+            task.etag = client.upload_stream(
+                stream=task.stream,
+                bucket=bucket,
+                key=key,
+                make_public=make_public,
+                progress_callback=progress_callback,
+                extra_args=extra_args,
+                content_type=task.content_type
+            )
+        else:
+            # 使用任务开始时的压缩阶段，不受批次结束时清理的影响
+            compression = self.compression
+            upload_path = self._compress_task(task, extra_args, compression)
+            transformed = upload_path != task.file_path or self.encryption is not None
+            if upload_path != task.file_path:
+                self._record_original(task, extra_args, original_size)
+            try:
+                task.etag = self._upload_file(
+                    client, backend,
+                    local_path=upload_path,
+                    bucket=bucket,
+                    key=key,
+                    make_public=make_public,
+                    progress_callback=progress_callback,
+                    extra_args=extra_args
+                )
+            finally:
+                if upload_path != task.file_path:
+                    compression.discard(upload_path)
+        
+        # 上传成功
+        task.status = 'completed'
+        task.progress = 100.0
+        
+        # 更新本地索引（大小为对象实际大小，与列举结果一致）
+        if self.object_index:
+            self.object_index.record_upload(bucket, key, task.filesize, etag=task.etag,
+                                            checksum=task.checksum,
+                                            original_size=original_size if transformed else None)
+        
+        # 生成访问URL（未公开的对象使用预签名链接）
+        derivatives = self.derivatives
+        has_variants = (derivatives and type(task) is UploadTask
+                        and derivatives.should_process(task.file_path))
+        if self.presigner:
+            keys = dict(derivatives.derivative_keys(key)) if has_variants else {}
+            keys[None] = key
+            urls = URLGenerator.generate_presigned_urls(self.presigner, bucket, keys)
+            task.public_url = urls.pop(None)
+            task.variant_urls = urls
+        else:
+            task.public_url = URLGenerator.generate_url(
+                base_url=s3_config.get('base_url', ''),
+                endpoint_url=s3_config['endpoint'],
+                bucket=bucket,
+                key=key
+            )
+            if has_variants:
+                task.variant_urls = URLGenerator.generate_variant_urls(
+                    base_url=s3_config.get('base_url', ''),
+                    endpoint_url=s3_config['endpoint'],
+                    bucket=bucket,
+                    keys=derivatives.derivative_keys(key)
+                )
+        
+        self.batch_links.add(task)
+        
+        # 触发完成回调
+        self._notify_complete(task)
+    
+    @staticmethod
+    def _upload_file(client: S3ClientWrapper, backend: Optional[ProcessUploadBackend],
+                     **kwargs) -> str:
+        """上传本地文件（启用多进程时在子进程中执行）"""
+        if backend:
+            return backend.upload_file(**kwargs)
+        return client.upload_file(**kwargs)
+    
+    def _object_key(self, task: UploadTask, s3_config: dict) -> str:
+        """任务的对象键（默认 前缀/文件名，衍生版本按原图对象键推导）"""
+        if not task.key:
+            if isinstance(task, DerivativeUploadTask):
+                task.key = task.stage.derivative_key(
+                    self._object_key(task.parent, s3_config), task.variant
+                )
+            else:
+                prefix = s3_config.get('prefix', '').lstrip('/')
+                task.key = f"{prefix.rstrip('/')}/{task.filename}" if prefix else task.filename
+        return task.key
+    
+    def _compress_task(self, task: UploadTask, extra_args: dict,
+                       compression: Optional[CompressionStage]) -> str:
+        """
+        按配置压缩文件，设置Content-Encoding并保留原文件的Content-Type
+        
+        Returns:
+            实际上传的文件路径（未压缩时为原路径）
+        """
+        if not compression or not compression.should_compress(task.file_path, task.filesize):
+            return task.file_path
+        
+        with self.tracer.span('compress', 'upload', {'file': task.filename}):
+            compressed = compression.compress(task.file_path)
+        if not compressed:
+            return task.file_path
+        
+        extra_args['ContentEncoding'] = compression.encoding
+        content_type = self.content_types.lookup(task.key or task.file_path)
+        if content_type:
+            extra_args.setdefault('ContentType', content_type)
+        return compressed
+    
+    def _record_original(self, task: UploadTask, extra_args: dict, original_size: int):
+        """压缩上传的对象在元数据中记录原文件的大小和MD5（加密上传的明文大小由加密元数据记录）"""
+        if not task.checksum:
+            md5 = hashlib.md5()
+            with open(task.file_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    md5.update(chunk)
+            task.checksum = md5.hexdigest()
+        metadata = extra_args.setdefault('Metadata', {})
+        metadata[self.META_ORIGINAL_SIZE] = str(original_size)
+        metadata[self.META_MD5] = task.checksum
+    
+    def _download_task(self, client: S3ClientWrapper, task: DownloadTask, s3_config: dict):
+        """执行单个下载任务"""
+        if s3_config.get('signing_url'):
+            raise ValueError('预签名上传模式不支持下载')
+        task.status = 'downloading'
+        
+        downloader = RangedDownloader(client)
+        head = downloader.download(
+            bucket=s3_config['bucket'],
+            key=task.key,
+            local_path=task.file_path,
+            progress_callback=self._make_progress_callback(task)
+        )
+        
+        task.status = 'completed'
+        task.progress = 100.0
+        task.metadata = head.get('Metadata', {})
+        
+        self._notify_complete(task)
+    
+    def _make_progress_callback(self, task) -> Callable:
+        """创建任务的进度回调（上传和下载共用）"""
         def progress_callback(filename, seen, size, percent):
             task.progress = percent
             
-            # 更新全局上传字节数
+            # 更新全局传输字节数
             with self._uploaded_bytes_lock:
+                # 下载任务开始前大小可能未知，以实际大小修正总量
+                if size != task.filesize:
+                    self.total_bytes += size - task.filesize
+                    task.filesize = size
                 last = self._last_seen_per_file.get(filename, 0)
                 delta = seen - last
                 self._last_seen_per_file[filename] = seen
                 self.uploaded_bytes += delta
             
             # 触发回调
+            if self.events:
+                self.events.publish(TaskProgress(task))
             if self.on_task_progress:
-                self.on_task_progress(task)
+                with self.tracer.span('on_task_progress', 'callback'):
+                    self.on_task_progress(task)
         
-        # 执行上传
-        client.upload_file(
-            local_path=task.file_path,
-            bucket=bucket,
-            key=key,
-            make_public=make_public,
-            progress_callback=progress_callback
-        )
-        
-        # 上传成功
-        task.status = 'completed'
-        task.progress = 100.0
-        
-        # 生成公开URL
-        task.public_url = URLGenerator.generate_url(
-            base_url=s3_config.get('base_url', ''),
-            endpoint_url=s3_config['endpoint'],
-            bucket=bucket,
-            key=key
-        )
-        
-        # 触发完成回调
+        return progress_callback
+    
+    def _notify_complete(self, task):
+        if self.events:
+            self.events.publish(TaskCompleted(task))
         if self.on_task_complete:
-            self.on_task_complete(task)
+            with self.tracer.span('on_task_complete', 'callback'):
+                self.on_task_complete(task)
     
-    def _monitor_thread(self):
-        """监控线程，等待所有任务完成"""
+    def _notify_error(self, task, message: str):
+        if self.events:
+            self.events.publish(TaskFailed(task, message))
+        if self.on_task_error:
+            self.on_task_error(task, message)
+    
+    def _monitor_thread(self, stages: tuple):
+        """监控线程，等待所有任务完成后关闭本批的压缩、衍生和多进程阶段"""
         while not self.stop_flag.is_set():
             # 检查是否所有任务都完成
-            if self.task_queue.empty() and all(not t.is_alive() for t in self.worker_threads):
+            if (not self._expecting_tasks() and self.task_queue.empty()
+                    and all(not t.is_alive() for t in self.worker_threads)):
                 break
             time.sleep(0.5)
         
+        # 停止时工作线程可能仍在处理当前任务，等它们退出后再关闭各阶段
+        for t in list(self.worker_threads):
+            t.join()
+        # 任务来源可能阻塞在等待下一个任务（如监视文件夹），只等待有限时间
+        if self._feeder:
+            self._feeder.join(self.FEEDER_JOIN_TIMEOUT)
+        
+        compression, derivatives, process_backend = stages
+        if compression:
+            compression.close()
+            if self.compression is compression:
+                self.compression = None
+        if derivatives:
+            derivatives.close()
+        if process_backend:
+            process_backend.close()
+            if self.process_backend is process_backend:
+                self.process_backend = None
+        
         # 触发完成回调
+        if self.events:
+            self.events.publish(AllCompleted())
         if self.on_all_complete:
             self.on_all_complete()
     
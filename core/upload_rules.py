@@ -0,0 +1,139 @@
+"""
+上传规则
+按对象键匹配规则，为上传附加Cache-Control、存储类型、元数据等参数，
+上传时一次设置好，不再需要上传后逐个修改对象
+
+配置示例（配置项 upload_rules，按顺序匹配，后面的规则覆盖前面的同名参数）：
+    [
+        {"match": "*.html", "args": {"CacheControl": "no-cache"}},
+        {"regex": "\\\\.[0-9a-f]{8,}\\\\.(js|css)$",
+         "args": {"CacheControl": "public, max-age=31536000, immutable"}},
+        {"match": "archive/*", "args": {"StorageClass": "GLACIER_IR"}, "stop": true}
+    ]
+"""
+
+import fnmatch
+import posixpath
+import re
+from typing import Dict, List, Optional, Tuple
+
+
+# 允许通过规则设置的上传参数（PutObject和CreateMultipartUpload均支持）
+ALLOWED_ARGS = (
+    'ACL', 'CacheControl', 'ContentDisposition', 'ContentEncoding', 'ContentLanguage',
+    'ContentType', 'Expires', 'Metadata', 'StorageClass', 'Tagging',
+    'WebsiteRedirectLocation', 'ServerSideEncryption', 'SSEKMSKeyId'
+)
+
+
+class UploadRule:
+    """单条规则"""
+
+    def __init__(self, index: int, rule: dict):
+        """
+        Args:
+            index: 规则序号（用于错误提示）
+            rule: 包含 match（通配模式）或 regex（正则，search语义）、args、可选的stop
+        """
+        if ('match' in rule) == ('regex' in rule):
+            raise ValueError(f'上传规则 {index + 1} 需要 match 或 regex 其中之一')
+        args = rule.get('args') or {}
+        unknown = set(args) - set(ALLOWED_ARGS)
+        if unknown:
+            raise ValueError(f'上传规则 {index + 1} 包含不支持的参数: {", ".join(sorted(unknown))}')
+        if 'Metadata' in args and not isinstance(args['Metadata'], dict):
+            raise ValueError(f'上传规则 {index + 1} 的 Metadata 必须是对象')
+
+        self.index = index
+        self.args = args
+        self.stop = bool(rule.get('stop'))
+        # 形如 *.ext 的规则按扩展名查表，不需要逐条匹配
+        self.extension = None
+        if 'match' in rule:
+            pattern = rule['match']
+            ext = pattern[1:]
+            if (pattern.startswith('*.') and ext.count('.') == 1
+                    and not any(c in ext for c in '*?[/')):
+                self.extension = ext.lower()
+            self.regex = re.compile(fnmatch.translate(pattern), re.IGNORECASE)
+        else:
+            try:
+                self.regex = re.compile(rule['regex'])
+            except re.error as e:
+                raise ValueError(f'上传规则 {index + 1} 的正则无效: {e}')
+
+    def matches(self, key: str) -> bool:
+        return self.regex.search(key) is not None
+
+
+class UploadRules:
+    """编译后的规则集"""
+
+    def __init__(self, rules: List[dict]):
+        self.rules = [UploadRule(i, rule) for i, rule in enumerate(rules)]
+        # 扩展名 -> 规则序号
+        self._by_extension: Dict[str, List[int]] = {}
+        # 需要逐条匹配的规则序号
+        self._scanned: List[int] = []
+        for rule in self.rules:
+            if rule.extension is not None:
+                self._by_extension.setdefault(rule.extension, []).append(rule.index)
+            else:
+                self._scanned.append(rule.index)
+        # 命中的规则组合 -> 合并后的参数（同一组合只合并一次）
+        self._merged: Dict[Tuple[int, ...], dict] = {}
+
+    @classmethod
+    def from_config(cls, s3_config: dict) -> Optional['UploadRules']:
+        """按配置项 upload_rules 创建，未配置时返回None"""
+        rules = s3_config.get('upload_rules')
+        if not rules:
+            return None
+        return cls(rules)
+
+    def match(self, key: str) -> Tuple[int, ...]:
+        """返回命中的规则序号（按配置顺序，遇到stop规则为止）"""
+        ext = posixpath.splitext(key)[1].lower()
+        candidates = self._by_extension.get(ext)
+        if candidates:
+            candidates = sorted(candidates + self._scanned)
+        else:
+            candidates = self._scanned
+
+        matched = []
+        for index in candidates:
+            rule = self.rules[index]
+            if rule.extension is not None or rule.matches(key):
+                matched.append(index)
+                if rule.stop:
+                    break
+        return tuple(matched)
+
+    def args_for(self, key: str) -> dict:
+        """对象键对应的上传参数（不要修改返回值）"""
+        matched = self.match(key)
+        merged = self._merged.get(matched)
+        if merged is None:
+            merged = {}
+            for index in matched:
+                for name, value in self.rules[index].args.items():
+                    if name == 'Metadata':
+                        merged['Metadata'] = {**merged.get('Metadata', {}), **value}
+                    else:
+                        merged[name] = value
+            self._merged[matched] = merged
+        return merged
+
+    def apply(self, key: str, extra_args: dict) -> dict:
+        """
+        把规则参数合并进extra_args（任务自身设置的参数和元数据优先）
+
+        Returns:
+            extra_args
+        """
+        for name, value in self.args_for(key).items():
+            if name == 'Metadata':
+                extra_args['Metadata'] = {**value, **extra_args.get('Metadata', {})}
+            else:
+                extra_args.setdefault(name, value)
+        return extra_args
@@ -26,6 +26,9 @@ from gui.custom_dialogs import (
     MessageDialog,
     ConfigDialog
 )
+from gui.async_runner import AsyncRunner, AsyncJob
+from gui.log_view import LogView
+from gui.event_dispatcher import EventDispatcher
 from gui.main_window import S3UploaderApp
 
 __all__ = [
@@ -48,5 +51,9 @@ __all__ = [
     'InputDialog',
     'MessageDialog',
     'ConfigDialog',
+    'AsyncRunner',
+    'AsyncJob',
+    'LogView',
+    'EventDispatcher',
     'S3UploaderApp'
 ]
\ No newline at end of file
@@ -0,0 +1,103 @@
+"""
+界面发起的后台任务
+网络请求等耗时操作在后台线程执行，结果通过 root.after 轮询回到Tk主线程处理，
+等待期间界面不会卡住
+"""
+
+import queue
+import threading
+from typing import Callable, Dict, Optional
+
+
+class AsyncJob:
+    """后台任务句柄"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.cancelled = threading.Event()
+        self.done = False
+
+    def cancel(self):
+        """取消任务：后台调用无法中断，但结果会被丢弃，不再触发回调"""
+        self.cancelled.set()
+
+    @property
+    def running(self) -> bool:
+        return not self.done and not self.cancelled.is_set()
+
+
+class AsyncRunner:
+    """后台任务执行器（回调总是在Tk主线程中执行）"""
+
+    # 有任务在执行时检查结果的间隔（毫秒）
+    POLL_INTERVAL = 50
+
+    def __init__(self, root):
+        self.root = root
+        self._results = queue.Queue()
+        self._jobs: Dict[str, AsyncJob] = {}
+        self._polling = False
+
+    def submit(self, name: str, fn: Callable, on_success: Callable,
+               on_error: Optional[Callable] = None) -> AsyncJob:
+        """
+        提交后台任务，同名的未完成任务会被取消
+
+        Args:
+            name: 任务名称（同一时间每个名称只保留最新的任务）
+            fn: 在后台线程中执行的函数
+            on_success: 成功回调，参数为fn的返回值
+            on_error: 失败回调，参数为异常
+        """
+        self.cancel(name)
+        job = AsyncJob(name)
+        self._jobs[name] = job
+
+        def run():
+            try:
+                result = (on_success, fn())
+            except Exception as e:
+                result = (on_error, e)
+            self._results.put((job, result))
+
+        threading.Thread(target=run, daemon=True, name=f'Async-{name}').start()
+        if not self._polling:
+            self._polling = True
+            self.root.after(self.POLL_INTERVAL, self._poll)
+        return job
+
+    def cancel(self, name: str):
+        """取消指定名称的任务"""
+        job = self._jobs.pop(name, None)
+        if job:
+            job.cancel()
+
+    def is_running(self, name: str) -> bool:
+        job = self._jobs.get(name)
+        return bool(job and job.running)
+
+    def _poll(self):
+        """主线程中分发已完成任务的结果"""
+        results = []
+        while True:
+            try:
+                results.append(self._results.get_nowait())
+            except queue.Empty:
+                break
+        for job, _ in results:
+            job.done = True
+            if self._jobs.get(job.name) is job:
+                del self._jobs[job.name]
+
+        # 回调可能打开模态对话框，先安排好下一次轮询
+        if self._jobs:
+            self.root.after(self.POLL_INTERVAL, self._poll)
+        else:
+            self._polling = False
+
+        for job, (callback, value) in results:
+            if not job.cancelled.is_set() and callback:
+                try:
+                    callback(value)
+                except Exception as e:
+                    print(f'后台任务回调出错 ({job.name}): {e}')
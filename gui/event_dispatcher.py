@@ -0,0 +1,52 @@
+"""
+界面事件分发
+在Tk主线程中定时按批取出事件总线中的事件并分发给处理函数，
+一批处理完后再统一刷新界面（文件列表、进度条每批最多重绘一次）
+"""
+
+from typing import Callable, Dict, List, Type
+
+from core.events import Event, EventBus
+
+
+class EventDispatcher:
+    """事件总线到Tk主线程的分发器"""
+
+    # 取事件的间隔（毫秒）
+    POLL_INTERVAL = 50
+    # 每批最多处理的事件数，积压时分多帧处理，界面保持响应
+    MAX_BATCH = 500
+
+    def __init__(self, root, bus: EventBus):
+        self.root = root
+        self.bus = bus
+        self._handlers: Dict[Type[Event], List[Callable]] = {}
+        self._batch_handlers: List[Callable] = []
+
+    def subscribe(self, event_type: Type[Event], handler: Callable):
+        """注册事件处理函数，参数为事件对象"""
+        self._handlers.setdefault(event_type, []).append(handler)
+
+    def after_batch(self, handler: Callable):
+        """注册每批事件处理完后调用的函数（用于合并界面刷新）"""
+        self._batch_handlers.append(handler)
+
+    def start(self):
+        self.root.after(self.POLL_INTERVAL, self._poll)
+
+    def _poll(self):
+        # 先安排下一次，处理函数打开模态对话框（嵌套事件循环）时分发也不中断
+        self.root.after(self.POLL_INTERVAL, self._poll)
+        events = self.bus.drain(self.MAX_BATCH)
+        for event in events:
+            for handler in self._handlers.get(type(event), ()):
+                try:
+                    handler(event)
+                except Exception as e:
+                    print(f'处理事件出错 ({type(event).__name__}): {e}')
+        if events:
+            for handler in self._batch_handlers:
+                try:
+                    handler()
+                except Exception as e:
+                    print(f'刷新界面出错: {e}')
@@ -0,0 +1,112 @@
+"""
+运行日志
+任意线程都可以写日志：消息进入队列，由Tk主线程每帧批量插入文本框；
+界面只保留最近的若干行（环形缓冲），完整记录由logging写入滚动日志文件
+"""
+
+import atexit
+import logging
+import queue
+import time
+from collections import deque
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from pathlib import Path
+from typing import List, Optional
+
+from tkinter import END
+
+
+class LogView:
+    """NekoText的日志输出"""
+
+    # 界面保留的最大行数
+    MAX_LINES = 2000
+    # 刷新间隔（毫秒），约每帧一次
+    FLUSH_INTERVAL = 50
+    # 日志文件滚动：单个文件大小和保留的旧文件数
+    FILE_MAX_BYTES = 5 * 1024 * 1024
+    FILE_BACKUPS = 5
+
+    def __init__(self, root, text_widget, log_path: Optional[Path] = None,
+                 max_lines: Optional[int] = None):
+        """
+        Args:
+            root: Tk根窗口
+            text_widget: 显示日志的NekoText
+            log_path: 日志文件路径（None时不写文件）
+            max_lines: 界面保留的最大行数
+        """
+        self.root = root
+        self.text_widget = text_widget
+        self.max_lines = max_lines or self.MAX_LINES
+        self.lines = deque(maxlen=self.max_lines)
+        self._pending = queue.SimpleQueue()
+        # 文本框中的行数
+        self._shown = 0
+
+        # 文件写入在独立线程中进行，写日志的线程不等待磁盘
+        self.logger = logging.getLogger('s3uploader')
+        self.logger.setLevel(logging.INFO)
+        self.logger.propagate = False
+        self._listener = None
+        if log_path:
+            try:
+                log_path.parent.mkdir(parents=True, exist_ok=True)
+                handler = RotatingFileHandler(log_path, maxBytes=self.FILE_MAX_BYTES,
+                                              backupCount=self.FILE_BACKUPS, encoding='utf-8')
+                handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+                records = queue.SimpleQueue()
+                self.logger.addHandler(QueueHandler(records))
+                self._listener = QueueListener(records, handler)
+                self._listener.start()
+                atexit.register(self.close)
+            except OSError as e:
+                print(f'打开日志文件失败: {e}')
+
+        self.root.after(self.FLUSH_INTERVAL, self._flush)
+
+    def write(self, message: str):
+        """写一条日志（线程安全，不阻塞）"""
+        self._pending.put(f'[{time.strftime("%H:%M:%S")}] {message}')
+        if self._listener:
+            self.logger.info(message)
+
+    def recent(self) -> List[str]:
+        """界面中保留的日志行"""
+        return list(self.lines)
+
+    def _flush(self):
+        """主线程中把队列中的消息一次性插入文本框"""
+        batch = []
+        while True:
+            try:
+                batch.append(self._pending.get_nowait())
+            except queue.Empty:
+                break
+
+        if batch:
+            # 一帧内消息超过保留行数时，只需显示最后的部分
+            batch = batch[-self.max_lines:]
+            self.lines.extend(batch)
+
+            text = self.text_widget.text
+            at_bottom = text.yview()[1] >= 0.999
+            chunk = '\n'.join(batch) + '\n'
+            text.insert(END, chunk)
+            # 按文本框的行数裁剪（多行消息如异常堆栈占多行）
+            self._shown += chunk.count('\n')
+            excess = self._shown - self.max_lines
+            if excess > 0:
+                text.delete('1.0', f'{excess + 1}.0')
+                self._shown -= excess
+            # 用户向上翻看时不跳到末尾
+            if at_bottom:
+                text.see(END)
+
+        self.root.after(self.FLUSH_INTERVAL, self._flush)
+
+    def close(self):
+        """写完剩余的文件日志"""
+        if self._listener:
+            self._listener.stop()
+            self._listener = None
@@ -1,4 +1,3 @@
-import time
 from tkinter import (
     Frame, Label, Button, filedialog, END, Canvas, VERTICAL, RIGHT, Y, BOTH
 )
@@ -10,13 +9,22 @@ from gui.widgets import (
     NekoFrame, NekoLabel, NekoEntry, NekoButton,
     NekoListbox, NekoText, NekoCheckButton, NekoCombobox
 )
+from gui.async_runner import AsyncRunner
+from gui.log_view import LogView
+from gui.event_dispatcher import EventDispatcher
 from gui.custom_dialogs import (
     show_input, show_message, show_question, show_warning,
     show_error, show_success, show_confirm, ConfigDialog
 )
 from core.s3_client import S3ClientWrapper
 from core.upload_manager import UploadManager
+from core.client_pool import ClientPool
+from core.download_manager import DownloadTask
+from core.events import EventBus, TaskProgress, TaskCompleted, TaskFailed, AllCompleted, ScanProgress
 from core.config_manager import ConfigManager
+from core.object_index import ObjectIndex
+from core.sync_manager import SyncManager
+from core.folder_watcher import FolderWatcher
 
 try:
     import pyperclip
@@ -28,6 +36,10 @@ except ImportError:
 class S3UploaderApp:
     """S3上传工具主应用"""
     
+    # 测试连接使用较短的超时且不重试，端点不可达时尽快给出结果
+    PROBE_CONNECT_TIMEOUT = 5
+    PROBE_READ_TIMEOUT = 10
+    
     def __init__(self, root):
         self.root = root
         self._setup_window()
@@ -37,6 +49,7 @@ class S3UploaderApp:
         self._bind_callbacks()
         self._load_current_config()
         self._setup_drag_drop()
+        self._warm_up_client(self.config_manager.get_current_config())
     
     def _setup_window(self):
         """设置窗口基本属性"""
@@ -47,8 +60,17 @@ class S3UploaderApp:
         # 设置最小窗口大小
         self.root.minsize(900, 600)
         
-        # 存储桶列表缓存
-        self.bucket_list = []
+        # 各配置的存储桶列表缓存 {配置名: (端点, 访问密钥, 存储桶列表)}
+        self.bucket_cache = {}
+        
+        # 文件列表当前显示的任务（与列表框的行一一对应）
+        self._listed_tasks = []
+        
+        # 界面发起的网络请求在后台执行
+        self.runner = AsyncRunner(self.root)
+        
+        # 监视文件夹（运行中时不为None）
+        self.folder_watcher = None
         
         # 设置窗口图标(如果需要)
         try:
@@ -60,10 +82,45 @@ class S3UploaderApp:
     def _init_manager(self):
         """初始化上传管理器"""
         self.upload_manager = UploadManager()
+        self.upload_manager.client_pool = ClientPool()
     
     def _init_config_manager(self):
         """初始化配置管理器"""
         self.config_manager = ConfigManager()
+        self.config_manager.on_profile_switch = lambda name, config: self._warm_up_client(config)
+        self._open_object_index()
+    
+    def _warm_up_client(self, config: dict):
+        """后台预热配置对应的S3客户端（配置项 warm_up 为 false 或仍是占位配置时跳过）"""
+        if (config.get('warm_up') is False or not config.get('endpoint')
+                or self.config_manager.is_placeholder(config)):
+            return
+        pool = self.upload_manager.client_pool
+        
+        def on_success(entry):
+            if entry is None:
+                return
+            if entry.error:
+                self.log_message(f'⚠️ 预热S3连接失败: {entry.error}')
+            else:
+                self.log_message(f'🔥 S3连接已就绪: 区域 {entry.region or "默认"}，'
+                                 f'寻址 {entry.addressing_style or "auto"}（{entry.elapsed * 1000:.0f}ms）')
+        
+        def on_error(e):
+            self.log_message(f'⚠️ 预热S3连接失败: {e}')
+        
+        self.runner.submit('warmup', lambda: pool.warm_up(config), on_success, on_error)
+    
+    def _open_object_index(self):
+        """打开当前配置对应的对象索引"""
+        old_index = self.upload_manager.object_index
+        try:
+            self.upload_manager.object_index = ObjectIndex(self.config_manager.get_index_path())
+        except Exception as e:
+            self.upload_manager.object_index = None
+            print(f'打开对象索引失败: {e}')
+        if old_index:
+            old_index.close()
     
     def _create_ui(self):
         """创建用户界面"""
@@ -286,13 +343,14 @@ class S3UploaderApp:
         self.public_var = NekoCheckButton(config_frame, text='🌐 设置为公开可读 (ACL=public-read)')
         self.public_var.grid(row=5, column=0, columnspan=2, sticky='w', pady=8)
         
-        # 测试连接按钮
-        NekoButton(
+        # 测试连接按钮（测试进行中时用于取消）
+        self.test_button = NekoButton(
             config_frame,
             text='🔌 测试连接',
             command=self.test_connection,
             style='secondary'
-        ).grid(row=5, column=2, columnspan=2, padx=5, pady=8, sticky='e')
+        )
+        self.test_button.grid(row=5, column=2, columnspan=2, padx=5, pady=8, sticky='e')
         
         # 配置grid权重
         config_frame.columnconfigure(1, weight=2)
@@ -365,6 +423,35 @@ class S3UploaderApp:
             style='danger'
         ).pack(pady=6, padx=12, fill='x')
         
+        NekoButton(
+            right_frame,
+            text='🔁 同步文件夹',
+            command=self.sync_folder,
+            style='secondary'
+        ).pack(pady=6, padx=12, fill='x')
+        
+        self.watch_button = NekoButton(
+            right_frame,
+            text='👀 监视文件夹',
+            command=self.toggle_watch,
+            style='secondary'
+        )
+        self.watch_button.pack(pady=6, padx=12, fill='x')
+        
+        NekoButton(
+            right_frame,
+            text='📋 复制本批链接',
+            command=self.copy_batch_links,
+            style='secondary'
+        ).pack(pady=6, padx=12, fill='x')
+        
+        NekoButton(
+            right_frame,
+            text='📤 导出链接',
+            command=self.export_batch_links,
+            style='secondary'
+        ).pack(pady=6, padx=12, fill='x')
+        
         # 线程设置
         thread_frame = NekoFrame(right_frame, bg=NekoTheme.BG_SECONDARY)
         thread_frame.pack(fill='x', padx=12, pady=(10, 0))
@@ -423,13 +510,25 @@ class S3UploaderApp:
         
         self.log_text = NekoText(status_frame, height=6)
         self.log_text.pack(fill='both', expand=True)
+        # 界面只保留最近的日志，完整记录写入配置目录下的 logs/
+        self.log_view = LogView(self.root, self.log_text, self.config_manager.get_log_path())
     
     def _bind_callbacks(self):
-        """绑定上传管理器回调"""
-        self.upload_manager.on_task_progress = self._on_task_progress
-        self.upload_manager.on_task_complete = self._on_task_complete
-        self.upload_manager.on_task_error = self._on_task_error
-        self.upload_manager.on_all_complete = self._on_all_complete
+        """订阅上传管理器事件（工作线程只发布事件，界面在主线程中按批处理）"""
+        self.upload_manager.events = EventBus()
+        # 一批事件处理完后需要刷新的部分
+        self._progress_dirty = False
+        self._file_list_dirty = False
+        self._stats_dirty = False
+        
+        self.dispatcher = EventDispatcher(self.root, self.upload_manager.events)
+        self.dispatcher.subscribe(TaskProgress, lambda e: self._on_task_progress(e.task))
+        self.dispatcher.subscribe(TaskCompleted, lambda e: self._on_task_complete(e.task))
+        self.dispatcher.subscribe(TaskFailed, lambda e: self._on_task_error(e.task, e.message))
+        self.dispatcher.subscribe(AllCompleted, lambda e: self._on_all_complete())
+        self.dispatcher.subscribe(ScanProgress, self._on_scan_progress)
+        self.dispatcher.after_batch(self._refresh_after_events)
+        self.dispatcher.start()
     
     def _setup_drag_drop(self):
         """设置拖拽功能"""
@@ -442,7 +541,7 @@ class S3UploaderApp:
         # 获取拖拽的文件路径
         files = self.root.tk.splitlist(event.data)
         if files:
-            count = self.upload_manager.add_files(list(files))
+            count = self.upload_manager.add_files(list(files), background=True)
             self._update_file_list()
             self._update_stats()
             self.log_message(f'✅ 通过拖拽添加了 {count} 个文件')
@@ -459,7 +558,9 @@ class S3UploaderApp:
         """配置切换"""
         selected = self.profile_combobox.get()
         if selected and selected != self.config_manager.current_profile:
+            self._cancel_connection_test()
             self.config_manager.switch_profile(selected)
+            self._open_object_index()
             self._load_current_config()
             self.log_message(f'🔄 已切换到配置: {selected}')
     
@@ -480,6 +581,13 @@ class S3UploaderApp:
         else:
             self.bucket_combobox.set('')
         
+        # 使用上次测试连接得到的存储桶列表（端点或密钥变化后失效）
+        cached = self.bucket_cache.get(self.config_manager.current_profile)
+        if cached and cached[:2] == (config.get('endpoint'), config.get('access_key') or None):
+            self.bucket_combobox.configure(values=cached[2])
+        else:
+            self.bucket_combobox.configure(values=[])
+        
         # 清空并插入base_url（确保值不为None）
         self.baseurl_entry.delete(0, END)
         baseurl_value = config.get('base_url', '')
@@ -520,6 +628,7 @@ class S3UploaderApp:
             config = self._get_s3_config()
             config['max_threads'] = int(self.threads_entry.get())
             self.config_manager.save_current_config(config)
+            self._warm_up_client(config)
             show_success(
                 self.root,
                 '保存成功',
@@ -543,6 +652,7 @@ class S3UploaderApp:
             if self.config_manager.add_profile(profile_name):
                 self._update_profile_list()
                 self.config_manager.switch_profile(profile_name)
+                self._open_object_index()
                 self.profile_combobox.set(profile_name)
                 self._load_current_config()
                 show_success(
@@ -573,6 +683,8 @@ class S3UploaderApp:
         
         if result:
             if self.config_manager.delete_profile(current):
+                self._open_object_index()
+                self._warm_up_client(self.config_manager.get_current_config())
                 self._update_profile_list()
                 self._load_current_config()
                 show_success(
@@ -628,6 +740,7 @@ class S3UploaderApp:
     def _do_delete_profile(self, profile_name):
         """执行删除配置"""
         if self.config_manager.delete_profile(profile_name):
+            self._open_object_index()
             self._update_profile_list()
             if self.config_manager.current_profile != profile_name:
                 self._load_current_config()
@@ -644,7 +757,7 @@ class S3UploaderApp:
         """添加文件"""
         paths = filedialog.askopenfilenames(title='选择要上传的文件')
         if paths:
-            count = self.upload_manager.add_files(list(paths))
+            count = self.upload_manager.add_files(list(paths), background=True)
             self._update_file_list()
             self._update_stats()
             self.log_message(f'✅ 已添加 {count} 个文件')
@@ -656,9 +769,10 @@ class S3UploaderApp:
             show_warning(self.root, '提示', '请先选择要移除的文件哦 (｡･ω･｡)')
             return
         
+        # 按列表显示时的任务定位（扫描线程可能已修改任务列表）
         idx = selection[0]
-        if idx < len(self.upload_manager.tasks):
-            task = self.upload_manager.tasks[idx]
+        if idx < len(self._listed_tasks):
+            task = self._listed_tasks[idx]
             self.upload_manager.remove_task(task.file_path)
             self._update_file_list()
             self._update_stats()
@@ -679,49 +793,72 @@ class S3UploaderApp:
                 self.log_message('🗑️ 已清空文件列表')
     
     def test_connection(self):
-        """测试S3连接"""
+        """测试S3连接（后台执行，一次请求同时获取存储桶列表；测试中再次点击取消）"""
+        if self.runner.is_running('connection'):
+            self._cancel_connection_test()
+            self.log_message('⏹ 已取消连接测试')
+            return
+        
         try:
             config = self._get_s3_config()
+        except ValueError as e:
+            show_error(self.root, '配置错误', str(e))
+            return
+        
+        profile = self.config_manager.current_profile
+        
+        def probe():
             client = S3ClientWrapper(
                 endpoint_url=config['endpoint'],
                 access_key=config.get('access_key'),
-                secret_key=config.get('secret_key')
+                secret_key=config.get('secret_key'),
+                connect_timeout=self.PROBE_CONNECT_TIMEOUT,
+                read_timeout=self.PROBE_READ_TIMEOUT,
+                max_attempts=1
             )
-            success, message = client.test_connection()
-            
-            if success:
-                # 获取存储桶列表
-                buckets = client.list_buckets()
-                self.bucket_list = buckets
-                
-                # 更新下拉列表
-                if buckets:
-                    self.bucket_combobox.configure(values=buckets)
-                    # 如果当前值不在列表中，设置为第一个
-                    current = self.bucket_combobox.get()
-                    if current not in buckets:
-                        self.bucket_combobox.set(buckets[0])
-                    
-                    # bucket_info = f'\n\n可用存储桶:\n' + '\n'.join(f'  • {b}' for b in buckets[:8])
-                    # if len(buckets) > 8:
-                    #     bucket_info += f'\n  ... 还有 {len(buckets)-8} 个'
-                    # message += bucket_info
-                
-                show_success(self.root, '连接成功', message)
-                self.log_message(f'✅ 连接测试成功')
-            else:
-                show_error(self.root, '连接失败', message)
-                self.log_message(f'❌ {message}')
-        except Exception as e:
+            return client.probe()
+        
+        def on_success(buckets):
+            self._reset_test_button()
+            self.bucket_cache[profile] = (config['endpoint'], config.get('access_key'), buckets)
+            if profile == self.config_manager.current_profile:
+                self._apply_bucket_list(buckets)
+            show_success(self.root, '连接成功', f'连接成功！发现 {len(buckets)} 个存储桶 🎉')
+            self.log_message(f'✅ 连接测试成功')
+        
+        def on_error(e):
+            self._reset_test_button()
             show_error(
                 self.root,
                 '连接失败',
                 f'无法连接到 S3 服务:\n\n{str(e)}\n\n请检查配置是否正确'
             )
             self.log_message(f'❌ 连接测试失败: {e}')
+        
+        self.test_button.configure(text='⏹ 取消测试')
+        self.log_message(f'🔌 正在测试连接: {config["endpoint"]}')
+        self.runner.submit('connection', probe, on_success, on_error)
+    
+    def _cancel_connection_test(self):
+        """取消进行中的连接测试"""
+        self.runner.cancel('connection')
+        self._reset_test_button()
+    
+    def _reset_test_button(self):
+        self.test_button.configure(text='🔌 测试连接')
+    
+    def _apply_bucket_list(self, buckets):
+        """更新存储桶下拉列表"""
+        self.bucket_combobox.configure(values=buckets)
+        # 如果当前值不在列表中，设置为第一个
+        if buckets and self.bucket_combobox.get() not in buckets:
+            self.bucket_combobox.set(buckets[0])
     
     def start_upload(self):
         """开始上传"""
+        if self.upload_manager.is_scanning():
+            show_warning(self.root, '提示', '正在读取文件信息，请稍候再开始上传 (｡･ω･｡)')
+            return
         if not self.upload_manager.get_pending_tasks():
             show_warning(self.root, '提示', '还没有添加要上传的文件哦 (๑•̀ㅂ•́)و✧')
             return
@@ -742,27 +879,146 @@ class S3UploaderApp:
             show_error(self.root, '启动失败', f'无法启动上传任务:\n\n{str(e)}')
             self.log_message(f'❌ 启动失败: {e}')
     
+    def sync_folder(self):
+        """同步本地文件夹到存储桶前缀（只上传有变化的文件）"""
+        local_dir = filedialog.askdirectory(title='选择要同步的文件夹')
+        if not local_dir:
+            return
+        
+        try:
+            config = self._get_s3_config()
+            max_threads = int(self.threads_entry.get())
+            max_threads = max(1, min(max_threads, 10))  # 限制1-10
+            
+            target = f"{config['bucket']}/{config['prefix'].strip('/')}"
+            if not show_question(
+                self.root,
+                '确认同步',
+                f'将同步文件夹:\n{local_dir}\n\n到: {target}\n\n仅上传新增或修改过的文件'
+            ):
+                return
+            
+            sync = SyncManager(self.upload_manager, config, local_dir)
+            sync.on_action = self._on_sync_action
+            
+            self.progress_bar['value'] = 0
+            self.log_message(f'🔁 开始同步: {local_dir} -> {target}')
+            sync.run(max_threads)
+        except ValueError as e:
+            show_error(self.root, '配置错误', f'配置参数有误:\n\n{str(e)}')
+            self.log_message(f'❌ 配置错误: {e}')
+        except Exception as e:
+            show_error(self.root, '启动失败', f'无法启动同步任务:\n\n{str(e)}')
+            self.log_message(f'❌ 启动失败: {e}')
+    
+    def toggle_watch(self):
+        """开始/停止监视文件夹（新文件写入完成后自动上传）"""
+        if self.folder_watcher:
+            self.folder_watcher.stop()
+            self.folder_watcher = None
+            self.watch_button.config(text='👀 监视文件夹')
+            self.log_message('👀 已停止监视文件夹')
+            return
+        
+        watch_dir = filedialog.askdirectory(title='选择要监视的文件夹')
+        if not watch_dir:
+            return
+        
+        try:
+            config = self._get_s3_config()
+            max_threads = int(self.threads_entry.get())
+            max_threads = max(1, min(max_threads, 10))  # 限制1-10
+            
+            watcher = FolderWatcher(
+                self.upload_manager,
+                config,
+                watch_dir,
+                self.config_manager.get_watch_state_path()
+            )
+            watcher.on_file_queued = lambda task: self.log_message(f'👀 检测到文件: {task.key}')
+            watcher.start(max_threads)
+            
+            self.folder_watcher = watcher
+            self.watch_button.config(text='⏹️ 停止监视')
+            self.log_message(f'👀 开始监视文件夹: {watch_dir}')
+        except ValueError as e:
+            show_error(self.root, '配置错误', f'配置参数有误:\n\n{str(e)}')
+            self.log_message(f'❌ 配置错误: {e}')
+        except Exception as e:
+            show_error(self.root, '启动失败', f'无法启动监视:\n\n{str(e)}')
+            self.log_message(f'❌ 启动失败: {e}')
+    
     def stop_upload(self):
         """停止上传"""
         self.upload_manager.stop_upload()
         self.log_message('⏸️ 已发送停止信号')
     
+    def copy_batch_links(self):
+        """复制本批所有链接（一次写入剪贴板）"""
+        text = self.upload_manager.batch_links.clipboard_text()
+        if not text:
+            show_warning(self.root, '提示', '本批还没有上传完成的文件')
+            return
+        self._copy_to_clipboard(text)
+        self.log_message(f'📋 已复制 {text.count(chr(10)) + 1} 个链接到剪贴板')
+    
+    def export_batch_links(self):
+        """导出本批链接为CSV/JSON/Markdown"""
+        links = self.upload_manager.batch_links
+        if not len(links):
+            show_warning(self.root, '提示', '本批还没有上传完成的文件')
+            return
+        path = filedialog.asksaveasfilename(
+            title='导出链接',
+            defaultextension='.csv',
+            filetypes=[('CSV', '*.csv'), ('JSON', '*.json'), ('Markdown', '*.md')]
+        )
+        if not path:
+            return
+        try:
+            count = links.export(path)
+            self.log_message(f'📤 已导出 {count} 条链接: {path}')
+        except (OSError, ValueError) as e:
+            show_error(self.root, '导出失败', str(e))
+    
     # ==================== 回调函数 ====================
     
     def _on_task_progress(self, task):
         """任务进度更新"""
-        # 更新总体进度
-        overall = self.upload_manager.get_overall_progress()
-        self.progress_bar['value'] = overall
-        self.root.update_idletasks()
+        self._progress_dirty = True
+    
+    def _refresh_after_events(self):
+        """一批事件处理完后刷新进度条和文件列表"""
+        if self._progress_dirty:
+            self._progress_dirty = False
+            self.progress_bar['value'] = self.upload_manager.get_overall_progress()
+        if self._file_list_dirty:
+            self._file_list_dirty = False
+            self._update_file_list()
+        if self._stats_dirty:
+            self._stats_dirty = False
+            self._update_stats()
+    
+    def _on_scan_progress(self, event):
+        """文件元数据读取进度：统计随时更新，全部读完后再刷新文件列表"""
+        self._stats_dirty = True
+        if event.pending == 0:
+            self._file_list_dirty = True
+            self.log_message(f'📋 文件信息读取完成，共 {len(self.upload_manager.get_pending_tasks())} 个待上传文件')
     
     def _on_task_complete(self, task):
         """任务完成"""
+        if isinstance(task, DownloadTask):
+            self.log_message(f'📥 下载完成: {task.key} -> {task.file_path}')
+            self._file_list_dirty = True
+            return
         self.log_message(f'✅ 上传完成: {task.filename}')
         if task.public_url:
             self.log_message(f'   🔗 {task.public_url}')
-            self._copy_to_clipboard(task.public_url)
-        self._update_file_list()
+        for name, url in task.variant_urls.items():
+            if url:
+                self.log_message(f'   🖼 {name}: {url}')
+        self._file_list_dirty = True
     
     def _on_task_error(self, task, error_msg):
         """任务失败"""
@@ -770,10 +1026,19 @@ class S3UploaderApp:
             self.log_message(f'❌ 上传失败: {task.filename} - {error_msg}')
         else:
             self.log_message(f'❌ 错误: {error_msg}')
-        self._update_file_list()
+        self._file_list_dirty = True
+    
+    def _on_sync_action(self, action, error):
+        """同步中的删除/下载动作完成"""
+        if error:
+            self.log_message(f'❌ {action.action} 失败: {action.key} - {error}')
+        else:
+            self.log_message(f'🔁 {action}')
     
     def _on_all_complete(self):
         """所有任务完成"""
+        self._update_file_list()
+        self._progress_dirty = False
         self.progress_bar['value'] = 100
         self.log_message('🎉 所有上传任务已完成！')
         
@@ -784,8 +1049,14 @@ class S3UploaderApp:
             failed = sum(1 for t in batch if t.status == 'failed')
         else:
             # 兼容：若无批次信息则退化为统计全部
-            completed = sum(1 for t in self.upload_manager.tasks if t.status == 'completed')
-            failed = sum(1 for t in self.upload_manager.tasks if t.status == 'failed')
+            tasks = self.upload_manager.get_tasks()
+            completed = sum(1 for t in tasks if t.status == 'completed')
+            failed = sum(1 for t in tasks if t.status == 'failed')
+        
+        # 整批链接一次性复制到剪贴板
+        links_text = self.upload_manager.batch_links.clipboard_text()
+        if links_text:
+            self._copy_to_clipboard(links_text)
         
         if failed == 0:
             show_success(
@@ -812,7 +1083,7 @@ class S3UploaderApp:
         if not bucket:
             raise ValueError('存储桶名称不能为空')
         
-        return {
+        config = {
             'endpoint': endpoint,
             'access_key': self.access_entry.get().strip() or None,
             'secret_key': self.secret_entry.get().strip() or None,
@@ -821,20 +1092,38 @@ class S3UploaderApp:
             'base_url': self.baseurl_entry.get().strip(),
             'make_public': bool(self.public_var.pack_var.get())
         }
+        
+        # 性能、压缩、加密、图片衍生、上传规则和预签名没有界面入口，直接沿用配置文件中的值
+        stored = self.config_manager.get_current_config()
+        for name in ('chunk_size', 'part_concurrency', 'buffer_pool_mb', 'upload_processes',
+                     'compression', 'compression_level', 'compression_types',
+                     'encryption_key', 'image_derivatives', 'image_derivative_key',
+                     'image_types', 'content_types', 'content_sniffing', 'upload_rules',
+                     'region', 'addressing_style', 'presign_urls', 'presign_expires',
+                     'signing_url', 'signing_token', 'warm_up'):
+            if stored.get(name) not in (None, '', [], {}):
+                config[name] = stored[name]
+        return config
     
     def _update_file_list(self):
         """更新文件列表显示"""
         self.file_listbox.delete(0, END)
-        for task in self.upload_manager.tasks:
+        self._listed_tasks = self.upload_manager.get_tasks()
+        for task in self._listed_tasks:
             status_icon = {
+                'scanning': '🔍',
                 'pending': '⏳',
                 'uploading': '📤',
+                'downloading': '📥',
                 'completed': '✅',
                 'failed': '❌'
             }.get(task.status, '❓')
             
-            display = f'{status_icon} {task.filename} ({self._format_size(task.filesize)})'
-            if task.status == 'uploading':
+            if task.status == 'scanning':
+                display = f'{status_icon} {task.filename} (读取中)'
+            else:
+                display = f'{status_icon} {task.filename} ({self._format_size(task.filesize)})'
+            if task.status in ('uploading', 'downloading'):
                 display += f' - {task.progress:.1f}%'
             
             self.file_listbox.insert(END, display)
@@ -846,14 +1135,15 @@ class S3UploaderApp:
         
         stats_text = f'待上传: {len(pending)} 个文件\n'
         stats_text += f'总大小: {self._format_size(total_size)}'
+        scanning = self.upload_manager.scanner.pending
+        if scanning:
+            stats_text += f'\n读取中: {scanning} 个'
         
         self.stats_label.config(text=stats_text)
     
     def log_message(self, message: str):
-        """记录日志消息"""
-        timestamp = time.strftime('%H:%M:%S')
-        self.log_text.insert(END, f'[{timestamp}] {message}\n')
-        self.log_text.see(END)
+        """记录日志消息（可在任意线程调用）"""
+        self.log_view.write(message)
     
     def _copy_to_clipboard(self, text: str):
         """复制到剪贴板"""
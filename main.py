@@ -21,9 +21,14 @@ pip install boto3 botocore tkinterdnd2 pyperclip
 
 Usage:
 python main.py
+
+性能追踪（可选）:
+S3UPLOADER_TRACE=trace.json python main.py          # 退出时写出Chrome Trace时间线
+S3UPLOADER_PROFILE_MS=5 S3UPLOADER_TRACE=trace.json   # 同时按5ms间隔采样调用栈
 """
 
-import sys,logging
+import os,sys,logging
+import multiprocessing
 from pathlib import Path
 
 try:
@@ -36,6 +41,7 @@ except ImportError:
     print('安装方法: pip install tkinterdnd2')
 
 from gui.main_window import S3UploaderApp
+from core.tracing import get_tracer
 
 
 def get_icon_path():
@@ -67,6 +73,14 @@ def get_icon_path():
 
 
 def main():
+    # 打包后的exe中使用进程池（压缩）需要
+    multiprocessing.freeze_support()
+    
+    trace_path = os.environ.get('S3UPLOADER_TRACE')
+    if trace_path:
+        interval_ms = float(os.environ.get('S3UPLOADER_PROFILE_MS') or 0)
+        get_tracer().start(sample_interval=interval_ms / 1000 if interval_ms else None)
+    
     if HAVE_DND:
         # 使用支持拖拽的窗口
         root = TkinterDnD.Tk()
@@ -87,6 +101,11 @@ def main():
     
     app = S3UploaderApp(root)
     root.mainloop()
+    
+    if trace_path:
+        get_tracer().stop()
+        get_tracer().save(trace_path)
+        print(f'追踪时间线已保存: {trace_path}')
 
 
 if __name__ == '__main__':
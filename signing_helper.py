@@ -0,0 +1,57 @@
+"""
+预签名签发服务
+在持有密钥的机器上运行，上传端的配置中只需填写签名服务地址和令牌，不需要 secret_key。
+
+Usage:
+python signing_helper.py --profile admin --token <令牌>
+python signing_helper.py --profile admin --host 0.0.0.0 --port 8765 --token <令牌>
+
+上传端配置（uploader_config.json）:
+"signing_url": "http://127.0.0.1:8765",
+"signing_token": "<令牌>"
+"""
+
+import argparse
+import secrets
+
+from core.config_manager import ConfigManager
+from core.presigned_upload import SigningService
+
+
+def main():
+    parser = argparse.ArgumentParser(description='S3预签名签发服务')
+    parser.add_argument('--profile', help='使用的配置名称（默认当前配置）')
+    parser.add_argument('--host', default='127.0.0.1', help='监听地址（默认127.0.0.1）')
+    parser.add_argument('--port', type=int, default=8765, help='监听端口（默认8765）')
+    parser.add_argument('--token', help='访问令牌（未指定时随机生成）')
+    parser.add_argument('--prefix', help='允许上传的对象键前缀（默认使用配置中的前缀）')
+    parser.add_argument('--expires', type=int, help='签发URL的有效期（秒，默认3600）')
+    args = parser.parse_args()
+
+    config_manager = ConfigManager()
+    if args.profile and args.profile not in config_manager.configs:
+        parser.error(f'配置不存在: {args.profile}')
+    config = dict(config_manager.configs[args.profile]) if args.profile \
+        else config_manager.get_current_config()
+    if not (config.get('endpoint') and config.get('bucket')
+            and config.get('access_key') and config.get('secret_key')):
+        parser.error('配置中缺少端点、存储桶或密钥')
+
+    token = args.token or secrets.token_urlsafe(24)
+    options = {'token': token, 'host': args.host, 'port': args.port, 'expires': args.expires}
+    if args.prefix is not None:
+        options['prefix'] = args.prefix
+    service = SigningService.from_config(config, **options)
+
+    print(f'签名服务已启动: {service.url}')
+    print(f'存储桶: {service.bucket}  前缀: {service.prefix or "(全部)"}')
+    if not args.token:
+        print(f'访问令牌: {token}')
+    try:
+        service.serve_forever()
+    except KeyboardInterrupt:
+        print('签名服务已停止')
+
+
+if __name__ == '__main__':
+    main()